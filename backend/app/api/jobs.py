@@ -0,0 +1,149 @@
+import hashlib
+import json
+from fastapi import APIRouter, Depends, Header, HTTPException, Response, status
+from fastapi.responses import StreamingResponse
+from typing import Any, Dict, List, Optional
+from app.services.spotify_service import SpotifyService
+from app.services.jobs import Job, JobRunner, job_manager, JobQueueFullError, IdempotencyConflictError
+from app.dependencies import get_spotify_service
+from app.schemas import (
+    TrackQuery,
+    JobStatus,
+    MultipleTracksSearchResponse,
+    SetlistPlaylistRequest,
+    SetlistPlaylistResponse
+)
+
+router = APIRouter()
+
+# ジョブの受付を断ったときにクライアントへ返す再試行までの目安（秒）
+RETRY_AFTER_SECONDS = 5
+
+
+def _fingerprint(kind: str, payload: Any) -> str:
+    """冪等キーの再利用を検出するため、ジョブの内容からハッシュ値を作成します。"""
+    body = json.dumps(payload, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(f"{kind}\x1f{body}".encode()).hexdigest()
+
+
+def _to_status(job: Job) -> JobStatus:
+    return JobStatus(
+        id=job.id,
+        kind=job.kind,
+        status=job.status,
+        done=job.done,
+        total=job.total,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        result=job.result,
+        error=job.error
+    )
+
+
+async def _submit(
+    kind: str,
+    payload: Any,
+    runner: JobRunner,
+    spotify_service: SpotifyService,
+    response: Response,
+    idempotency_key: Optional[str],
+) -> JobStatus:
+    owner = await spotify_service.get_current_user_id()
+    try:
+        job = await job_manager.submit(kind, owner, _fingerprint(kind, payload), runner, idempotency_key=idempotency_key)
+    except IdempotencyConflictError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="このIdempotency-Keyは別の内容のジョブですでに使われています"
+        )
+    except JobQueueFullError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="実行待ちのジョブが多いため、しばらくしてから再試行してください",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+    response.headers["Location"] = f"/jobs/{job.id}"
+    return _to_status(job)
+
+
+async def _get_owned_job(job_id: str, spotify_service: SpotifyService) -> Job:
+    job = await job_manager.get(job_id)
+    # ほかのユーザーのジョブは存在しないものとして扱う
+    if job is None or job.owner != await spotify_service.get_current_user_id():
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="ジョブが見つかりません")
+    return job
+
+
+@router.post("/search", response_model=JobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def submit_search_job(
+    queries: List[TrackQuery],
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    spotify_service: SpotifyService = Depends(get_spotify_service)
+):
+    """
+    複数トラックの検索をバックグラウンドジョブとして受け付けます。
+    結果は GET /jobs/{job_id} で取得します（内容は /playlist/search/multiple と同じ）。
+    Idempotency-Key を指定すると、同じキーでの再送は新しく実行せずに既存のジョブを返します。
+    """
+    async def _run(job: Job) -> Dict[str, Any]:
+        matches, not_found_tracks, failed_tracks = await spotify_service.search_multiple_tracks(
+            queries, progress=lambda done, total: job_manager.progress(job, done, total)
+        )
+        return MultipleTracksSearchResponse(
+            found_tracks=[match.track for match in matches],
+            not_found_tracks=not_found_tracks,
+            failed_tracks=failed_tracks,
+            matches=matches
+        ).model_dump()
+
+    payload = [q.model_dump() for q in queries]
+    return await _submit("search", payload, _run, spotify_service, response, idempotency_key)
+
+
+@router.post("/setlist", response_model=JobStatus, status_code=status.HTTP_202_ACCEPTED)
+async def submit_setlist_job(
+    payload: SetlistPlaylistRequest,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    spotify_service: SpotifyService = Depends(get_spotify_service)
+):
+    """
+    セットリストからのプレイリスト作成をバックグラウンドジョブとして受け付けます。
+    結果は GET /jobs/{job_id} で取得します（内容は /playlist/setlist と同じ）。
+    Idempotency-Key を指定すると、同じキーでの再送でプレイリストが重複して作成されることはありません。
+    プレイリストの作成後に失敗・中断したジョブを同じキーで再送した場合は、作成済みのプレイリストを使って続きを実行します。
+    """
+    async def _run(job: Job) -> Dict[str, Any]:
+        playlist, not_found_tracks, failed_tracks = await spotify_service.create_playlist_from_queries(
+            name=payload.name,
+            public=payload.public,
+            description=payload.description,
+            queries=payload.queries,
+            progress=lambda done, total: job_manager.progress(job, done, total),
+            playlist_id=(job.checkpoint or {}).get("playlist_id"),
+            on_created=lambda created: job_manager.checkpoint(job, {"playlist_id": created["id"]})
+        )
+        return SetlistPlaylistResponse(playlist=playlist, not_found_tracks=not_found_tracks, failed_tracks=failed_tracks).model_dump()
+
+    return await _submit("setlist", payload.model_dump(), _run, spotify_service, response, idempotency_key)
+
+
+@router.get("/{job_id}", response_model=JobStatus)
+async def get_job(job_id: str, spotify_service: SpotifyService = Depends(get_spotify_service)):
+    """ジョブの状態と進捗を返します。完了したジョブは結果を含みます。"""
+    return _to_status(await _get_owned_job(job_id, spotify_service))
+
+
+@router.get("/{job_id}/stream", response_class=StreamingResponse)
+async def stream_job(job_id: str, spotify_service: SpotifyService = Depends(get_spotify_service)):
+    """
+    ジョブの状態が変わるたびに JobStatus をNDJSON（1行1件）で返し、完了したら終了します。
+    """
+    await _get_owned_job(job_id, spotify_service)
+
+    async def _ndjson():
+        async for job in job_manager.watch(job_id):
+            yield _to_status(job).model_dump_json() + "\n"
+
+    return StreamingResponse(_ndjson(), media_type="application/x-ndjson")
@@ -1,42 +1,150 @@
-from fastapi import APIRouter, Query, Depends, status
+from fastapi import APIRouter, Query, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from typing import List, Optional
 from app.services.spotify_service import SpotifyService
+from app.services.spotify_client import SpotifyException, SPOTIFY_BULK_DEADLINE
 from app.dependencies import get_spotify_service
+from app.utils.track_uri import validate_track_uris
+from app.utils.setlist_parser import parse_setlist
 from app.schemas import (
     Track,
     TrackQuery,
     PlaylistCreateRequest,
     MultipleTracksSearchResponse,
-    Playlist
+    Playlist,
+    SetlistPlaylistRequest,
+    SetlistPlaylistResponse,
+    TrackResolveRequest,
+    TrackResolveResponse,
+    SearchStreamError,
+    SetlistParseRequest,
+    SetlistParseResponse,
+    PlaylistSyncRequest,
+    PlaylistSyncResponse
 )
 
 router = APIRouter()
 
+# これより長いセットリストの解析はスレッドプールで行い、イベントループを止めないようにする
+SETLIST_INLINE_PARSE_CHARS = 10_000
+
 @router.get("/search", response_model=List[Track])
-def search_track(
+async def search_track(
     track_name: str = Query(...),
     artist_name: Optional[str] = Query(None),
     spotify_service: SpotifyService = Depends(get_spotify_service)
 ):
     """単一のトラックを名前で検索します。"""
-    return spotify_service.search_track(track_name=track_name, artist_name=artist_name)
+    return await spotify_service.search_track(track_name=track_name, artist_name=artist_name)
 
 @router.post("/search/multiple", response_model=MultipleTracksSearchResponse)
 async def search_multiple_tracks(queries: List[TrackQuery], spotify_service: SpotifyService = Depends(get_spotify_service)):
-    """複数のクエリで並行してトラックを検索します。"""
-    found_tracks, not_found_tracks = await spotify_service.search_multiple_tracks(queries)
-    return MultipleTracksSearchResponse(found_tracks=found_tracks, not_found_tracks=not_found_tracks)
+    """
+    複数のクエリで並行してトラックを検索します。
+    各クエリは複数の候補から最も一致するものを選び、次点の候補を matches に含めて返します。
+    レート制限などで検索できなかったクエリや、制限時間（SPOTIFY_BULK_DEADLINE）内に終わらなかったクエリは
+    failed_tracks として返します。
+    """
+    matches, not_found_tracks, failed_tracks = await spotify_service.search_multiple_tracks(queries, deadline=SPOTIFY_BULK_DEADLINE)
+    return MultipleTracksSearchResponse(
+        found_tracks=[match.track for match in matches],
+        not_found_tracks=not_found_tracks,
+        failed_tracks=failed_tracks,
+        matches=matches
+    )
+
+@router.post("/search/multiple/stream", response_class=StreamingResponse)
+async def search_multiple_tracks_stream(queries: List[TrackQuery], spotify_service: SpotifyService = Depends(get_spotify_service)):
+    """
+    複数のクエリで並行してトラックを検索し、見つかった順に結果をNDJSON（1行1件）で返します。
+    各行は TrackSearchResult で、index が元のクエリの位置を表します。
+    途中で認証エラー（401/403）になった場合は、SearchStreamError を最後の行として返して終了します。
+    """
+    async def _ndjson():
+        try:
+            async for result in spotify_service.iter_search_results(queries):
+                yield result.model_dump_json() + "\n"
+        except SpotifyException as e:
+            # レスポンスヘッダーは送信済みのため、ステータスコードの代わりにエラーの行で知らせる
+            if e.http_status not in (401, 403):
+                raise
+            yield SearchStreamError(http_status=e.http_status, detail=f"Spotify APIエラー: {e.msg}").model_dump_json() + "\n"
+
+    return StreamingResponse(_ndjson(), media_type="application/x-ndjson")
+
+@router.post("/tracks/resolve", response_model=TrackResolveResponse)
+async def resolve_tracks(payload: TrackResolveRequest, spotify_service: SpotifyService = Depends(get_spotify_service)):
+    """
+    トラックURI・URL・IDのリストを検証し、トラック情報に解決します。
+    不正な形式・存在しない・（marketを指定した場合）再生できないものは rejected として理由付きで返します。
+    プレイリスト作成の前に呼び出すことで、不正なURIによる追加の失敗を防げます。
+    """
+    tracks, rejected = await spotify_service.resolve_tracks(payload.track_uris, market=payload.market)
+    return TrackResolveResponse(tracks=tracks, rejected=rejected)
 
 @router.post("/", response_model=Playlist, status_code=status.HTTP_201_CREATED)
-def create_playlist(payload: PlaylistCreateRequest, spotify_service: SpotifyService = Depends(get_spotify_service)):
+async def create_playlist(payload: PlaylistCreateRequest, spotify_service: SpotifyService = Depends(get_spotify_service)):
     """
     新しいSpotifyプレイリストを作成し、指定されたトラックを追加します。
+    トラックURIは送信前に検証し、重複は最初の1件だけを残します（エピソードのURIも指定できます）。
     """
-    user_id = spotify_service.get_current_user_id()
-    return spotify_service.create_playlist_and_add_tracks(
+    track_uris, invalid_uris = validate_track_uris(payload.track_uris, allow_episodes=True)
+    if invalid_uris:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"不正なトラックURIが含まれています: {invalid_uris[:10]}"
+        )
+
+    user_id = await spotify_service.get_current_user_id()
+    return await spotify_service.create_playlist_and_add_tracks(
         user_id=user_id,
         name=payload.name,
         public=payload.public,
         description=payload.description,
-        track_uris=payload.track_uris
+        track_uris=track_uris
+    )
+
+@router.put("/{playlist_id}/tracks", response_model=PlaylistSyncResponse)
+async def sync_playlist(playlist_id: str, payload: PlaylistSyncRequest, spotify_service: SpotifyService = Depends(get_spotify_service)):
+    """
+    既存のプレイリストの曲を指定したトラックの順に更新します。
+    プレイリストを作り直さず、現在の曲との差分（削除・並べ替え・追加）だけを適用するため、
+    セットリストの修正を少ないリクエストで反映できます。
+    """
+    track_uris, invalid_uris = validate_track_uris(payload.track_uris, allow_episodes=True)
+    if invalid_uris:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"不正なトラックURIが含まれています: {invalid_uris[:10]}"
+        )
+    return await spotify_service.sync_playlist_tracks(playlist_id, track_uris)
+
+@router.post("/setlist/parse", response_model=SetlistParseResponse)
+async def parse_setlist_text(payload: SetlistParseRequest):
+    """
+    貼り付けられたセットリストのテキストを解析し、一括検索用のクエリのリストに変換します。
+    曲順の番号・見出し・MC・テープ・注記を取り除き、"Artist - Title" 表記を分解し、重複を除きます。
+    Spotify APIは呼び出さないため、認証は不要です。
+    """
+    if len(payload.text) > SETLIST_INLINE_PARSE_CHARS:
+        parsed = await run_in_threadpool(parse_setlist, payload.text, payload.artist_name, payload.include_tapes)
+    else:
+        parsed = parse_setlist(payload.text, artist_name=payload.artist_name, include_tapes=payload.include_tapes)
+    return SetlistParseResponse(queries=parsed.queries, skipped=parsed.skipped, duplicates=parsed.duplicates)
+
+@router.post("/setlist", response_model=SetlistPlaylistResponse, status_code=status.HTTP_201_CREATED)
+async def create_playlist_from_setlist(payload: SetlistPlaylistRequest, spotify_service: SpotifyService = Depends(get_spotify_service)):
+    """
+    セットリスト（検索クエリのリスト）から、検索とプレイリスト作成を1回のリクエストで行います。
+    見つかった曲はセットリスト順に追加され、見つからなかったクエリはレスポンスで返します。
+    制限時間（SPOTIFY_BULK_DEADLINE）内に検索が終わらなかったクエリは failed_tracks として返します。
+    """
+    playlist, not_found_tracks, failed_tracks = await spotify_service.create_playlist_from_queries(
+        name=payload.name,
+        public=payload.public,
+        description=payload.description,
+        queries=payload.queries,
+        deadline=SPOTIFY_BULK_DEADLINE
     )
+    return SetlistPlaylistResponse(playlist=playlist, not_found_tracks=not_found_tracks, failed_tracks=failed_tracks)
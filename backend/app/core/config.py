@@ -0,0 +1,90 @@
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+# Spotify OAuthで要求する権限
+SPOTIFY_SCOPE = "playlist-modify-public playlist-modify-private"
+
+# 本番環境のリダイレクトURI（統合後は同一ドメイン）
+PRODUCTION_REDIRECT_URI = "https://create-playlist-app-6f538d596202.herokuapp.com/auth/callback"
+PRODUCTION_FALLBACK_REDIRECT_URI = "https://create-playlist-app-6f538d596202.herokuapp.com/"
+DEVELOPMENT_REDIRECT_URI = "http://localhost:5173/auth/callback"
+
+_environment_loaded = False
+
+
+def load_environment() -> None:
+    """
+    .envファイルを環境変数に読み込みます。プロセス内で1度だけ実行されます。
+    各モジュールはimport時に環境変数から設定を読むため、アプリのモジュールより先に呼び出します。
+    """
+    global _environment_loaded
+    if _environment_loaded:
+        return
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    _environment_loaded = True
+
+
+@dataclass(frozen=True)
+class Settings:
+    """アプリケーション全体の設定。get_settings() で取得します。"""
+
+    environment: str
+    client_id: Optional[str]
+    client_secret: Optional[str]
+    redirect_uri: str
+    scope: str
+    frontend_url: Optional[str]
+    # /metrics の取得に必要なBearerトークン（未設定の場合、本番環境では /metrics を公開しない）
+    metrics_token: Optional[str] = None
+    # ビルド済みのフロントエンドのディレクトリ（未設定の場合は app/static）
+    static_dir: Optional[str] = None
+
+    @property
+    def is_production(self) -> bool:
+        return self.environment == "production"
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        environment = os.environ.get("ENVIRONMENT", "development")
+        if environment == "production":
+            # 本番環境：統合後は同一ドメイン（未設定の場合はトップページにフォールバック）
+            redirect_uri = PRODUCTION_REDIRECT_URI if os.environ.get("SPOTIPY_REDIRECT_URI") else PRODUCTION_FALLBACK_REDIRECT_URI
+        else:
+            # 開発環境：ローカルURL
+            redirect_uri = os.environ.get("SPOTIPY_REDIRECT_URI", DEVELOPMENT_REDIRECT_URI)
+        return cls(
+            environment=environment,
+            client_id=os.environ.get("SPOTIPY_CLIENT_ID"),
+            client_secret=os.environ.get("SPOTIPY_CLIENT_SECRET"),
+            redirect_uri=redirect_uri,
+            scope=SPOTIFY_SCOPE,
+            frontend_url=os.environ.get("FRONTEND_URL"),
+            metrics_token=os.environ.get("METRICS_TOKEN") or None,
+            static_dir=os.environ.get("STATIC_DIR") or None,
+        )
+
+    def validate(self) -> None:
+        """必須の設定が揃っているかを確認します。"""
+        if not self.client_id:
+            raise ValueError("SPOTIPY_CLIENT_ID environment variable is required")
+        if not self.client_secret:
+            raise ValueError("SPOTIPY_CLIENT_SECRET environment variable is required")
+
+    def summary(self) -> Dict[str, Any]:
+        """ログ出力用の設定の概要（秘密情報を除く）を返します。"""
+        return {
+            "environment": self.environment,
+            "redirect_uri": self.redirect_uri,
+            "client_id": f"{self.client_id[:8]}..." if self.client_id else None,
+        }
+
+
+@lru_cache(maxsize=None)
+def get_settings() -> Settings:
+    """設定を返します。初回の呼び出し時に環境変数から読み込みます。"""
+    load_environment()
+    return Settings.from_env()
@@ -0,0 +1,120 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+# ログ設定
+#   LOG_LEVEL:    ルートのログレベル（本番はINFO、開発はDEBUG）
+#   LOG_LEVELS:   モジュールごとのログレベル（例: "app.utils.token_utils=WARNING,app.api=DEBUG"）
+#   LOG_FORMAT:   json | text（本番はjson、開発はtext）
+#   LOG_DEBUG_SAMPLE_RATE: DEBUGログを出力する割合（高頻度のDEBUGログを間引く）
+_IS_PRODUCTION = os.environ.get("ENVIRONMENT", "development") == "production"
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO" if _IS_PRODUCTION else "DEBUG").upper()
+LOG_LEVELS = os.environ.get("LOG_LEVELS", "")
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json" if _IS_PRODUCTION else "text")
+LOG_DEBUG_SAMPLE_RATE = float(os.environ.get("LOG_DEBUG_SAMPLE_RATE", "0.01" if _IS_PRODUCTION else "1.0"))
+
+# LogRecordの標準属性（これ以外の属性はextraとしてJSONに出力する）
+_RESERVED_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_queue_handler: Optional[logging.handlers.QueueHandler] = None
+
+
+class JSONFormatter(logging.Formatter):
+    """ログを1行のJSONとして出力するフォーマッター。extraで渡した値もフィールドとして出力します。"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        payload: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_ATTRS and not key.startswith("_"):
+                payload[key] = value
+        if record.exc_info:
+            payload["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class DebugSamplingFilter(logging.Filter):
+    """DEBUGレベルのログだけを指定した割合で間引くフィルター。"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1.0:
+            return True
+        return random.random() < self.rate
+
+
+def _parse_module_levels(spec: str) -> Dict[str, str]:
+    levels = {}
+    for item in spec.split(","):
+        if "=" in item:
+            name, level = item.split("=", 1)
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def setup_logging() -> None:
+    """
+    アプリケーションのロギングを設定します。
+    ログはキュー経由で別スレッドのリスナーが書き出すため、リクエスト処理中のI/Oを避けられます。
+    複数回呼び出しても設定は1度だけ行われます。
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        stream_handler.setFormatter(JSONFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s [%(name)s] %(message)s"))
+
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    queue_handler = _queue_handler = logging.handlers.QueueHandler(log_queue)
+    queue_handler.addFilter(DebugSamplingFilter(LOG_DEBUG_SAMPLE_RATE))
+
+    # アプリケーションのロガーにだけハンドラを設定し、uvicorn/gunicornのログ設定には干渉しない
+    app_logger = logging.getLogger("app")
+    app_logger.handlers = [queue_handler]
+    app_logger.setLevel(LOG_LEVEL)
+    app_logger.propagate = False
+    for name, level in _parse_module_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_stop_listener)
+    os.register_at_fork(after_in_child=_restart_listener_after_fork)
+
+
+def _stop_listener() -> None:
+    if _listener is not None:
+        _listener.stop()
+
+
+def _restart_listener_after_fork() -> None:
+    """
+    fork後の子プロセスではリスナーのスレッドが存在しないため、新しいキューとリスナーを作り直します。
+    （Gunicornのpreloadでマスタープロセスがロギングを設定した場合など）
+    """
+    global _listener
+    if _listener is None or _queue_handler is None:
+        return
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    _queue_handler.queue = log_queue
+    _listener = logging.handlers.QueueListener(log_queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
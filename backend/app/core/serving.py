@@ -0,0 +1,169 @@
+import os
+import logging
+import importlib.util
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 本番サーバー（Gunicorn + Uvicornワーカー）の設定
+#   WEB_CONCURRENCY:        ワーカー数（未指定の場合はCPU数とメモリ量から決める）
+#   WORKER_MEMORY_MB:       1ワーカーあたりの想定メモリ使用量
+#   WORKER_MAX:             自動で決めるワーカー数の上限
+#   THREADPOOL_SIZE:        1ワーカーあたりのスレッドプールの上限（同期処理・ファイル配信用）
+WORKER_MEMORY_MB = int(os.environ.get("WORKER_MEMORY_MB", "160"))
+WORKER_MAX = int(os.environ.get("WORKER_MAX", "8"))
+THREADPOOL_SIZE = os.environ.get("THREADPOOL_SIZE")
+
+# cgroupのCPU・メモリ制限（コンテナ・Herokuのdyno内ではホスト全体の値ではなくこちらが上限になる）
+_CGROUP_CPU_MAX = "/sys/fs/cgroup/cpu.max"
+_CGROUP_V1_CPU_QUOTA = "/sys/fs/cgroup/cpu/cpu.cfs_quota_us"
+_CGROUP_V1_CPU_PERIOD = "/sys/fs/cgroup/cpu/cpu.cfs_period_us"
+_CGROUP_MEMORY_MAX = "/sys/fs/cgroup/memory.max"
+_CGROUP_V1_MEMORY_LIMIT = "/sys/fs/cgroup/memory/memory.limit_in_bytes"
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def available_cpus() -> int:
+    """このプロセスが使えるCPU数を返します（CPUアフィニティとcgroupのクォータを考慮）。"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = None
+    cpu_max = _read(_CGROUP_CPU_MAX)
+    if cpu_max:
+        limit, _, period = cpu_max.partition(" ")
+        if limit != "max" and period:
+            quota = int(limit) / int(period)
+    else:
+        limit, period = _read(_CGROUP_V1_CPU_QUOTA), _read(_CGROUP_V1_CPU_PERIOD)
+        if limit and period and int(limit) > 0:
+            quota = int(limit) / int(period)
+    if quota is not None:
+        cpus = min(cpus, max(1, int(quota + 0.5)))
+    return max(1, cpus)
+
+
+def available_memory_bytes() -> Optional[int]:
+    """このプロセスが使えるメモリ量を返します（cgroupの上限、なければ物理メモリ）。"""
+    for path in (_CGROUP_MEMORY_MAX, _CGROUP_V1_MEMORY_LIMIT):
+        value = _read(path)
+        # cgroup v1の「無制限」は非常に大きな値になる
+        if value and value.isdigit() and int(value) < 1 << 60:
+            return int(value)
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def recommended_workers(cpus: Optional[int] = None, memory_bytes: Optional[int] = None) -> int:
+    """
+    ワーカー数を決めます。WEB_CONCURRENCYが指定されていればそれを使います。
+
+    処理の大半はSpotify APIの待ち時間（I/O）なので、非同期ワーカーは1コアに1つで足ります。
+    ワーカーごとにキャッシュとインデックスを持つため、メモリ量でも上限を設けます。
+    """
+    configured = os.environ.get("WEB_CONCURRENCY")
+    if configured:
+        return max(1, int(configured))
+    cpus = cpus or available_cpus()
+    memory_bytes = memory_bytes if memory_bytes is not None else available_memory_bytes()
+    workers = cpus
+    if memory_bytes:
+        workers = min(workers, memory_bytes // (WORKER_MEMORY_MB * 1024 * 1024))
+    return max(1, min(workers, WORKER_MAX))
+
+
+def recommended_threadpool_size(cpus: Optional[int] = None) -> int:
+    """
+    1ワーカーあたりのスレッドプールの上限を返します。
+    ルートはすべて非同期のため、スレッドプールはファイル配信などの補助的な用途だけに使われます。
+    """
+    if THREADPOOL_SIZE:
+        return max(1, int(THREADPOOL_SIZE))
+    return max(8, min(40, (cpus or available_cpus()) * 4))
+
+
+def event_loop_impl() -> str:
+    """Uvicornのイベントループ実装を返します（uvloopがあればuvloop）。"""
+    return "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+
+
+def http_impl() -> str:
+    """UvicornのHTTPパーサーを返します（httptoolsがあればhttptools）。"""
+    return "httptools" if importlib.util.find_spec("httptools") else "h11"
+
+
+def configure_threadpool() -> int:
+    """実行中のイベントループのスレッドプール（anyio）の上限を設定します。"""
+    import anyio.to_thread
+
+    size = recommended_threadpool_size()
+    anyio.to_thread.current_default_thread_limiter().total_tokens = size
+    return size
+
+
+def self_check() -> Dict[str, Any]:
+    """
+    起動時の自己診断を行い、サーバー構成を返します。
+    致命的な設定不備（認証情報の欠落、共有キャッシュに書き込めないなど）はRuntimeErrorにします。
+    """
+    from app.core.config import get_settings
+    from app.services.search_cache import search_cache
+    from app.services.rate_limiter import rate_limiter
+    from app.services.jobs import job_manager, MemoryJobStore
+    from app.services.resolution_store import resolution_store
+
+    problems: List[str] = []
+    warnings: List[str] = []
+
+    try:
+        get_settings().validate()
+    except ValueError as e:
+        problems.append(str(e))
+
+    if search_cache.backend is not None:
+        try:
+            search_cache.backend.set("\x1fself-check", [], ttl=1.0)
+        except Exception as e:
+            problems.append(f"search cache backend is not writable: {e}")
+
+    workers = recommended_workers()
+    is_production = get_settings().is_production
+    if workers > 1 and isinstance(job_manager.store, MemoryJobStore):
+        warnings.append("multiple workers without a shared job store (JOB_STORE_BACKEND=sqlite); job polls may miss jobs")
+    if resolution_store.ephemeral:
+        warnings.append(
+            f"RESOLUTION_STORE_PATH ({resolution_store.path}) is in a temporary directory; "
+            "it is wiped on restart, so resolutions will not be warmed up after one"
+        )
+    if is_production and event_loop_impl() != "uvloop":
+        warnings.append("uvloop is not installed; falling back to the asyncio event loop")
+
+    report = {
+        "workers": workers,
+        "cpus": available_cpus(),
+        "memory_mb": (available_memory_bytes() or 0) // (1024 * 1024),
+        "loop": event_loop_impl(),
+        "http": http_impl(),
+        "threadpool": recommended_threadpool_size(),
+        "rate_limit_per_worker": rate_limiter.rate,
+        "search_cache_backend": search_cache.stats()["backend"],
+        "job_store": type(job_manager.store).__name__,
+        "resolution_store": resolution_store.path or "disabled",
+    }
+    for warning in warnings:
+        logger.warning("Serving self-check: %s", warning)
+    if problems:
+        raise RuntimeError("Serving self-check failed: " + "; ".join(problems))
+    logger.info("Serving self-check passed", extra=report)
+    return report
@@ -0,0 +1,221 @@
+import os
+import gzip
+import hashlib
+import logging
+import mimetypes
+from pathlib import Path
+from typing import Dict, Iterable, Mapping, Optional, Tuple
+from starlette.responses import FileResponse, Response
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# 静的ファイル配信の設定
+#   STATIC_MAX_MEMORY_BYTES: メモリに保持する静的ファイルの合計サイズの上限（超えた分はディスクから配信）
+#   STATIC_MAX_FILE_BYTES:   メモリに保持する1ファイルあたりのサイズの上限
+STATIC_MAX_MEMORY_BYTES = int(os.environ.get("STATIC_MAX_MEMORY_BYTES", str(64 * 1024 * 1024)))
+STATIC_MAX_FILE_BYTES = int(os.environ.get("STATIC_MAX_FILE_BYTES", str(8 * 1024 * 1024)))
+
+# Viteがファイル名にハッシュを付けて出力するディレクトリ（内容が変わるとファイル名も変わる）
+IMMUTABLE_PREFIX = "assets/"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+INDEX_CACHE_CONTROL = "no-cache"
+DEFAULT_CACHE_CONTROL = "public, max-age=3600"
+
+# 圧縮する価値のあるコンテンツタイプ
+_COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml", "application/xml")
+# 圧縮後のサイズがこの割合を下回る場合だけ圧縮版を保持する
+_MIN_COMPRESSION_RATIO = 0.9
+_MIN_COMPRESS_BYTES = 256
+
+# エンコーディングと、ビルド時に生成された圧縮済みファイルの拡張子
+_ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+# ビルド時の圧縮版（frontend/scripts/precompress.mjs）がないファイルを起動時に圧縮する場合の圧縮レベル
+# （Gunicornのpreloadではワーカーの起動前にマスタープロセスで実行されるため、速度を優先する）
+_RUNTIME_BROTLI_QUALITY = 5
+_RUNTIME_GZIP_LEVEL = 6
+
+
+class StaticAsset:
+    """インデックス済みの静的ファイル。内容（または大きいファイルのパス）とヘッダーを保持します。"""
+
+    __slots__ = ("path", "media_type", "cache_control", "etag", "variants", "file_path", "stat_result")
+
+    def __init__(self, path: str, media_type: str, cache_control: str, etag: str):
+        self.path = path
+        self.media_type = media_type
+        self.cache_control = cache_control
+        self.etag = etag
+        # エンコーディング（"identity", "br", "gzip"）-> (内容, ETag)
+        self.variants: Dict[str, Tuple[bytes, str]] = {}
+        # メモリに保持しない大きいファイルの場合のみ設定する
+        self.file_path: Optional[Path] = None
+        self.stat_result: Optional[os.stat_result] = None
+
+
+def _is_compressible(media_type: str) -> bool:
+    return media_type.startswith(_COMPRESSIBLE_TYPES)
+
+
+def _compress(encoding: str, content: bytes) -> Optional[bytes]:
+    if encoding == "gzip":
+        # mtimeを固定して、同じ内容から常に同じバイト列（=同じETag）を得る
+        return gzip.compress(content, compresslevel=_RUNTIME_GZIP_LEVEL, mtime=0)
+    if encoding == "br" and brotli is not None:
+        return brotli.compress(content, quality=_RUNTIME_BROTLI_QUALITY)
+    return None
+
+
+def parse_accept_encoding(header: Optional[str]) -> Dict[str, float]:
+    """Accept-Encodingヘッダーを {エンコーディング: q値} に変換します。"""
+    accepted: Dict[str, float] = {}
+    if not header:
+        return accepted
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            accepted[name.strip().lower()] = q
+    return accepted
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in if_none_match.split(","))
+
+
+class StaticSite:
+    """
+    ビルド済みのSPA（STATIC_DIR）を配信するためのインデックス。
+
+    起動時に一度だけディレクトリを走査し、相対パス -> StaticAsset の対応表を作ります。
+    リクエスト時は対応表を引くだけなので、ファイルシステムへのアクセスは発生せず、
+    対応表にないパス（"../" を含むものなど）がディレクトリの外を指すこともありません。
+
+    ファイルは内容ごとメモリに保持し、圧縮できるものはgzip/brotliの圧縮版も用意します。
+    圧縮版は通常フロントエンドのビルド時に最高圧縮率で生成された .gz/.br を読み込むだけで、
+    それがないファイルだけを起動時に低い圧縮レベルで圧縮します。
+    """
+
+    def __init__(self, root: Path, index: str = "index.html"):
+        self.root = root
+        self.index_name = index
+        self.assets: Dict[str, StaticAsset] = {}
+        self.memory_bytes = 0
+        # ビルド時の圧縮版がなく、起動時に圧縮したファイルの数
+        self.runtime_compressed = 0
+        self._build()
+        self.index = self.assets.get(index)
+
+    def _iter_files(self) -> Iterable[Tuple[str, Path]]:
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            # 隠しディレクトリ・隠しファイルは配信しない
+            dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+            for filename in filenames:
+                if filename.startswith("."):
+                    continue
+                full_path = Path(dirpath) / filename
+                yield full_path.relative_to(self.root).as_posix(), full_path
+
+    def _build(self) -> None:
+        files = dict(self._iter_files())
+        for rel_path, full_path in sorted(files.items()):
+            # 圧縮済みファイルは元のファイルの圧縮版として扱う
+            if any(rel_path.endswith(suffix) and rel_path[: -len(suffix)] in files for _, suffix in _ENCODINGS):
+                continue
+            self.assets[rel_path] = self._load(rel_path, full_path, files)
+
+    def _load(self, rel_path: str, full_path: Path, files: Mapping[str, Path]) -> StaticAsset:
+        media_type = mimetypes.guess_type(rel_path)[0] or "application/octet-stream"
+        if rel_path == self.index_name:
+            cache_control = INDEX_CACHE_CONTROL
+        elif rel_path.startswith(IMMUTABLE_PREFIX):
+            cache_control = IMMUTABLE_CACHE_CONTROL
+        else:
+            cache_control = DEFAULT_CACHE_CONTROL
+
+        stat_result = full_path.stat()
+        if stat_result.st_size > STATIC_MAX_FILE_BYTES or self.memory_bytes + stat_result.st_size > STATIC_MAX_MEMORY_BYTES:
+            # 大きいファイルはディスクから配信する（stat済みの結果を渡してリクエスト時のstatを省く）
+            etag = f'"{stat_result.st_size:x}-{int(stat_result.st_mtime):x}"'
+            asset = StaticAsset(rel_path, media_type, cache_control, etag)
+            asset.file_path = full_path
+            asset.stat_result = stat_result
+            return asset
+
+        content = full_path.read_bytes()
+        digest = hashlib.sha256(content).hexdigest()[:20]
+        asset = StaticAsset(rel_path, media_type, cache_control, f'"{digest}"')
+        asset.variants["identity"] = (content, asset.etag)
+        self.memory_bytes += len(content)
+
+        if _is_compressible(media_type) and len(content) >= _MIN_COMPRESS_BYTES:
+            compressed_at_startup = False
+            for encoding, suffix in _ENCODINGS:
+                precompressed = files.get(rel_path + suffix)
+                if precompressed is not None:
+                    compressed = precompressed.read_bytes()
+                else:
+                    compressed = _compress(encoding, content)
+                    compressed_at_startup = True
+                if compressed is not None and len(compressed) < len(content) * _MIN_COMPRESSION_RATIO:
+                    # 表現ごとに内容が異なるため、強いETagも表現ごとに分ける
+                    asset.variants[encoding] = (compressed, f'"{digest}-{encoding}"')
+                    self.memory_bytes += len(compressed)
+            self.runtime_compressed += compressed_at_startup
+        return asset
+
+    def lookup(self, path: str) -> Optional[StaticAsset]:
+        """リクエストパスに対応する静的ファイルを返します。"""
+        return self.assets.get(path.lstrip("/"))
+
+    def response(self, asset: StaticAsset, headers: Mapping[str, str]) -> Response:
+        """Accept-Encodingと条件付きリクエスト（If-None-Match）を考慮してレスポンスを作成します。"""
+        if asset.file_path is not None:
+            return FileResponse(
+                asset.file_path,
+                media_type=asset.media_type,
+                stat_result=asset.stat_result,
+                headers={"Cache-Control": asset.cache_control, "ETag": asset.etag},
+            )
+
+        encoding = "identity"
+        if len(asset.variants) > 1:
+            accepted = parse_accept_encoding(headers.get("accept-encoding"))
+            for candidate, _ in _ENCODINGS:
+                if accepted.get(candidate, 0.0) > 0 and candidate in asset.variants:
+                    encoding = candidate
+                    break
+        content, etag = asset.variants[encoding]
+
+        response_headers = {"Cache-Control": asset.cache_control, "ETag": etag}
+        if len(asset.variants) > 1:
+            response_headers["Vary"] = "Accept-Encoding"
+        if encoding != "identity":
+            response_headers["Content-Encoding"] = encoding
+
+        if _etag_matches(headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=response_headers)
+        return Response(content=content, media_type=asset.media_type, headers=response_headers)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "files": len(self.assets),
+            "memory_bytes": self.memory_bytes,
+            "compressed_files": sum(1 for asset in self.assets.values() if len(asset.variants) > 1),
+            "runtime_compressed_files": self.runtime_compressed,
+            "disk_files": sum(1 for asset in self.assets.values() if asset.file_path is not None),
+        }
@@ -0,0 +1,64 @@
+import os
+import sys
+import time
+import logging
+from gunicorn.arbiter import Arbiter
+from uvicorn.server import Server
+from uvicorn.workers import UvicornWorker
+from app.core.serving import event_loop_impl, http_impl
+
+logger = logging.getLogger(__name__)
+
+# max_requests に達したワーカーの再起動を、実行中のバックグラウンドジョブが終わるまで延期する最大時間（秒）
+WORKER_RESTART_DEFER_MAX = float(os.environ.get("WORKER_RESTART_DEFER_MAX", "600"))
+
+
+class JobAwareServer(Server):
+    """
+    max_requests による再起動を、このプロセスで実行中・待機中のジョブがなくなるまで延期するUvicornのサーバー。
+    ジョブの実行にはリクエスト時のアクセストークンが必要で、再起動で中断すると再開できないため。
+    延期は WORKER_RESTART_DEFER_MAX 秒までで、SIGTERMなどによる停止は延期しません。
+    """
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.max_requests = config.limit_max_requests
+        self.deferred_since = None
+
+    async def on_tick(self, counter: int) -> bool:
+        # gunicorn.conf.py でジョブの保存先の設定を決めた後に読み込む
+        from app.services.jobs import job_manager
+
+        limit_reached = self.max_requests is not None and self.server_state.total_requests >= self.max_requests
+        if limit_reached and job_manager.busy:
+            if self.deferred_since is None:
+                self.deferred_since = time.monotonic()
+                logger.info("Deferring worker restart until background jobs finish", extra=job_manager.stats())
+            if time.monotonic() - self.deferred_since < WORKER_RESTART_DEFER_MAX:
+                self.config.limit_max_requests = None
+                return await super().on_tick(counter)
+        self.config.limit_max_requests = self.max_requests
+        return await super().on_tick(counter)
+
+
+class TunedUvicornWorker(UvicornWorker):
+    """
+    Gunicorn用のUvicornワーカー。
+    イベントループとHTTPパーサーを明示的に選び（uvloop/httptoolsがあればそれを使う）、
+    Gunicornの設定ファイル（gunicorn.conf.py）の worker_class から指定します。
+    max_requests による再起動は、実行中のジョブが終わるまで延期します（JobAwareServer を参照）。
+    """
+
+    CONFIG_KWARGS = {
+        "loop": event_loop_impl(),
+        "http": http_impl(),
+        "lifespan": "on",
+    }
+
+    async def _serve(self) -> None:
+        self.config.app = self.wsgi
+        server = JobAwareServer(config=self.config)
+        self._install_sigquit_handler()
+        await server.serve(sockets=self.sockets)
+        if not server.started:
+            sys.exit(Arbiter.WORKER_BOOT_ERROR)
@@ -1,66 +1,45 @@
-import os
-from fastapi import Request, Response, Depends, HTTPException, status
+import logging
+from functools import lru_cache
+from fastapi import Request, Response, Depends
+from app.core.config import get_settings
 from app.utils.token_utils import TokenManager
-from app.services.spotify_service import SpotifyService
-import spotipy
+from app.core.metrics import token_validation_duration
+from app.services.spotify_service import SpotifyService, invalidate_user_profile
 
-from dotenv import load_dotenv
+logger = logging.getLogger(__name__)
 
-load_dotenv()
-
-# 環境判定
-ENVIRONMENT = os.environ.get("ENVIRONMENT", "development")
-IS_PRODUCTION = ENVIRONMENT == "production"
-
-# .envファイルから設定を読み込み
-CLIENT_ID = os.environ.get("SPOTIPY_CLIENT_ID")
-CLIENT_SECRET = os.environ.get("SPOTIPY_CLIENT_SECRET")
-
-# リダイレクトURIを環境に応じて設定
-def get_redirect_uri():
-    """環境に応じたリダイレクトURIを取得"""
-    if IS_PRODUCTION:
-        # 本番環境：統合後は同一ドメイン
-        app_name = os.environ.get("SPOTIPY_REDIRECT_URI")
-        if app_name:
-            return "https://create-playlist-app-6f538d596202.herokuapp.com/auth/callback"
-        else:
-            # フォールバック
-            return os.environ.get("SPOTIPY_REDIRECT_URI", "https://create-playlist-app-6f538d596202.herokuapp.com/")
-    else:
-        # 開発環境：ローカルURL
-        return os.environ.get("SPOTIPY_REDIRECT_URI", "http://localhost:5173/auth/callback")
-
-REDIRECT_URI = get_redirect_uri()
-SCOPE = "playlist-modify-public playlist-modify-private"
-
-# デバッグ用：設定内容を出力
-print(f"Environment: {ENVIRONMENT}")
-print(f"Redirect URI: {REDIRECT_URI}")
-print(f"Client ID: {CLIENT_ID[:8]}..." if CLIENT_ID else "Client ID: Not set")
-
-# 環境変数チェック
-if not CLIENT_ID:
-    raise ValueError("SPOTIPY_CLIENT_ID environment variable is required")
-if not CLIENT_SECRET:
-    raise ValueError("SPOTIPY_CLIENT_SECRET environment variable is required")
-
-# アプリケーション全体で共有するTokenManagerのシングルトンインスタンス
-token_manager = TokenManager(
-    client_id=CLIENT_ID,
-    client_secret=CLIENT_SECRET,
-    redirect_uri=REDIRECT_URI,
-    scope=SCOPE
-)
-
-def get_token_manager() -> TokenManager:
+@lru_cache(maxsize=None)
+def load_token_manager() -> TokenManager:
+    """
+    アプリケーション全体で共有するTokenManagerを返します。
+    初回の呼び出し時（起動時のlifespan、または最初のリクエスト）に設定から生成します。
+    """
+    settings = get_settings()
+    settings.validate()
+    logger.info("Spotify OAuth configured", extra=settings.summary())
+    return TokenManager(
+        client_id=settings.client_id,
+        client_secret=settings.client_secret,
+        redirect_uri=settings.redirect_uri,
+        scope=settings.scope,
+        environment=settings.environment
+    )
+
+async def get_token_manager() -> TokenManager:
     """TokenManagerのインスタンスを返す依存関係関数。"""
-    return token_manager
+    return load_token_manager()
 
-def get_spotify_service(request: Request, response: Response, tm: TokenManager = Depends(get_token_manager)) -> SpotifyService:
+async def get_spotify_service(request: Request, response: Response, tm: TokenManager = Depends(get_token_manager)) -> SpotifyService:
     """
     有効なアクセストークンを取得し、SpotifyServiceのインスタンスを生成する依存関係。
     トークンが無効、またはリフレッシュが必要な場合は自動で処理します。
     """
-    access_token = tm.get_valid_access_token(request, response)
-    return SpotifyService(access_token=access_token)
\ No newline at end of file
+    with token_validation_duration.time():
+        access_token = await tm.get_valid_access_token(request, response)
+
+    # リフレッシュでトークンが変わった場合は、古いトークンのプロフィールキャッシュを破棄する
+    previous_token = request.cookies.get("access_token")
+    if previous_token and previous_token != access_token:
+        invalidate_user_profile(previous_token)
+
+    return SpotifyService(access_token=access_token)
@@ -1,29 +1,84 @@
-import os
+import hmac
+import time
+import logging
+from contextlib import asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI, Request, status
-from fastapi.responses import JSONResponse
-from fastapi.staticfiles import StaticFiles
+from typing import Any, Optional
+from fastapi import FastAPI, Header, Request, status
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
-from starlette.responses import FileResponse
-from app.api import auth, playlist
-import spotipy
-from dotenv import load_dotenv
+from app.core.config import get_settings, load_environment
 
-# 環境変数を読み込み
-load_dotenv()
+# 環境変数を読み込み、ほかのモジュールを読み込む前にロギングを設定する
+load_environment()
+
+from app.core.logging_config import setup_logging
+setup_logging()
+
+from app.api import auth, playlist, jobs
+from app.services.spotify_client import SpotifyException, close_http_client, get_http_client
+from app.services.search_cache import search_cache
+from app.services.rate_limiter import rate_limiter
+from app.services.spotify_service import search_flight, user_flight, warm_up_resolutions
+from app.services.catalog_index import catalog_index
+from app.services.jobs import job_manager
+from app.services.resolution_store import resolution_store
+from app.core.metrics import registry, http_request_duration, response_render_duration
+from app.core.serving import configure_threadpool, self_check
+from app.core.static_assets import StaticSite, IMMUTABLE_PREFIX
+from app.dependencies import load_token_manager
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """アプリケーションの起動・終了時に共有リソースを管理します。"""
+    logger.info(
+        "Application configured",
+        extra={"environment": ENVIRONMENT, "static_dir": str(STATIC_DIR), "cors_origins": origins},
+    )
+    # ワーカーごとのスレッドプールの上限を設定し、起動時の自己診断を行う
+    configure_threadpool()
+    self_check()
+    # OAuthの設定とSpotify APIとのコネクションプールを最初のリクエストより前に用意する
+    load_token_manager()
+    get_http_client()
+    # 以前に解決した検索結果のうち、よく使われたものを検索キャッシュに読み込む
+    warmed = await warm_up_resolutions()
+    await resolution_store.start()
+    logger.info("Search resolutions warmed up", extra={"entries": warmed})
+    # バックグラウンドジョブのワーカーを起動する
+    await job_manager.start()
+    yield
+    # 実行中のジョブの完了を待ってから、未書き込みの検索結果を保存し、Spotify APIとの共有コネクションプールを閉じる
+    await job_manager.stop()
+    await resolution_store.stop()
+    await search_cache.flush()
+    await close_http_client()
+
+class TimedJSONResponse(JSONResponse):
+    """JSONへの変換（レスポンスボディの生成）にかかった時間を記録するJSONResponse。"""
+
+    def render(self, content: Any) -> bytes:
+        with response_render_duration.time():
+            return super().render(content)
 
 app = FastAPI(
     title="Spotify Playlist API",
     description="セットリストからSpotifyプレイリストを作成するAPI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=TimedJSONResponse
 )
 
 # 環境判定
-ENVIRONMENT = os.environ.get("ENVIRONMENT", "development")
-IS_PRODUCTION = ENVIRONMENT == "production"
+settings = get_settings()
+ENVIRONMENT = settings.environment
+IS_PRODUCTION = settings.is_production
 
 # 静的ファイルのパス設定
-STATIC_DIR = Path(__file__).parent / "static"
+STATIC_DIR = Path(settings.static_dir) if settings.static_dir else Path(__file__).parent / "static"
+static_site: Optional[StaticSite] = None
 
 # --- CORS設定（統合後は最小限に） ---
 if IS_PRODUCTION:
@@ -45,16 +100,45 @@ if origins:  # 開発環境のみCORSを設定
         allow_headers=["*"],
     )
 
-# デバッグ用：起動時設定を出力
-print(f"Environment: {ENVIRONMENT}")
-print(f"Static directory: {STATIC_DIR}")
-print(f"CORS Origins: {origins}")
+# リクエストごとのレイテンシを計測するミドルウェア
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    started = time.perf_counter()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+        return response
+    finally:
+        # ルートのパステンプレートをラベルにする（パスパラメータで系列が増えないように）
+        route = request.scope.get("route")
+        http_request_duration.observe(
+            time.perf_counter() - started,
+            method=request.method,
+            route=getattr(route, "path", "unmatched"),
+            status=str(status_code),
+        )
+
+# キャッシュやレートリミッターの状態をメトリクスとして出力する
+registry.register_collector(lambda: {
+    "search_cache_hits": search_cache.hits,
+    "search_cache_misses": search_cache.misses,
+    "search_cache_entries": len(search_cache.memory),
+    "catalog_index_tracks": len(catalog_index),
+    "catalog_index_hits": catalog_index.hits,
+    "rate_limiter_concurrency_limit": rate_limiter.concurrency_limit,
+    "rate_limiter_in_flight": rate_limiter.in_flight,
+    "single_flight_shared_searches": search_flight.shared,
+    "jobs_queued": job_manager.stats()["queued"],
+    "jobs_running": job_manager.stats()["running"],
+    "resolution_store_pending": resolution_store.stats()["pending"],
+})
 
-# spotipyライブラリからの例外を一元的に処理するハンドラ
-@app.exception_handler(spotipy.exceptions.SpotifyException)
-async def spotify_exception_handler(request: Request, exc: spotipy.exceptions.SpotifyException):
+# Spotify APIの例外を一元的に処理するハンドラ
+@app.exception_handler(SpotifyException)
+async def spotify_exception_handler(request: Request, exc: SpotifyException):
     """
-    spotipyライブラリが投げる例外を捕捉し、適切なHTTPステータスコードと
+    Spotify APIクライアントが投げる例外を捕捉し、適切なHTTPステータスコードと
     エラーメッセージをJSONレスポンスとして返します。
     """
     status_code = status.HTTP_502_BAD_GATEWAY
@@ -74,38 +158,67 @@ async def health_check():
         "status": "healthy",
         "environment": ENVIRONMENT,
         "static_dir_exists": STATIC_DIR.exists(),
-        "static_files": list(STATIC_DIR.glob("*")) if STATIC_DIR.exists() else []
+        "static_files": static_site.stats() if static_site is not None else None,
+        "search_cache": search_cache.stats(),
+        "rate_limiter": rate_limiter.stats(),
+        "single_flight": {"search": search_flight.stats(), "user": user_flight.stats()},
+        "catalog_index": catalog_index.stats(),
+        "jobs": job_manager.stats(),
+        "resolution_store": resolution_store.stats()
     }
 
+# Prometheus形式のメトリクスを返すエンドポイント
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics(authorization: Optional[str] = Header(None)):
+    """
+    Prometheus形式のメトリクスを返します。
+    METRICS_TOKEN を設定した場合は、そのトークンを Authorization: Bearer で指定する必要があります。
+    本番環境で METRICS_TOKEN が未設定の場合は公開しません（ルートごとの利用状況が見えてしまうため）。
+    """
+    if settings.metrics_token is None:
+        if IS_PRODUCTION:
+            return JSONResponse(status_code=status.HTTP_404_NOT_FOUND, content={"detail": "Not Found"})
+    elif not hmac.compare_digest((authorization or "").encode(), f"Bearer {settings.metrics_token}".encode()):
+        return JSONResponse(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            content={"detail": "メトリクスの取得には認証が必要です"},
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 # APIルーター登録（静的ファイルより先に）
 app.include_router(auth.router, prefix="/auth")
 app.include_router(playlist.router, prefix="/playlist")
+app.include_router(jobs.router, prefix="/jobs")
 
 # 静的ファイル配信の設定（本番環境のみ）
 if IS_PRODUCTION and STATIC_DIR.exists():
-    # 静的アセット用（JS, CSS, 画像など）
-    app.mount("/assets", StaticFiles(directory=STATIC_DIR / "assets"), name="assets")
-    
+    # 起動時にビルド済みファイルをインデックス化し、リクエスト時はメモリ上の対応表だけを参照する
+    static_site = StaticSite(STATIC_DIR)
+    logger.info("Static files indexed", extra=static_site.stats())
+
     # SPAフォールバック用のカスタムハンドラ
-    @app.get("/{path:path}")
-    async def serve_spa(path: str):
+    @app.api_route("/{path:path}", methods=["GET", "HEAD"])
+    async def serve_spa(path: str, request: Request):
         """
-        SPA用のフォールバックハンドラ。
-        存在しないパスはindex.htmlを返す。
+        ビルド済みのフロントエンドを配信するハンドラ。
+        存在するファイルはそのまま返し、それ以外のパスはindex.htmlを返す（SPAフォールバック）。
         """
         # APIパスは除外
-        if path.startswith(("auth/", "playlist/", "health")):
+        if path.startswith(("auth/", "playlist/", "jobs/", "health", "metrics")):
             return JSONResponse(status_code=404, content={"detail": "API endpoint not found"})
-        
-        # 静的ファイル（拡張子あり）の場合
-        file_path = STATIC_DIR / path
-        if file_path.exists() and file_path.is_file():
-            return FileResponse(file_path)
-        
+
+        asset = static_site.lookup(path)
+        if asset is not None:
+            return static_site.response(asset, request.headers)
+
+        # 存在しないアセットにindex.htmlを返すと、ブラウザがHTMLをJSとして解釈してしまう
+        if path.startswith(IMMUTABLE_PREFIX):
+            return JSONResponse(status_code=404, content={"detail": "Asset not found"})
+
         # その他はすべてindex.htmlを返す（SPAフォールバック）
-        index_path = STATIC_DIR / "index.html"
-        if index_path.exists():
-            return FileResponse(index_path)
+        if static_site.index is not None:
+            return static_site.response(static_site.index, request.headers)
         else:
             return JSONResponse(status_code=500, content={"detail": "Frontend files not found"})
 else:
@@ -1,17 +1,36 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Literal, Optional
 
 class TrackQuery(BaseModel):
     """複数トラック検索APIへのリクエストで利用する、個々のクエリを表すモデル"""
     track_name: str
     artist_name: Optional[str] = None
 
+class SetlistParseRequest(BaseModel):
+    """セットリストのテキスト解析APIへのリクエストボディを表すモデル"""
+    text: str = Field(..., max_length=100_000, description="セットリストサイトなどから貼り付けたテキスト（1行1曲）")
+    artist_name: Optional[str] = Field(None, description="曲名だけの行に使うアーティスト名")
+    include_tapes: bool = Field(False, description="テープ（SE・音源の再生）の行も曲として含める")
+
+class SetlistParseResponse(BaseModel):
+    """セットリストのテキスト解析APIのレスポンスを表すモデル"""
+    queries: List[TrackQuery] = Field(..., description="一括検索にそのまま渡せるクエリ（セットリスト順、重複は除く）")
+    skipped: List[str] = Field(default=[], description="曲として扱わなかった行（見出し・MC・テープなど）")
+    duplicates: int = Field(0, description="重複として除いた曲の数")
+
 class PlaylistCreateRequest(BaseModel):
     """プレイリスト作成APIへのリクエストボディを表すモデル"""
     name: str = Field(..., min_length=1, description="プレイリスト名")
     description: Optional[str] = Field("", description="プレイリストの説明")
     public: bool = Field(True, description="公開設定（True: 公開, False: 非公開）")
-    track_uris: List[str] = Field(default=[], description="追加するトラックのSpotify URIのリスト。例: [\"spotify:track:4iV5W9uYEdYUVa79Axb7Rh\"]")
+    track_uris: List[str] = Field(default=[], description="追加するトラック（またはエピソード）のSpotify URIのリスト。例: [\"spotify:track:4iV5W9uYEdYUVa79Axb7Rh\"]")
+
+class SetlistPlaylistRequest(BaseModel):
+    """セットリスト（検索クエリのリスト）から直接プレイリストを作成するAPIへのリクエストボディを表すモデル"""
+    name: str = Field(..., min_length=1, description="プレイリスト名")
+    description: Optional[str] = Field("", description="プレイリストの説明")
+    public: bool = Field(True, description="公開設定（True: 公開, False: 非公開）")
+    queries: List[TrackQuery] = Field(..., description="セットリスト順の検索クエリのリスト")
 
 class Track(BaseModel):
     """Spotifyのトラック情報を表すモデル"""
@@ -19,11 +38,51 @@ class Track(BaseModel):
     name: str
     artist: Optional[str] = None
     uri: str
+    duration_ms: Optional[int] = None
+
+class TrackMatch(BaseModel):
+    """複数トラック検索で、1件のクエリに対して選ばれたトラックと代替候補を表すモデル"""
+    query: TrackQuery
+    track: Track
+    score: float = Field(..., description="クエリとの一致度（0〜1）")
+    alternates: List[Track] = Field(default=[], description="次点の候補（スコアの高い順）")
 
 class MultipleTracksSearchResponse(BaseModel):
     """複数トラック検索APIのレスポンスを表すモデル"""
     found_tracks: List[Track]
     not_found_tracks: List[TrackQuery]
+    failed_tracks: List[TrackQuery] = Field(default=[], description="レート制限などで検索できなかったクエリ（再試行可能）")
+    matches: List[TrackMatch] = Field(default=[], description="found_tracksと同じ順序の、スコアと代替候補付きの検索結果")
+
+class TrackSearchResult(BaseModel):
+    """ストリーミング検索APIで1行ずつ返す、個々のクエリの検索結果を表すモデル"""
+    index: int = Field(..., description="リクエスト内でのクエリの位置（0始まり）")
+    query: TrackQuery
+    status: Literal["found", "not_found", "failed"]
+    track: Optional[Track] = None
+    score: Optional[float] = None
+    alternates: List[Track] = []
+
+class SearchStreamError(BaseModel):
+    """ストリーミング検索APIで、検索を続けられないエラー（認証エラーなど）により中断したときに最後の行として返すモデル"""
+    status: Literal["error"] = "error"
+    http_status: int = Field(..., description="非ストリーミングの検索APIであれば返すHTTPステータスコード（401/403）")
+    detail: str
+
+class TrackResolveRequest(BaseModel):
+    """トラックURIの一括検証APIへのリクエストボディを表すモデル"""
+    track_uris: List[str] = Field(..., description="検証するトラックのURI・URL・IDのリスト")
+    market: Optional[str] = Field(None, pattern=r"^[A-Z]{2}$", description="再生可否を確認する国コード（例: JP）。指定しない場合は存在のみ確認する")
+
+class TrackReject(BaseModel):
+    """検証で除外されたトラックを表すモデル"""
+    value: str = Field(..., description="入力された値（正規化できた場合はURI）")
+    reason: Literal["invalid", "not_found", "unavailable", "failed"]
+
+class TrackResolveResponse(BaseModel):
+    """トラックURIの一括検証APIのレスポンスを表すモデル"""
+    tracks: List[Track] = Field(..., description="有効なトラック（入力順、重複は除く）")
+    rejected: List[TrackReject] = Field(default=[], description="除外された値と理由（failedは再試行可能）")
 
 class Playlist(BaseModel):
     """Spotifyのプレイリスト情報を表すモデル"""
@@ -32,6 +91,37 @@ class Playlist(BaseModel):
     url: Optional[str] = None
     track_count: int
 
+class PlaylistSyncRequest(BaseModel):
+    """既存プレイリストの差分更新APIへのリクエストボディを表すモデル"""
+    track_uris: List[str] = Field(..., description="更新後のプレイリストのトラックURI（この順に並べる）")
+
+class PlaylistSyncResponse(BaseModel):
+    """既存プレイリストの差分更新APIのレスポンスを表すモデル"""
+    playlist: Playlist
+    strategy: Literal["incremental", "replace", "unchanged"] = Field(..., description="差分で更新したか、丸ごと置き換えたか")
+    added: int = Field(..., description="更新前になかった曲の数（重複は1曲ずつ数える）")
+    removed: int = Field(..., description="更新後に残らなかった曲の数（重複していた分や再生できない曲を含む）")
+    moved: int = Field(..., description="並べ替えで位置が変わった曲数（置き換えの場合は0）")
+    requests: int = Field(..., description="更新に使ったSpotify APIのリクエスト数（読み込みと更新後の確認を含む）")
+
+class SetlistPlaylistResponse(BaseModel):
+    """セットリストからのプレイリスト作成APIのレスポンスを表すモデル"""
+    playlist: Playlist
+    not_found_tracks: List[TrackQuery]
+    failed_tracks: List[TrackQuery] = Field(default=[], description="レート制限などで検索できなかったクエリ（再試行可能）")
+
+class JobStatus(BaseModel):
+    """バックグラウンドジョブの状態を表すモデル"""
+    id: str
+    kind: Literal["search", "setlist"]
+    status: Literal["queued", "running", "succeeded", "failed"]
+    done: int = Field(..., description="処理済みのクエリ数")
+    total: int = Field(..., description="処理するクエリ数（実行開始前は0）")
+    created_at: float
+    updated_at: float
+    result: Optional[Dict[str, Any]] = Field(None, description="完了時の結果（searchはMultipleTracksSearchResponse、setlistはSetlistPlaylistResponse）")
+    error: Optional[str] = None
+
 class UserProfile(BaseModel):
     """APIレスポンス用のユーザープロフィール情報を表すモデル"""
     id: str
@@ -0,0 +1,200 @@
+import os
+import re
+from array import array
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from app.schemas import Track
+from app.services.search_cache import normalize_text
+
+# ローカルカタログの設定
+CATALOG_MAX_TRACKS = int(os.environ.get("CATALOG_MAX_TRACKS", "200000"))
+# この類似度以上であればSpotifyに問い合わせずにローカルの結果を使う
+CATALOG_MIN_SCORE = float(os.environ.get("CATALOG_MIN_SCORE", "0.9"))
+# 類似度を計算する候補数の上限
+CATALOG_CANDIDATES = 20
+# 採点（ランキング）にかける候補数
+CATALOG_RANK_CANDIDATES = 5
+# 候補の絞り込みに使うトライグラム数と、走査するポスティングの合計件数の上限
+CATALOG_PROBE_GRAMS = 8
+CATALOG_PROBE_BUDGET = 5000
+
+# 曲名から取り除く付加情報（"feat. ..." や "(Remastered 2011)"、" - Live" など）
+_FEAT_RE = re.compile(r"\s*[\(\[]?\s*(?:feat\.?|ft\.?|featuring)\s+[^\)\]]*[\)\]]?\s*$")
+_BRACKET_RE = re.compile(r"\s*[\(\[（【][^\)\]）】]*[\)\]）】]")
+_SUFFIX_RE = re.compile(r"\s+-\s+.*$")
+# カタカナをひらがなに揃える
+_KATAKANA_TO_HIRAGANA = {code: code - 0x60 for code in range(0x30A1, 0x30F7)}
+
+
+def normalize_title(text: Optional[str]) -> str:
+    """曲名・アーティスト名をあいまい検索用に正規化します。"""
+    text = normalize_text(text)
+    text = _FEAT_RE.sub("", text)
+    text = _BRACKET_RE.sub("", text)
+    text = _SUFFIX_RE.sub("", text)
+    text = text.translate(_KATAKANA_TO_HIRAGANA)
+    return " ".join(re.sub(r"[^\w\s]", " ", text).split())
+
+
+def trigrams(text: str) -> Set[str]:
+    """前後に空白を補った文字トライグラムの集合を返します。"""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def dice(a: Set[str], b: Set[str]) -> float:
+    """2つの集合のDice係数（0〜1）を返します。"""
+    if not a or not b:
+        return 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+
+class CatalogMatch:
+    """ローカルカタログでの検索結果。"""
+
+    __slots__ = ("track", "score")
+
+    def __init__(self, track: Track, score: float):
+        self.track = track
+        self.score = score
+
+
+class CatalogIndex:
+    """
+    検索に成功したトラックから構築する、インメモリのあいまい検索インデックス。
+    曲名の文字トライグラムの転置インデックス（array('I')のポスティングリスト）で候補を絞り込み、
+    曲名とアーティスト名のDice係数で類似度を計算します。
+    トラック情報は列ごとの配列で保持し、1曲あたりのオブジェクト数を抑えます。
+    """
+
+    def __init__(self, max_tracks: int = CATALOG_MAX_TRACKS):
+        self.max_tracks = max_tracks
+        self._ids: List[str] = []
+        self._names: List[str] = []
+        self._artists: List[Optional[str]] = []
+        self._durations: List[Optional[int]] = []
+        self._uris: List[str] = []
+        self._norm_titles: List[str] = []
+        self._norm_artists: List[str] = []
+        self._postings: Dict[str, array] = {}
+        self._by_uri: Dict[str, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._uris)
+
+    def add(self, track: Dict[str, Any]) -> None:
+        """トラック情報（Trackのdict）をインデックスに追加します。"""
+        uri = track["uri"]
+        if uri in self._by_uri or len(self._uris) >= self.max_tracks:
+            return
+        title = normalize_title(track["name"])
+        if not title:
+            return
+        doc = len(self._uris)
+        grams = trigrams(title)
+        self._ids.append(track["id"])
+        self._names.append(track["name"])
+        self._artists.append(track.get("artist"))
+        self._durations.append(track.get("duration_ms"))
+        self._uris.append(uri)
+        self._norm_titles.append(title)
+        self._norm_artists.append(normalize_title(track.get("artist")))
+        self._by_uri[uri] = doc
+        for gram in grams:
+            postings = self._postings.get(gram)
+            if postings is None:
+                postings = self._postings[gram] = array("I")
+            postings.append(doc)
+
+    def add_many(self, tracks: Iterable[Dict[str, Any]]) -> None:
+        for track in tracks:
+            self.add(track)
+
+    def _item(self, doc: int) -> Dict[str, Any]:
+        return {
+            "id": self._ids[doc],
+            "name": self._names[doc],
+            "artist": self._artists[doc],
+            "uri": self._uris[doc],
+            "duration_ms": self._durations[doc],
+        }
+
+    def candidates(self, track_name: str, artist_name: Optional[str] = None, limit: int = 5) -> List[Tuple[int, float]]:
+        """類似度の高い順に (内部ID, 類似度) のリストを返します。"""
+        title = normalize_title(track_name)
+        if not title or not self._uris:
+            return []
+        query_grams = trigrams(title)
+
+        # 出現頻度の低いトライグラムのポスティングリストだけを使って候補を絞り込む
+        postings_list = sorted(
+            (postings for postings in map(self._postings.get, query_grams) if postings is not None),
+            key=len,
+        )[:CATALOG_PROBE_GRAMS]
+        overlap: Counter = Counter()
+        scanned = 0
+        for i, postings in enumerate(postings_list):
+            if i >= 2 and scanned + len(postings) > CATALOG_PROBE_BUDGET:
+                break
+            overlap.update(postings)
+            scanned += len(postings)
+        if not overlap:
+            return []
+
+        artist = normalize_title(artist_name)
+        artist_grams = trigrams(artist) if artist else set()
+        scored = []
+        for doc, _ in overlap.most_common(CATALOG_CANDIDATES):
+            norm_title = self._norm_titles[doc]
+            title_score = 1.0 if title == norm_title else dice(query_grams, trigrams(norm_title))
+            if artist_grams:
+                artist_score = 1.0 if artist == self._norm_artists[doc] else dice(artist_grams, trigrams(self._norm_artists[doc]))
+                score = 0.7 * title_score + 0.3 * artist_score
+            else:
+                score = title_score
+            scored.append((doc, score))
+        scored.sort(key=lambda pair: pair[1], reverse=True)
+        return scored[:limit]
+
+    def lookup(
+        self,
+        track_name: str,
+        artist_name: Optional[str],
+        rank: Callable[[str, Optional[str], List[Dict[str, Any]]], List[Tuple[Dict[str, Any], float]]],
+        min_score: float = CATALOG_MIN_SCORE,
+    ) -> Optional[CatalogMatch]:
+        """
+        類似度の高い候補を rank（track_ranking.score_candidates）で採点し、最も一致するトラックを返します。
+        バージョン違い（Live・Karaoke など）は正規化すると同じ曲名になるため、類似度だけでは選びません。
+        採点後のスコアがmin_score未満の場合や、アーティスト名が指定されていない場合（同名の別の曲と
+        区別できない）はNoneを返します。
+        """
+        if not normalize_title(artist_name):
+            return None
+        candidates = [
+            self._item(doc)
+            for doc, score in self.candidates(track_name, artist_name, limit=CATALOG_RANK_CANDIDATES)
+            if score >= min_score
+        ]
+        ranked = rank(track_name, artist_name, candidates)
+        if ranked and ranked[0][1] >= min_score:
+            self.hits += 1
+            return CatalogMatch(Track(**ranked[0][0]), ranked[0][1])
+        self.misses += 1
+        return None
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "tracks": len(self._uris),
+            "trigrams": len(self._postings),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
+
+
+# アプリケーション全体で共有するローカルカタログのシングルトンインスタンス
+catalog_index = CatalogIndex()
@@ -0,0 +1,530 @@
+import os
+import json
+import time
+import uuid
+import asyncio
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, asdict, field, replace
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, TypeVar
+from app.services.spotify_client import SpotifyException
+from app.core.metrics import job_duration
+
+logger = logging.getLogger(__name__)
+
+# バックグラウンドジョブの設定
+#   JOB_WORKERS:         1プロセスあたりの同時実行ジョブ数
+#   JOB_QUEUE_MAX:       1プロセスあたりの待機ジョブ数の上限（超えると受付を断る）
+#   JOB_STORE_BACKEND:   ジョブの状態の保存先（memory | sqlite）。複数ワーカーの場合はsqliteで共有する
+#   JOB_RESULT_TTL:      完了したジョブの状態・結果を保持する時間（秒）
+#   JOB_MAX_ENTRIES:     メモリのストアで保持するジョブ数の上限（超えると古い完了済みのジョブから削除する）
+#   JOB_DRAIN_TIMEOUT:   終了時に実行中のジョブの完了を待つ時間（秒）
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_QUEUE_MAX = int(os.environ.get("JOB_QUEUE_MAX", "100"))
+JOB_STORE_BACKEND = os.environ.get("JOB_STORE_BACKEND", "memory")  # memory | sqlite
+JOB_STORE_PATH = os.environ.get("JOB_STORE_PATH", "/tmp/spotify_jobs.sqlite3")
+JOB_RESULT_TTL = float(os.environ.get("JOB_RESULT_TTL", str(24 * 60 * 60)))
+JOB_MAX_ENTRIES = int(os.environ.get("JOB_MAX_ENTRIES", "500"))
+JOB_DRAIN_TIMEOUT = float(os.environ.get("JOB_DRAIN_TIMEOUT", "25"))
+# 進捗を共有ストアに書き込む間隔・ほかのワーカーのジョブを監視するときのポーリング間隔（秒）
+JOB_PROGRESS_INTERVAL = float(os.environ.get("JOB_PROGRESS_INTERVAL", "0.5"))
+
+TERMINAL_STATUSES = ("succeeded", "failed")
+# SQLiteにJSONで保存する列
+_JSON_COLUMNS = ("result", "checkpoint")
+
+
+class JobQueueFullError(Exception):
+    """待機中のジョブが上限に達していて、新しいジョブを受け付けられない場合に発生します。"""
+
+
+class IdempotencyConflictError(Exception):
+    """同じ冪等キーで異なる内容のジョブが投入された場合に発生します。"""
+
+
+@dataclass
+class Job:
+    """バックグラウンドジョブの状態。"""
+
+    id: str
+    kind: str
+    owner: str
+    fingerprint: str
+    idempotency_key: Optional[str] = None
+    status: str = "queued"  # queued | running | succeeded | failed
+    done: int = 0
+    total: int = 0
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    # 再実行時に引き継ぐ途中経過（作成済みのプレイリストIDなど）
+    checkpoint: Optional[Dict[str, Any]] = None
+    created_at: float = field(default_factory=time.time)
+    updated_at: float = field(default_factory=time.time)
+    worker_pid: int = field(default_factory=os.getpid)
+
+    @property
+    def finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+
+class JobStore(ABC):
+    """
+    ジョブの状態の保存先の基底クラス。
+    blocking が True のストア（ファイルI/Oを伴うもの）は、JobManager がスレッドプールで呼び出します。
+    """
+
+    blocking = False
+
+    @abstractmethod
+    def create(self, job: Job) -> Job:
+        """
+        ジョブを保存します。同じ所有者・冪等キーの（失敗していない）ジョブがすでにあればそれを返します。
+        失敗したジョブと同じ内容であれば、その途中経過（checkpoint）を引き継ぎます。
+        """
+
+    @abstractmethod
+    def save(self, job: Job) -> None:
+        """ジョブの状態を更新します。"""
+
+    def save_many(self, jobs: List[Job]) -> None:
+        """複数のジョブの状態をまとめて更新します。"""
+        for job in jobs:
+            self.save(job)
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Job]:
+        """ジョブの状態を返します。存在しない場合はNoneを返します。"""
+
+    def interrupt_orphans(self) -> int:
+        """実行していたプロセスがすでに存在しない未完了のジョブを失敗扱いにします。"""
+        return 0
+
+
+class MemoryJobStore(JobStore):
+    """
+    プロセス内のメモリに保存するストア（ワーカーが1つの場合向け）。
+    完了したジョブは ttl 秒で削除し、max_entries 件を超えた場合は古い完了済みのジョブから削除します
+    （実行中・待機中のジョブは JOB_QUEUE_MAX で上限があるため削除しません）。
+    """
+
+    def __init__(self, ttl: float = JOB_RESULT_TTL, max_entries: int = JOB_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._jobs: Dict[str, Job] = {}
+        self._keys: Dict[tuple, str] = {}
+
+    def _evict(self) -> None:
+        """期限切れの完了済みジョブを削除し、新しいジョブ1件分の空きを作ります。"""
+        expires = time.time() - self.ttl
+        for job in [job for job in self._jobs.values() if job.finished and job.updated_at < expires]:
+            self._remove(job)
+        overflow = len(self._jobs) + 1 - self.max_entries
+        if overflow > 0:
+            finished = sorted((job for job in self._jobs.values() if job.finished), key=lambda job: job.updated_at)
+            for job in finished[:overflow]:
+                self._remove(job)
+
+    def _remove(self, job: Job) -> None:
+        del self._jobs[job.id]
+        if self._keys.get((job.owner, job.idempotency_key)) == job.id:
+            del self._keys[(job.owner, job.idempotency_key)]
+
+    def create(self, job: Job) -> Job:
+        self._evict()
+        if job.idempotency_key:
+            existing = self._jobs.get(self._keys.get((job.owner, job.idempotency_key), ""))
+            if existing is not None and existing.status != "failed":
+                return existing
+            if existing is not None:
+                _inherit_checkpoint(job, existing)
+            self._keys[(job.owner, job.idempotency_key)] = job.id
+        self._jobs[job.id] = job
+        return job
+
+    def save(self, job: Job) -> None:
+        self._jobs[job.id] = job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+
+class SQLiteJobStore(JobStore):
+    """
+    ローカルのSQLiteファイルに保存するストア。
+    同一ホスト上の複数のGunicornワーカー間でジョブの状態を共有し、どのワーカーでも進捗を取得できます。
+    """
+
+    _COLUMNS = tuple(Job.__dataclass_fields__)
+    blocking = True
+
+    def __init__(self, path: str, ttl: float = JOB_RESULT_TTL):
+        self.path = path
+        self.ttl = ttl
+        self._local = threading.local()
+        self._writes = 0
+        # Gunicornのpreloadでマスタープロセスが開いた接続をforkしたワーカーで使わないようにする
+        os.register_at_fork(after_in_child=self._reset_connections)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " id TEXT PRIMARY KEY, kind TEXT NOT NULL, owner TEXT NOT NULL, fingerprint TEXT NOT NULL,"
+                " idempotency_key TEXT, status TEXT NOT NULL, done INTEGER NOT NULL, total INTEGER NOT NULL,"
+                " result TEXT, error TEXT, checkpoint TEXT,"
+                " created_at REAL NOT NULL, updated_at REAL NOT NULL, worker_pid INTEGER NOT NULL)"
+            )
+            # checkpoint 列がない以前のデータベースには列を追加する
+            if "checkpoint" not in {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}:
+                conn.execute("ALTER TABLE jobs ADD COLUMN checkpoint TEXT")
+            # 冪等キーの重複はワーカーをまたいでもデータベースの一意制約で防ぐ
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_jobs_idempotency ON jobs (owner, idempotency_key)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_updated ON jobs (updated_at)")
+
+    def _reset_connections(self) -> None:
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3の接続はスレッドごとに保持する
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _row(self, job: Job) -> tuple:
+        values = asdict(job)
+        for column in _JSON_COLUMNS:
+            value = values[column]
+            values[column] = json.dumps(value, ensure_ascii=False) if value is not None else None
+        return tuple(values[column] for column in self._COLUMNS)
+
+    def _job(self, row: tuple) -> Job:
+        values = dict(zip(self._COLUMNS, row))
+        for column in _JSON_COLUMNS:
+            values[column] = json.loads(values[column]) if values[column] is not None else None
+        return Job(**values)
+
+    def _select(self, where: str, params: tuple) -> Optional[Job]:
+        row = self._connect().execute(f"SELECT {', '.join(self._COLUMNS)} FROM jobs WHERE {where}", params).fetchone()
+        return self._job(row) if row else None
+
+    def create(self, job: Job) -> Job:
+        conn = self._connect()
+        placeholders = ", ".join("?" for _ in self._COLUMNS)
+        while True:
+            try:
+                conn.execute(f"INSERT INTO jobs ({', '.join(self._COLUMNS)}) VALUES ({placeholders})", self._row(job))
+                break
+            except sqlite3.IntegrityError:
+                existing = self._select("owner = ? AND idempotency_key = ?", (job.owner, job.idempotency_key))
+                if existing is not None and existing.status != "failed":
+                    return existing
+                if existing is not None:
+                    _inherit_checkpoint(job, existing)
+                # 失敗したジョブの冪等キーは再実行のために解放する
+                conn.execute(
+                    "UPDATE jobs SET idempotency_key = NULL WHERE owner = ? AND idempotency_key = ? AND status = 'failed'",
+                    (job.owner, job.idempotency_key),
+                )
+        self._writes += 1
+        # 書き込み回数に応じて保持期間を過ぎた完了済みのジョブをまとめて削除する
+        if self._writes % 100 == 0:
+            conn.execute(
+                "DELETE FROM jobs WHERE status IN ('succeeded', 'failed') AND updated_at <= ?", (time.time() - self.ttl,)
+            )
+        return job
+
+    def save(self, job: Job) -> None:
+        assignments = ", ".join(f"{column} = ?" for column in self._COLUMNS[1:])
+        self._connect().execute(f"UPDATE jobs SET {assignments} WHERE id = ?", self._row(job)[1:] + (job.id,))
+
+    def save_many(self, jobs: List[Job]) -> None:
+        assignments = ", ".join(f"{column} = ?" for column in self._COLUMNS[1:])
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(f"UPDATE jobs SET {assignments} WHERE id = ?", [self._row(job)[1:] + (job.id,) for job in jobs])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._select("id = ?", (job_id,))
+
+    def interrupt_orphans(self) -> int:
+        conn = self._connect()
+        rows = conn.execute("SELECT id, worker_pid FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+        # 起動直後のこのプロセスはまだジョブを持たないため、同じPID（コンテナの再起動でPIDが再利用された場合）も中断扱いにする
+        orphans = [job_id for job_id, pid in rows if pid == os.getpid() or not _process_alive(pid)]
+        for job_id in orphans:
+            conn.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, updated_at = ? WHERE id = ?",
+                ("interrupted by a server restart", time.time(), job_id),
+            )
+        return len(orphans)
+
+
+def _inherit_checkpoint(job: Job, failed: Job) -> None:
+    """同じ冪等キー・同じ内容で再投入されたジョブに、失敗したジョブの途中経過を引き継ぎます。"""
+    if failed.kind == job.kind and failed.fingerprint == job.fingerprint:
+        job.checkpoint = failed.checkpoint
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+JobRunner = Callable[[Job], Awaitable[Dict[str, Any]]]
+_T = TypeVar("_T")
+
+
+class JobManager:
+    """
+    プロセス内のワーカーでジョブを順に実行するバックグラウンドジョブの実行基盤。
+
+    submit() でジョブをストアに登録してキューに入れ、JOB_WORKERS 個のワーカータスクが取り出して実行します。
+    状態はストアに保存するため、共有ストア（SQLite）を使えば別のワーカーが受け付けたジョブの進捗も取得できます。
+    ストアの読み込みはスレッドプールで行い、状態の更新は1つの書き込みタスクがまとめて書き込むため、
+    イベントループを止めません。
+    冪等キー付きのジョブは、同じ所有者・キーのジョブがすでにあれば新しく実行せずにそれを返します。
+
+    実行にはリクエスト時のアクセストークンが必要なため、トークンはストアに保存しません。
+    再起動で中断したジョブは失敗扱いになり、同じ冪等キーで再投入すると途中経過（checkpoint）を引き継いで実行し直せます。
+    """
+
+    def __init__(self, store: JobStore, workers: int = JOB_WORKERS, queue_size: int = JOB_QUEUE_MAX):
+        self.store = store
+        self.worker_count = workers
+        self.queue_size = queue_size
+        self._queue: Optional["asyncio.Queue[Job]"] = None
+        self._workers: List[asyncio.Task] = []
+        # このプロセスで実行中・待機中のジョブ
+        self._active: Dict[str, Job] = {}
+        self._runners: Dict[str, JobRunner] = {}
+        self._changed: Dict[str, asyncio.Event] = {}
+        self._last_saved: Dict[str, float] = {}
+        # ストアへの未書き込みの状態（ジョブID -> その時点の状態）と、書き込み中の状態
+        self._unsaved: Dict[str, Job] = {}
+        self._writing: Dict[str, Job] = {}
+        self._writer: Optional[asyncio.Task] = None
+        self.submitted = 0
+        self.deduplicated = 0
+
+    async def start(self) -> None:
+        """ワーカータスクを起動します（アプリケーションの起動時に呼び出します）。"""
+        if self._workers:
+            return
+        interrupted = await self._call(self.store.interrupt_orphans)
+        if interrupted:
+            logger.warning("Marked interrupted background jobs as failed", extra={"jobs": interrupted})
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.worker_count)]
+
+    async def stop(self, timeout: float = JOB_DRAIN_TIMEOUT) -> None:
+        """
+        ワーカーを停止します。実行中のジョブはtimeout秒まで完了を待ち、
+        終わらなかったジョブと待機中のジョブは失敗扱いにします。
+        """
+        if not self._workers:
+            return
+        running = [job for job in self._active.values() if job.status == "running"]
+        if running:
+            deadline = time.monotonic() + timeout
+            while any(not job.finished for job in running) and time.monotonic() < deadline:
+                await asyncio.sleep(0.1)
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for job in list(self._active.values()):
+            self._finish(job, "failed", error="interrupted by a server shutdown")
+        await self.flush()
+
+    async def _call(self, method: Callable[..., _T], *args: Any) -> _T:
+        if self.store.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    async def submit(self, kind: str, owner: str, fingerprint: str, runner: JobRunner, idempotency_key: Optional[str] = None) -> Job:
+        """
+        ジョブを登録してキューに入れ、その状態を返します。
+        冪等キーが同じで内容（fingerprint）が異なる場合は IdempotencyConflictError、
+        キューが一杯の場合は JobQueueFullError を送出します。
+        """
+        if self._queue is None:
+            raise RuntimeError("JobManager is not started")
+        if self._queue.full():
+            raise JobQueueFullError("too many queued jobs")
+
+        job = Job(id=uuid.uuid4().hex, kind=kind, owner=owner, fingerprint=fingerprint, idempotency_key=idempotency_key)
+        stored = await self._call(self.store.create, job)
+        # ストアへの書き込み中にほかのジョブでキューが一杯になった場合
+        if stored.id == job.id and self._queue.full():
+            self._finish(job, "failed", error="too many queued jobs")
+            raise JobQueueFullError("too many queued jobs")
+        if stored.id != job.id:
+            if stored.fingerprint != fingerprint or stored.kind != kind:
+                raise IdempotencyConflictError("idempotency key was already used for a different request")
+            self.deduplicated += 1
+            return self._active.get(stored.id, stored)
+
+        self._active[job.id] = job
+        self._runners[job.id] = runner
+        self._changed[job.id] = asyncio.Event()
+        self._queue.put_nowait(job)
+        self.submitted += 1
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        """
+        ジョブの状態を返します。このプロセスのジョブ（未書き込みの状態を含む）はメモリから、
+        それ以外はストアから取得します。
+        """
+        job = self._active.get(job_id) or self._unsaved.get(job_id) or self._writing.get(job_id)
+        if job is not None:
+            return job
+        return await self._call(self.store.get, job_id)
+
+    async def watch(self, job_id: str) -> AsyncIterator[Job]:
+        """ジョブの状態が変わるたびにその状態を返し、完了したら終了する非同期ジェネレーター。"""
+        last_update = None
+        while True:
+            job = await self.get(job_id)
+            if job is None:
+                return
+            if job.updated_at != last_update:
+                last_update = job.updated_at
+                yield job
+            if job.finished:
+                return
+            event = self._changed.get(job_id)
+            if event is None:
+                # ほかのワーカーのジョブはストアをポーリングする
+                await asyncio.sleep(JOB_PROGRESS_INTERVAL)
+            else:
+                await event.wait()
+
+    def progress(self, job: Job, done: int, total: int) -> None:
+        """ジョブの進捗を更新します。共有ストアへの書き込みは JOB_PROGRESS_INTERVAL ごとにまとめます。"""
+        job.done, job.total = done, total
+        job.updated_at = time.time()
+        self._notify(job)
+        if job.updated_at - self._last_saved.get(job.id, 0.0) >= JOB_PROGRESS_INTERVAL or done == total:
+            self._save(job)
+
+    def checkpoint(self, job: Job, checkpoint: Dict[str, Any]) -> None:
+        """
+        ジョブの途中経過を保存します。中断・失敗したジョブを同じ冪等キーで再投入すると、
+        新しいジョブの checkpoint として引き継がれます。
+        """
+        job.checkpoint = checkpoint
+        job.updated_at = time.time()
+        self._save(job)
+
+    def _notify(self, job: Job) -> None:
+        event = self._changed.get(job.id)
+        if event is not None:
+            event.set()
+            # 待機中のwatch()を起こしたら、次の変更のために新しいイベントに差し替える
+            self._changed[job.id] = asyncio.Event()
+
+    def _save(self, job: Job) -> None:
+        """ジョブのその時点の状態を書き込み待ちにし、書き込みタスクが動いていなければ起動します。"""
+        self._last_saved[job.id] = time.time()
+        self._unsaved[job.id] = replace(job)
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_unsaved())
+
+    async def _write_unsaved(self) -> None:
+        try:
+            # 書き込み中にたまった分は次の書き込みでまとめて送る（同じジョブは最新の状態だけを書き込む）
+            while self._unsaved:
+                self._writing, self._unsaved = self._unsaved, {}
+                try:
+                    await self._call(self.store.save_many, list(self._writing.values()))
+                except sqlite3.Error:
+                    logger.warning("Failed to persist background job state", extra={"jobs": len(self._writing)}, exc_info=True)
+                finally:
+                    self._writing = {}
+        finally:
+            self._writer = None
+
+    async def flush(self) -> None:
+        """未書き込みのジョブの状態をストアに書き込みます。"""
+        if self._writer is not None and not self._writer.done():
+            await asyncio.shield(self._writer)
+
+    def _finish(self, job: Job, status: str, result: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        job.status, job.result, job.error = status, result, error
+        job.updated_at = time.time()
+        self._save(job)
+        self._notify(job)
+        for registry in (self._active, self._runners, self._changed, self._last_saved):
+            registry.pop(job.id, None)
+
+    async def _work(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job) -> None:
+        runner = self._runners.get(job.id)
+        if runner is None:
+            return
+        job.status = "running"
+        job.updated_at = time.time()
+        self._save(job)
+        self._notify(job)
+        started = time.perf_counter()
+        try:
+            result = await runner(job)
+        except asyncio.CancelledError:
+            self._finish(job, "failed", error="interrupted by a server shutdown")
+            raise
+        except SpotifyException as e:
+            self._finish(job, "failed", error=f"Spotify APIエラー: {e.msg}")
+        except Exception:
+            logger.exception("Background job failed", extra={"job_id": job.id, "kind": job.kind})
+            self._finish(job, "failed", error="ジョブの実行中に予期せぬエラーが発生しました。")
+        else:
+            self._finish(job, "succeeded", result=result)
+        job_duration.observe(time.perf_counter() - started, kind=job.kind, status=job.status)
+
+    @property
+    def busy(self) -> bool:
+        """このプロセスに実行中・待機中のジョブがあるかどうか。"""
+        return bool(self._active)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "store": type(self.store).__name__,
+            "workers": len(self._workers),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": sum(1 for job in self._active.values() if job.status == "running"),
+            "unsaved": len(self._unsaved) + len(self._writing),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+        }
+
+
+def build_job_manager() -> JobManager:
+    """環境変数の設定に従ってジョブの実行基盤を生成します。"""
+    store: JobStore = SQLiteJobStore(JOB_STORE_PATH) if JOB_STORE_BACKEND == "sqlite" else MemoryJobStore()
+    return JobManager(store)
+
+
+# アプリケーション全体で共有するジョブの実行基盤のシングルトンインスタンス
+job_manager = build_job_manager()
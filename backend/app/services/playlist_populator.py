@@ -0,0 +1,96 @@
+import asyncio
+from typing import List, Optional
+from app.services.spotify_client import AsyncSpotifyClient, SpotifyException
+from app.services.rate_limiter import backoff_delay
+
+# Spotify APIは一度に100曲までしか追加できない
+PLAYLIST_CHUNK_SIZE = 100
+PLAYLIST_ADD_MAX_ATTEMPTS = 3
+
+
+class PlaylistPopulator:
+    """
+    プレイリストへのトラック追加キュー。
+
+    feed() で渡されたURIを100件ずつのチャンクにまとめ、バックグラウンドで1件ずつ順に送信します。
+    各チャンクは追加済みの曲数を位置（position）として指定して挿入するため、
+    リトライしても曲順が崩れません。送信は呼び出し元の処理（検索など）と並行して進みます。
+
+    同じプレイリストへのチャンクを同時に送ることはしません。Spotifyの位置指定挿入は
+    適用時点のプレイリスト長を基準とし（長さを超える位置はエラーになる）、追加APIは
+    snapshot_id による順序の指定にも対応していないため、同時に送ると曲順を保証できません。
+    """
+
+    def __init__(self, client: AsyncSpotifyClient, playlist_id: str, snapshot_id: Optional[str] = None):
+        self.client = client
+        self.playlist_id = playlist_id
+        self.snapshot_id = snapshot_id
+        self.added = 0
+        self._buffer: List[str] = []
+        self._queue: "asyncio.Queue[Optional[List[str]]]" = asyncio.Queue()
+        self._sender: Optional[asyncio.Task] = None
+
+    def feed(self, uris: List[str]) -> None:
+        """追加するURIを順番に渡します。100件たまるごとに送信を開始します。"""
+        self._buffer.extend(uris)
+        while len(self._buffer) >= PLAYLIST_CHUNK_SIZE:
+            self._enqueue(self._buffer[:PLAYLIST_CHUNK_SIZE])
+            del self._buffer[:PLAYLIST_CHUNK_SIZE]
+
+    async def finish(self) -> int:
+        """残りのURIを送信し、すべてのチャンクの追加が完了するまで待ちます。追加した曲数を返します。"""
+        if self._buffer:
+            self._enqueue(self._buffer)
+            self._buffer = []
+        if self._sender is not None:
+            self._queue.put_nowait(None)
+            await self._sender
+        return self.added
+
+    async def populate(self, uris: List[str]) -> int:
+        """URIのリストをまとめて追加します。"""
+        self.feed(uris)
+        return await self.finish()
+
+    def cancel(self) -> None:
+        """送信中のチャンクを破棄します。"""
+        if self._sender is not None:
+            self._sender.cancel()
+
+    def _enqueue(self, chunk: List[str]) -> None:
+        if self._sender is None:
+            self._sender = asyncio.create_task(self._run())
+        self._queue.put_nowait(chunk)
+
+    async def _run(self) -> None:
+        while True:
+            chunk = await self._queue.get()
+            if chunk is None:
+                return
+            await self._add_chunk(chunk)
+
+    async def _add_chunk(self, chunk: List[str]) -> None:
+        """
+        チャンクを現在の末尾に位置指定で追加します。
+        結果が不明な失敗（5xxや通信エラー）の場合は、曲数を確認して未適用のときだけ、
+        ジッター付きバックオフの後に再送します。
+        """
+        position = self.added
+        for attempt in range(1, PLAYLIST_ADD_MAX_ATTEMPTS + 1):
+            try:
+                result = await self.client.playlist_add_items(self.playlist_id, chunk, position=position)
+                self.snapshot_id = (result or {}).get("snapshot_id", self.snapshot_id)
+                break
+            except SpotifyException as e:
+                if e.http_status < 500 or attempt == PLAYLIST_ADD_MAX_ATTEMPTS:
+                    raise
+                current = await self.client.playlist(self.playlist_id, fields="snapshot_id,tracks.total")
+                total = current.get("tracks", {}).get("total", 0)
+                if total == position + len(chunk):
+                    # 実際には適用されていた
+                    self.snapshot_id = current.get("snapshot_id", self.snapshot_id)
+                    break
+                if total != position:
+                    raise
+                await asyncio.sleep(backoff_delay(attempt - 1))
+        self.added = position + len(chunk)
@@ -0,0 +1,247 @@
+import os
+import asyncio
+import bisect
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+from app.services.spotify_client import AsyncSpotifyClient, SpotifyException
+from app.services.playlist_populator import PLAYLIST_CHUNK_SIZE, PLAYLIST_ADD_MAX_ATTEMPTS
+from app.services.rate_limiter import backoff_delay
+
+# 差分の適用に使えるリクエスト数の余裕（丸ごと置き換える場合のリクエスト数との差）
+# 差分で更新すると残した曲の追加日時が保たれるため、多少リクエストが増えても差分を優先する
+PLAYLIST_SYNC_REPLACE_MARGIN = int(os.environ.get("PLAYLIST_SYNC_REPLACE_MARGIN", "3"))
+
+# 既存プレイリストの読み込み時に取得するフィールド（最初の100件はプレイリスト本体と一緒に取得する）
+_PLAYLIST_FIELDS = "id,name,snapshot_id,external_urls,tracks(total,items(track(uri)))"
+_ITEMS_FIELDS = "items(track(uri))"
+# 更新後の曲数の確認に取得するフィールド
+_CONFIRM_FIELDS = "snapshot_id,tracks(total)"
+
+
+def _chunk_count(size: int) -> int:
+    return -(-size // PLAYLIST_CHUNK_SIZE)
+
+
+def _lis_length(values: Sequence[int]) -> int:
+    """最長増加部分列の長さを返します（その分の曲は移動せずに済む）。"""
+    tails: List[int] = []
+    for value in values:
+        index = bisect.bisect_left(tails, value)
+        if index == len(tails):
+            tails.append(value)
+        else:
+            tails[index] = value
+    return len(tails)
+
+
+def net_changes(current: Sequence[Optional[str]], target: Sequence[str]) -> Tuple[int, int]:
+    """
+    更新前後の曲の差分（重複を数える多重集合の差）から (追加数, 削除数) を返します。
+    URIのない曲は目標に含まれないため、すべて削除として数えます。
+    """
+    before, after = Counter(current), Counter(target)
+    return sum((after - before).values()), sum((before - after).values())
+
+
+@dataclass
+class SyncPlan:
+    """
+    既存プレイリストを目標の曲順に揃えるための操作の一覧。
+    removals → moves → inserts の順に適用します。
+    """
+
+    # 削除するURI（Spotifyの削除はURI指定で、そのURIのすべての出現を削除する）
+    removals: List[str] = field(default_factory=list)
+    # (range_start, insert_before, range_length) の並べ替え。適用順に並ぶ
+    moves: List[Tuple[int, int, int]] = field(default_factory=list)
+    # (position, uris) の位置指定追加。適用順に並ぶ
+    inserts: List[Tuple[int, List[str]]] = field(default_factory=list)
+    # 並べ替えで位置が変わる曲数
+    moved: int = 0
+
+    @property
+    def added(self) -> int:
+        return sum(len(uris) for _, uris in self.inserts)
+
+    @property
+    def request_count(self) -> int:
+        return _chunk_count(len(self.removals)) + len(self.moves) + len(self.inserts)
+
+
+def replace_request_count(target: Sequence[str]) -> int:
+    """プレイリストを丸ごと置き換える場合のリクエスト数（置き換え1回 + 残りの追加）。"""
+    return 1 + _chunk_count(max(0, len(target) - PLAYLIST_CHUNK_SIZE))
+
+
+def plan_sync(current: Sequence[str], target: Sequence[str], max_requests: Optional[int] = None) -> Optional[SyncPlan]:
+    """
+    現在の曲順 current を目標 target（重複なし）に揃える差分を計算します。
+
+    1. 目標にないURIと、現在のプレイリストで重複しているURIを削除します
+       （URI指定の削除はすべての出現を消すため、重複していた曲は改めて追加します）。
+    2. 残った曲を目標の順に並べ替えます。連続して並んでいる曲はまとめて1回で移動します。
+    3. 足りない曲を、目標で連続している範囲ごとに位置指定で追加します。
+
+    リクエスト数が max_requests を超える場合は計算を打ち切って None を返します。
+    """
+    target_set = set(target)
+    counts = Counter(current)
+    removals = [uri for uri in counts if uri not in target_set or counts[uri] > 1]
+    removed = set(removals)
+    work = [uri for uri in current if uri not in removed]
+    present = set(work)
+    plan = SyncPlan(removals=removals)
+
+    # 並べ替え：先頭から目標と食い違う位置を探し、目標の曲を含む連続範囲を手前に移動する
+    ordered = [uri for uri in target if uri in present]
+    target_index = {uri: i for i, uri in enumerate(ordered)}
+    plan.moved = len(work) - _lis_length([target_index[uri] for uri in work])
+    base = _chunk_count(len(removals))
+    i = 0
+    while i < len(ordered):
+        if work[i] == ordered[i]:
+            i += 1
+            continue
+        j = work.index(ordered[i], i + 1)
+        length = 1
+        while j + length < len(work) and i + length < len(ordered) and work[j + length] == ordered[i + length]:
+            length += 1
+        plan.moves.append((j, i, length))
+        if max_requests is not None and base + len(plan.moves) > max_requests:
+            return None
+        work[i:i] = work[j:j + length]
+        del work[j + length:j + 2 * length]
+        i += length
+
+    # 追加：目標で連続している不足分を、その先頭の位置に挿入する（前から順に適用する）
+    k = 0
+    while k < len(target):
+        if target[k] in present:
+            k += 1
+            continue
+        start = k
+        while k < len(target) and target[k] not in present and k - start < PLAYLIST_CHUNK_SIZE:
+            k += 1
+        plan.inserts.append((start, list(target[start:k])))
+
+    if max_requests is not None and plan.request_count > max_requests:
+        return None
+    return plan
+
+
+@dataclass
+class SyncResult:
+    playlist: Dict[str, Any]
+    snapshot_id: Optional[str]
+    strategy: str
+    # 更新前後の差分（net_changes を参照）。重複の除去で削除して追加し直した曲は含まない
+    added: int
+    removed: int
+    moved: int
+    requests: int
+    # 更新後にSpotifyから取得した曲数
+    track_count: int
+
+
+class PlaylistSyncer:
+    """
+    既存のプレイリストを目標の曲順に差分で更新します。
+
+    現在の曲をページ単位で並行して読み込み、plan_sync で求めた削除・並べ替え・追加を
+    snapshot_id をつなぎながら順に適用します。差分の適用に、丸ごと置き換える場合より
+    PLAYLIST_SYNC_REPLACE_MARGIN を超えて多くのリクエストが必要な場合や、URIのない曲
+    （配信停止された曲など）が含まれていて位置を計算できない場合は置き換えで更新します。
+    """
+
+    def __init__(self, client: AsyncSpotifyClient, playlist_id: str):
+        self.client = client
+        self.playlist_id = playlist_id
+        self.snapshot_id: Optional[str] = None
+        self.requests = 0
+
+    async def fetch(self) -> Tuple[Dict[str, Any], List[Optional[str]]]:
+        """プレイリスト情報と現在の曲順（URIがない曲は None）を返します。"""
+        playlist = await self.client.playlist(self.playlist_id, fields=_PLAYLIST_FIELDS)
+        self.requests += 1
+        self.snapshot_id = playlist.get("snapshot_id")
+        page = playlist.get("tracks") or {}
+        items = list(page.get("items") or [])
+        total = page.get("total", len(items))
+
+        offsets = range(len(items), total, PLAYLIST_CHUNK_SIZE)
+        pages = await asyncio.gather(*(
+            self.client.playlist_items(self.playlist_id, fields=_ITEMS_FIELDS, limit=PLAYLIST_CHUNK_SIZE, offset=offset)
+            for offset in offsets
+        ))
+        self.requests += len(pages)
+        for result in pages:
+            items.extend(result.get("items") or [])
+        return playlist, [(item.get("track") or {}).get("uri") for item in items]
+
+    async def sync(self, target: List[str]) -> SyncResult:
+        """プレイリストの曲を target（検証・重複除去済み）の順に揃えます。"""
+        playlist, current = await self.fetch()
+        if None in current:
+            plan = None
+        else:
+            plan = plan_sync(current, target, max_requests=replace_request_count(target) + PLAYLIST_SYNC_REPLACE_MARGIN)
+
+        if plan is not None and plan.request_count == 0:
+            return SyncResult(playlist, self.snapshot_id, "unchanged", 0, 0, 0, self.requests, len(current))
+
+        if plan is None:
+            strategy, moved = "replace", 0
+            await self._replace(target)
+        else:
+            strategy, moved = "incremental", plan.moved
+            await self._apply_plan(plan)
+        added, removed = net_changes(current, target)
+        return SyncResult(playlist, self.snapshot_id, strategy, added, removed, moved, self.requests, await self._confirm_count())
+
+    async def _confirm_count(self) -> int:
+        """更新後の曲数をSpotifyから取得します。"""
+        playlist = await self.client.playlist(self.playlist_id, fields=_CONFIRM_FIELDS)
+        self.requests += 1
+        self.snapshot_id = playlist.get("snapshot_id", self.snapshot_id)
+        return (playlist.get("tracks") or {}).get("total", 0)
+
+    async def _apply_plan(self, plan: SyncPlan) -> None:
+        for start in range(0, len(plan.removals), PLAYLIST_CHUNK_SIZE):
+            chunk = plan.removals[start:start + PLAYLIST_CHUNK_SIZE]
+            await self._send(lambda: self.client.playlist_remove_items(self.playlist_id, chunk, snapshot_id=self.snapshot_id))
+        for range_start, insert_before, range_length in plan.moves:
+            await self._send(lambda: self.client.playlist_reorder_items(
+                self.playlist_id, range_start, insert_before, range_length, snapshot_id=self.snapshot_id
+            ))
+        for position, uris in plan.inserts:
+            await self._send(lambda: self.client.playlist_add_items(self.playlist_id, uris, position=position))
+
+    async def _replace(self, target: List[str]) -> None:
+        await self._send(lambda: self.client.playlist_replace_items(self.playlist_id, target[:PLAYLIST_CHUNK_SIZE]))
+        for start in range(PLAYLIST_CHUNK_SIZE, len(target), PLAYLIST_CHUNK_SIZE):
+            chunk = target[start:start + PLAYLIST_CHUNK_SIZE]
+            await self._send(lambda: self.client.playlist_add_items(self.playlist_id, chunk, position=start))
+
+    async def _send(self, request: Callable[[], Awaitable[Dict[str, Any]]]) -> None:
+        """
+        変更リクエストを送信し、snapshot_id を更新します。
+        結果が不明な失敗（5xxや通信エラー）の場合は snapshot_id が変わったかを確認し、
+        変わっていなければ（未適用なら）少し待ってから再送します。
+        """
+        for attempt in range(1, PLAYLIST_ADD_MAX_ATTEMPTS + 1):
+            self.requests += 1
+            try:
+                result = await request()
+                self.snapshot_id = (result or {}).get("snapshot_id", self.snapshot_id)
+                return
+            except SpotifyException as e:
+                if e.http_status < 500 or attempt == PLAYLIST_ADD_MAX_ATTEMPTS:
+                    raise
+                current = await self.client.playlist(self.playlist_id, fields="snapshot_id")
+                self.requests += 1
+                if current.get("snapshot_id") != self.snapshot_id:
+                    # 実際には適用されていた
+                    self.snapshot_id = current.get("snapshot_id")
+                    return
+                await asyncio.sleep(backoff_delay(attempt - 1))
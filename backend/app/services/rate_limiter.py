@@ -0,0 +1,139 @@
+import os
+import time
+import random
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+# レートリミッターの設定（アプリ全体）
+# 同じホストで動くワーカー（WEB_CONCURRENCY）で予算を等分し、ワーカーの合計が上限を超えないようにする
+SPOTIFY_RATE_WORKERS = max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+SPOTIFY_RATE_LIMIT = float(os.environ.get("SPOTIFY_RATE_LIMIT", "20")) / SPOTIFY_RATE_WORKERS    # 1秒あたりのリクエスト数
+SPOTIFY_RATE_BURST = float(os.environ.get("SPOTIFY_RATE_BURST", "40")) / SPOTIFY_RATE_WORKERS    # バースト許容量
+SPOTIFY_MIN_CONCURRENCY = int(os.environ.get("SPOTIFY_MIN_CONCURRENCY", "2"))
+SPOTIFY_INITIAL_CONCURRENCY = max(SPOTIFY_MIN_CONCURRENCY, int(os.environ.get("SPOTIFY_INITIAL_CONCURRENCY", "10")) // SPOTIFY_RATE_WORKERS)
+SPOTIFY_MAX_CONCURRENCY = max(SPOTIFY_MIN_CONCURRENCY, int(os.environ.get("SPOTIFY_MAX_CONCURRENCY", "50")) // SPOTIFY_RATE_WORKERS)
+
+
+class AdaptiveRateLimiter:
+    """
+    トークンバケットとAIMD（加算増加・乗算減少）による同時実行数制御を組み合わせたレートリミッター。
+    ワーカー内のすべてのリクエストで共有し、429を受け取ると同時実行数を半減させ、
+    Retry-Afterの間は新しいリクエストの送信を止めます。
+    """
+
+    def __init__(
+        self,
+        rate: float = SPOTIFY_RATE_LIMIT,
+        burst: float = SPOTIFY_RATE_BURST,
+        min_concurrency: int = SPOTIFY_MIN_CONCURRENCY,
+        initial_concurrency: int = SPOTIFY_INITIAL_CONCURRENCY,
+        max_concurrency: int = SPOTIFY_MAX_CONCURRENCY,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.concurrency_limit = float(max(min_concurrency, min(initial_concurrency, max_concurrency)))
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.throttled_count = 0
+        self._tokens = burst
+        self._last_refill = time.monotonic()
+        self._condition: Optional[asyncio.Condition] = None
+
+    @property
+    def condition(self) -> asyncio.Condition:
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last_refill) * self.rate)
+        self._last_refill = now
+
+    async def acquire(self) -> None:
+        """リクエストを送信してよくなるまで待機します。"""
+        async with self.condition:
+            while True:
+                now = time.monotonic()
+                if now < self.blocked_until:
+                    wait = self.blocked_until - now
+                elif self.in_flight >= int(self.concurrency_limit):
+                    wait = None
+                else:
+                    self._refill()
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        self.in_flight += 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+                try:
+                    await asyncio.wait_for(self.condition.wait(), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def release(self, throttled: bool = False, retry_after: Optional[float] = None) -> None:
+        """リクエストの完了を通知し、結果に応じて同時実行数を調整します。"""
+        async with self.condition:
+            self.in_flight -= 1
+            if throttled:
+                self.throttled_count += 1
+                self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit / 2)
+                if retry_after:
+                    self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            else:
+                self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1 / self.concurrency_limit)
+            self.condition.notify_all()
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator["_Slot"]:
+        """`async with limiter.slot() as slot:` の形で送信枠を確保します。"""
+        await self.acquire()
+        slot = _Slot()
+        try:
+            yield slot
+        finally:
+            await self.release(throttled=slot.throttled, retry_after=slot.retry_after)
+
+    def stats(self) -> Dict[str, Any]:
+        """現在の状態を返します。"""
+        return {
+            "concurrency_limit": round(self.concurrency_limit, 2),
+            "in_flight": self.in_flight,
+            "throttled": self.throttled_count,
+            "blocked_for": round(max(0.0, self.blocked_until - time.monotonic()), 2),
+        }
+
+
+class _Slot:
+    """送信枠ごとの結果（429を受け取ったかどうか）を保持します。"""
+
+    def __init__(self):
+        self.throttled = False
+        self.retry_after: Optional[float] = None
+
+    def mark_throttled(self, retry_after: Optional[float]) -> None:
+        self.throttled = True
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value: Optional[str], default: float = 1.0) -> float:
+    """Retry-Afterヘッダー（秒数）を解釈します。"""
+    try:
+        return max(0.0, float(value)) if value is not None else default
+    except ValueError:
+        return default
+
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0, minimum: float = 0.0) -> float:
+    """
+    ジッター付きの指数バックオフの待機時間を返します。
+    minimum（Retry-Afterなど）に、0〜base * 2^attemptのランダムな値を加えます。
+    """
+    return minimum + random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+# ワーカー内のすべてのリクエストで共有するレートリミッター
+rate_limiter = AdaptiveRateLimiter()
@@ -0,0 +1,234 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+import tempfile
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 検索結果の永続ストアの設定
+#   RESOLUTION_STORE_PATH:            保存先のSQLiteファイル（未設定・空文字列で無効）
+#                                     再起動後も残る場所（永続ボリュームなど）を指定する。
+#                                     Herokuのdynoのファイルシステム（/tmpを含む）は再起動のたびに消える
+#   RESOLUTION_WARM_LIMIT:            起動時にメモリへ読み込む件数（よく使われた順）
+#   RESOLUTION_MAX_AGE:               この期間（秒）使われなかった検索結果は読み込まず、削除する
+#   RESOLUTION_MAX_ENTRIES:           保存する件数の上限
+#   RESOLUTION_FLUSH_INTERVAL:        書き込みをまとめる間隔（秒）
+#   RESOLUTION_FLUSH_BATCH:           この件数がたまったら間隔を待たずに書き込む
+RESOLUTION_STORE_PATH = os.environ.get("RESOLUTION_STORE_PATH", "")
+RESOLUTION_WARM_LIMIT = int(os.environ.get("RESOLUTION_WARM_LIMIT", "5000"))
+RESOLUTION_MAX_AGE = float(os.environ.get("RESOLUTION_MAX_AGE", str(30 * 24 * 60 * 60)))
+RESOLUTION_MAX_ENTRIES = int(os.environ.get("RESOLUTION_MAX_ENTRIES", "200000"))
+RESOLUTION_FLUSH_INTERVAL = float(os.environ.get("RESOLUTION_FLUSH_INTERVAL", "2.0"))
+RESOLUTION_FLUSH_BATCH = int(os.environ.get("RESOLUTION_FLUSH_BATCH", "500"))
+
+# 書き込みが追いつかない場合に保持する未書き込みの件数の上限（超えた分は破棄する）
+_MAX_PENDING = RESOLUTION_FLUSH_BATCH * 20
+# 期限切れ・上限超過の行を削除する頻度（書き込み回数）
+_PRUNE_EVERY = 50
+
+
+class ResolutionStore:
+    """
+    検索クエリ（正規化済みの検索キー）→ 候補トラックの解決結果を保存するSQLiteの永続ストア。
+
+    プロセスの再起動でメモリ上の検索キャッシュが失われても、起動時によく使われた解決結果を
+    読み込むことで、以前に検索したセットリストはSpotify APIを呼ばずに解決できます。
+
+    record()・touch() はメモリ上にためるだけで、バックグラウンドのタスクが一定間隔
+    （または一定件数ごと）にまとめてスレッドプールで書き込みます（write-behind）。
+    書き込みに失敗しても検索自体には影響しません。
+    """
+
+    def __init__(
+        self,
+        path: Optional[str],
+        warm_limit: int = RESOLUTION_WARM_LIMIT,
+        max_age: float = RESOLUTION_MAX_AGE,
+        max_entries: int = RESOLUTION_MAX_ENTRIES,
+        flush_interval: float = RESOLUTION_FLUSH_INTERVAL,
+        flush_batch: int = RESOLUTION_FLUSH_BATCH,
+    ):
+        self.path = path
+        self.enabled = bool(path)
+        self.warm_limit = warm_limit
+        self.max_age = max_age
+        self.max_entries = max_entries
+        self.flush_interval = flush_interval
+        self.flush_batch = flush_batch
+        self._local = threading.local()
+        self._schema_ready = False
+        # 検索キー -> (候補トラック, 記録時刻)
+        self._pending: Dict[str, Tuple[List[Dict[str, Any]], float]] = {}
+        # 検索キー -> 前回の書き込み以降に使われた回数
+        self._touched: Dict[str, int] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._flushes = 0
+        self.loaded = 0
+        self.written = 0
+        self.dropped = 0
+        self.errors = 0
+        # Gunicornのpreloadでマスタープロセスが開いた接続をforkしたワーカーで使わないようにする
+        os.register_at_fork(after_in_child=self._reset_connections)
+
+    @property
+    def ephemeral(self) -> bool:
+        """保存先が一時ディレクトリ（再起動で消える場所）にあるかどうか。"""
+        if not self.enabled:
+            return False
+        path = os.path.realpath(self.path)
+        return any(path.startswith(os.path.realpath(tmp) + os.sep) for tmp in {"/tmp", tempfile.gettempdir()})
+
+    def _reset_connections(self) -> None:
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3の接続はスレッドごとに保持する（書き込みはスレッドプールで行う）
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not self._schema_ready:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS resolutions ("
+                    " key TEXT PRIMARY KEY, items TEXT NOT NULL, hits INTEGER NOT NULL,"
+                    " created_at REAL NOT NULL, last_used_at REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS idx_resolutions_hot ON resolutions (hits DESC, last_used_at DESC)")
+                self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def record(self, key: str, items: List[Dict[str, Any]]) -> None:
+        """Spotify APIで解決した検索結果を記録します（空の結果は記録しません）。"""
+        if not self.enabled or not items:
+            return
+        if len(self._pending) >= _MAX_PENDING:
+            self.dropped += 1
+            return
+        self._pending[key] = (items, time.time())
+        self._maybe_flush()
+
+    def touch(self, key: str) -> None:
+        """キャッシュから解決した検索キーの利用回数を記録します（起動時に読み込む順序に使います）。"""
+        if not self.enabled:
+            return
+        if key not in self._touched and len(self._touched) >= _MAX_PENDING:
+            self.dropped += 1
+            return
+        self._touched[key] = self._touched.get(key, 0) + 1
+        self._maybe_flush()
+
+    def _maybe_flush(self) -> None:
+        if self._wakeup is not None and len(self._pending) + len(self._touched) >= self.flush_batch:
+            self._wakeup.set()
+
+    async def load_hot(self) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        """
+        よく使われた順に最大 warm_limit 件の (検索キー, 候補トラック) を返します。
+        ストアを開けない場合は警告を出して無効にします。
+        """
+        if not self.enabled:
+            return []
+        try:
+            rows = await asyncio.to_thread(self._load_hot)
+        except sqlite3.Error:
+            logger.warning("Resolution store is not available; disabling it", extra={"path": self.path}, exc_info=True)
+            self.enabled = False
+            return []
+        self.loaded = len(rows)
+        return rows
+
+    def _load_hot(self) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        rows = self._connect().execute(
+            "SELECT key, items FROM resolutions WHERE last_used_at > ? ORDER BY hits DESC, last_used_at DESC LIMIT ?",
+            (time.time() - self.max_age, self.warm_limit),
+        ).fetchall()
+        return [(key, json.loads(items)) for key, items in rows]
+
+    async def start(self) -> None:
+        """書き込み用のバックグラウンドタスクを起動します（アプリケーションの起動時に呼び出します）。"""
+        if not self.enabled or self._flusher is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """バックグラウンドタスクを停止し、未書き込みの分を書き込みます。"""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            await asyncio.gather(self._flusher, return_exceptions=True)
+            self._flusher = None
+            self._wakeup = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    async def flush(self) -> None:
+        """たまっている記録をまとめて書き込みます。"""
+        if not self.enabled or not (self._pending or self._touched):
+            return
+        pending, touched = self._pending, self._touched
+        self._pending, self._touched = {}, {}
+        try:
+            await asyncio.to_thread(self._write, pending, touched)
+        except sqlite3.Error:
+            self.errors += 1
+            logger.warning("Failed to write search resolutions", extra={"entries": len(pending) + len(touched)}, exc_info=True)
+            return
+        self.written += len(pending)
+
+    def _write(self, pending: Dict[str, Tuple[List[Dict[str, Any]], float]], touched: Dict[str, int]) -> None:
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT INTO resolutions (key, items, hits, created_at, last_used_at) VALUES (?, ?, 1, ?, ?)"
+                " ON CONFLICT(key) DO UPDATE SET items = excluded.items, hits = hits + 1, last_used_at = excluded.last_used_at",
+                [(key, json.dumps(items, ensure_ascii=False), recorded_at, recorded_at) for key, (items, recorded_at) in pending.items()],
+            )
+            conn.executemany(
+                "UPDATE resolutions SET hits = hits + ?, last_used_at = ? WHERE key = ?",
+                [(count, now, key) for key, count in touched.items()],
+            )
+            self._flushes += 1
+            # 書き込み回数に応じて、長く使われていない行と上限を超えた行をまとめて削除する
+            if self._flushes % _PRUNE_EVERY == 0:
+                conn.execute("DELETE FROM resolutions WHERE last_used_at <= ?", (now - self.max_age,))
+                conn.execute(
+                    "DELETE FROM resolutions WHERE key IN ("
+                    " SELECT key FROM resolutions ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "loaded": self.loaded,
+            "pending": len(self._pending) + len(self._touched),
+            "written": self.written,
+            "dropped": self.dropped,
+            "errors": self.errors,
+        }
+
+
+# アプリケーション全体で共有する検索結果の永続ストアのシングルトンインスタンス
+resolution_store = ResolutionStore(RESOLUTION_STORE_PATH or None)
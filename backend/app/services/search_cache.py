@@ -0,0 +1,253 @@
+import os
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+import threading
+import unicodedata
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+from app.utils.ttl_cache import LRUTTLCache
+
+logger = logging.getLogger(__name__)
+
+# 検索キャッシュの設定
+SEARCH_CACHE_BACKEND = os.environ.get("SEARCH_CACHE_BACKEND", "memory")  # memory | sqlite
+SEARCH_CACHE_PATH = os.environ.get("SEARCH_CACHE_PATH", "/tmp/spotify_search_cache.sqlite3")
+SEARCH_CACHE_TTL = float(os.environ.get("SEARCH_CACHE_TTL", str(24 * 60 * 60)))
+SEARCH_CACHE_NEGATIVE_TTL = float(os.environ.get("SEARCH_CACHE_NEGATIVE_TTL", str(10 * 60)))
+SEARCH_CACHE_MAX_ENTRIES = int(os.environ.get("SEARCH_CACHE_MAX_ENTRIES", "20000"))
+SEARCH_CACHE_MAX_BYTES = int(os.environ.get("SEARCH_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+# 共有バックエンドへの未書き込みの件数の上限（書き込みが追いつかない場合、超えた分は書き込まない）
+SEARCH_CACHE_MAX_PENDING = int(os.environ.get("SEARCH_CACHE_MAX_PENDING", "5000"))
+
+
+def normalize_text(text: Optional[str]) -> str:
+    """
+    検索キー用に文字列を正規化します。
+    全角/半角の統一（NFKC）、大文字小文字の統一、連続する空白の圧縮を行います。
+    """
+    if not text:
+        return ""
+    return " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+
+
+def make_search_key(track_name: str, artist_name: Optional[str] = None, limit: int = 1) -> str:
+    """正規化した (曲名, アーティスト名) と取得件数から検索キャッシュのキーを作成します。"""
+    return f"{limit}\x1f{normalize_text(track_name)}\x1f{normalize_text(artist_name)}"
+
+
+class SearchCacheBackend(ABC):
+    """
+    複数ワーカーで共有する検索キャッシュのバックエンドの基底クラス。
+    メソッドはブロッキングI/Oを行ってよく、TrackSearchCache がスレッドプールから呼び出します。
+    """
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        """保存されている検索結果を返します。ない場合（期限切れを含む）はNoneを返します。"""
+
+    @abstractmethod
+    def set(self, key: str, value: List[Dict[str, Any]], ttl: float) -> None:
+        """検索結果をttl秒の期限付きで保存します。"""
+
+    def set_many(self, entries: List[Tuple[str, List[Dict[str, Any]], float]]) -> None:
+        """(キー, 検索結果, ttl) のリストをまとめて保存します。"""
+        for key, value, ttl in entries:
+            self.set(key, value, ttl)
+
+
+class SQLiteSearchCacheBackend(SearchCacheBackend):
+    """
+    ローカルのSQLiteファイルを使った共有バックエンド。
+    同一ホスト上の複数のGunicornワーカー間でキャッシュを共有できます。
+    """
+
+    def __init__(self, path: str, max_entries: int = SEARCH_CACHE_MAX_ENTRIES * 5):
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._writes = 0
+        # Gunicornのpreloadでマスタープロセスが開いた接続をforkしたワーカーで使わないようにする
+        os.register_at_fork(after_in_child=self._reset_connections)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                " key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_expires ON search_cache (expires_at)")
+
+    def _reset_connections(self) -> None:
+        self._local = threading.local()
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3の接続はスレッドごとに保持する
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        row = self._connect().execute(
+            "SELECT value FROM search_cache WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set(self, key: str, value: List[Dict[str, Any]], ttl: float) -> None:
+        self.set_many([(key, value, ttl)])
+
+    def set_many(self, entries: List[Tuple[str, List[Dict[str, Any]], float]]) -> None:
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(
+                "INSERT OR REPLACE INTO search_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                [(key, json.dumps(value, ensure_ascii=False), now + ttl) for key, value, ttl in entries],
+            )
+            previous, self._writes = self._writes, self._writes + len(entries)
+            # 書き込み回数に応じて期限切れ・上限超過の行をまとめて削除する
+            if previous // 1000 != self._writes // 1000:
+                conn.execute("DELETE FROM search_cache WHERE expires_at <= ?", (now,))
+                conn.execute(
+                    "DELETE FROM search_cache WHERE key IN ("
+                    " SELECT key FROM search_cache ORDER BY expires_at DESC LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+
+class TrackSearchCache:
+    """
+    プロセス全体で共有するトラック検索結果のキャッシュ。
+    インメモリのLRU + TTLキャッシュを一次キャッシュとし、
+    任意で共有バックエンド（SQLiteなど）を二次キャッシュとして利用します。
+    見つからなかった検索結果（空リスト）も短いTTLでキャッシュします。
+
+    共有バックエンドの読み込みはスレッドプールで行い、書き込みはメモリにためて
+    バックグラウンドのタスクがまとめて書き込むため（write-behind）、
+    ロック待ちなどでイベントループが止まることはありません。
+    """
+
+    def __init__(
+        self,
+        ttl: float = SEARCH_CACHE_TTL,
+        negative_ttl: float = SEARCH_CACHE_NEGATIVE_TTL,
+        max_entries: int = SEARCH_CACHE_MAX_ENTRIES,
+        max_bytes: int = SEARCH_CACHE_MAX_BYTES,
+        backend: Optional[SearchCacheBackend] = None,
+    ):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.backend = backend
+        self.memory = LRUTTLCache(
+            max_entries=max_entries,
+            max_bytes=max_bytes,
+            default_ttl=ttl,
+            sizeof=lambda value: len(json.dumps(value, ensure_ascii=False)) + 64,
+        )
+        self.hits = 0
+        self.negative_hits = 0
+        self.backend_hits = 0
+        self.misses = 0
+        # 共有バックエンドへの未書き込みの検索結果（キー -> (検索結果, ttl)）
+        self._pending: Dict[str, Tuple[List[Dict[str, Any]], float]] = {}
+        self._flusher: Optional[asyncio.Task] = None
+        self.dropped_writes = 0
+
+    async def get(self, key: str) -> Tuple[bool, List[Dict[str, Any]]]:
+        """(キャッシュヒットしたかどうか, トラック情報のリスト) を返します。"""
+        found, value = self.memory.lookup(key)
+        if not found and self.backend is not None:
+            try:
+                value = await asyncio.to_thread(self.backend.get, key)
+            except sqlite3.Error:
+                value = None
+            if value is not None:
+                found = True
+                self.backend_hits += 1
+                self.memory.set(key, value, ttl=self.ttl if value else self.negative_ttl)
+
+        if not found:
+            self.misses += 1
+            return False, []
+        self.hits += 1
+        if not value:
+            self.negative_hits += 1
+        return True, value
+
+    def set(self, key: str, value: List[Dict[str, Any]]) -> None:
+        """
+        検索結果を保存します。空の結果は短いTTLで保存します。
+        共有バックエンドへはバックグラウンドで書き込みます（イベントループ上から呼び出します）。
+        """
+        ttl = self.ttl if value else self.negative_ttl
+        self.memory.set(key, value, ttl=ttl)
+        if self.backend is None:
+            return
+        if key not in self._pending and len(self._pending) >= SEARCH_CACHE_MAX_PENDING:
+            self.dropped_writes += 1
+            return
+        self._pending[key] = (value, ttl)
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_pending())
+
+    async def _flush_pending(self) -> None:
+        try:
+            # 書き込み中にたまった分は次の書き込みでまとめて送る
+            while self._pending:
+                entries = [(key, value, ttl) for key, (value, ttl) in self._pending.items()]
+                self._pending = {}
+                try:
+                    await asyncio.to_thread(self.backend.set_many, entries)
+                except sqlite3.Error:
+                    logger.warning("Failed to write search results to the shared cache", extra={"entries": len(entries)}, exc_info=True)
+        finally:
+            self._flusher = None
+
+    async def flush(self) -> None:
+        """未書き込みの検索結果を共有バックエンドに書き込みます（アプリケーションの終了時に呼び出します）。"""
+        if self._flusher is not None and not self._flusher.done():
+            await asyncio.shield(self._flusher)
+
+    def warm(self, key: str, value: List[Dict[str, Any]]) -> None:
+        """永続ストアから読み込んだ検索結果を、共有バックエンドには書き込まずにメモリへ登録します。"""
+        self.memory.set(key, value, ttl=self.ttl if value else self.negative_ttl)
+
+    def clear(self) -> None:
+        self.memory.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """ヒット/ミスの統計情報を返します。hitsは節約できたSpotify API呼び出し数に相当します。"""
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__ if self.backend else "memory",
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "backend_hits": self.backend_hits,
+            "backend_pending": len(self._pending),
+            "backend_dropped_writes": self.dropped_writes,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "saved_requests": self.hits,
+            "memory": self.memory.stats(),
+        }
+
+
+def build_search_cache() -> TrackSearchCache:
+    """環境変数の設定に従って検索キャッシュを生成します。"""
+    backend = None
+    if SEARCH_CACHE_BACKEND == "sqlite":
+        backend = SQLiteSearchCacheBackend(SEARCH_CACHE_PATH)
+    return TrackSearchCache(backend=backend)
+
+
+# アプリケーション全体で共有する検索キャッシュのシングルトンインスタンス
+search_cache = build_search_cache()
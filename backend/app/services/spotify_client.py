@@ -0,0 +1,229 @@
+import os
+import time
+import asyncio
+import importlib.util
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional
+import httpx
+from app.services.rate_limiter import rate_limiter, parse_retry_after, backoff_delay
+from app.core.metrics import spotify_request_duration, spotify_throttled_total, spotify_retries_total
+
+# Spotify Web APIの接続設定
+SPOTIFY_API_BASE_URL = os.environ.get("SPOTIFY_API_BASE_URL", "https://api.spotify.com/v1")
+SPOTIFY_MAX_CONNECTIONS = int(os.environ.get("SPOTIFY_MAX_CONNECTIONS", "100"))
+SPOTIFY_TIMEOUT = float(os.environ.get("SPOTIFY_TIMEOUT", "10"))
+SPOTIFY_MAX_RETRIES = int(os.environ.get("SPOTIFY_MAX_RETRIES", "4"))
+# Retry-Afterがこれより長い場合は待たずに失敗とする
+SPOTIFY_MAX_RETRY_AFTER = float(os.environ.get("SPOTIFY_MAX_RETRY_AFTER", "30"))
+# 一括検索1回あたりの待ち時間の上限（秒）。リトライも含めてHerokuのルーターのタイムアウト（30秒）より短く終える
+SPOTIFY_BULK_DEADLINE = float(os.environ.get("SPOTIFY_BULK_DEADLINE", "20"))
+
+# リトライ対象のステータスコード（429以外は冪等なGETのみリトライする）
+RETRYABLE_STATUS_CODES = {500, 502, 503, 504}
+
+# h2は接続の生成時にhttpxが読み込むため、ここでは有無だけを確認する（起動時間の短縮）
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+class SpotifyException(Exception):
+    """
+    Spotify APIのエラー。
+    spotipyのSpotifyExceptionと同じ属性（http_status, code, msg, reason, headers）を持ちます。
+    spotipy本体（requests・redisなど）を起動時に読み込まずに済むよう、アプリ内で定義しています。
+    """
+
+    def __init__(self, http_status: int, code: int, msg: str, reason: Optional[str] = None, headers: Optional[Dict[str, str]] = None):
+        super().__init__(http_status, code, msg)
+        self.http_status = http_status
+        self.code = code
+        self.msg = msg
+        self.reason = reason
+        self.headers = headers or {}
+
+    def __str__(self) -> str:
+        return f"http status: {self.http_status}, code:{self.code} - {self.msg}, reason: {self.reason}"
+
+
+# リトライの期限（time.monotonic()基準）。タスクごとに設定し、期限までに終わらないリトライは行わない
+retry_deadline: ContextVar[Optional[float]] = ContextVar("spotify_retry_deadline", default=None)
+
+
+# ワーカープロセス全体で共有するHTTPクライアント（コネクションプール）
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """共有のhttpx.AsyncClientを返します。初回呼び出し時に生成します。"""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            base_url=SPOTIFY_API_BASE_URL,
+            http2=HTTP2_AVAILABLE,
+            timeout=SPOTIFY_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=SPOTIFY_MAX_CONNECTIONS,
+                max_keepalive_connections=SPOTIFY_MAX_CONNECTIONS,
+                keepalive_expiry=60,
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """共有のhttpx.AsyncClientを閉じます。アプリケーション終了時に呼び出します。"""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+class AsyncSpotifyClient:
+    """
+    共有コネクションプール上で動作するSpotify Web APIの非同期クライアント。
+    アクセストークンのみをリクエストごとに保持し、接続は使い回します。
+    エラー時はspotipyと同じ属性を持つSpotifyExceptionを送出します。
+    """
+
+    def __init__(self, access_token: str, http_client: Optional[httpx.AsyncClient] = None):
+        self.access_token = access_token
+        self._http_client = http_client
+
+    @property
+    def http_client(self) -> httpx.AsyncClient:
+        return self._http_client or get_http_client()
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        params: Optional[Dict[str, Any]] = None,
+        json: Optional[Dict[str, Any]] = None,
+        operation: str = "other",
+    ) -> Any:
+        """
+        Spotify Web APIへリクエストを送り、JSONレスポンスを返します。
+        送信はワーカー共有のレートリミッターを通し、429はRetry-Afterに従って、
+        GETの5xxと通信エラーはジッター付きバックオフでリトライします。
+        retry_deadline が設定されている場合、待ち終わるのが期限を過ぎるリトライは行わずに失敗とします。
+        """
+        headers = {"Authorization": f"Bearer {self.access_token}"}
+        idempotent = method == "GET"
+        attempt = 0
+        while True:
+            async with rate_limiter.slot() as slot:
+                started = time.perf_counter()
+                try:
+                    response = await self.http_client.request(method, path, params=params, json=json, headers=headers)
+                except httpx.HTTPError as e:
+                    spotify_request_duration.observe(time.perf_counter() - started, operation=operation, status="error")
+                    error = SpotifyException(599, -1, f"{method} {path}: {e}", reason=str(e))
+                    if not idempotent or attempt >= SPOTIFY_MAX_RETRIES:
+                        raise error
+                    response = None
+                else:
+                    spotify_request_duration.observe(time.perf_counter() - started, operation=operation, status=str(response.status_code))
+                    if response.status_code == 429:
+                        spotify_throttled_total.inc(operation=operation)
+                        slot.mark_throttled(parse_retry_after(response.headers.get("Retry-After")))
+
+            if response is not None:
+                retryable = slot.throttled or (idempotent and response.status_code in RETRYABLE_STATUS_CODES)
+                if not retryable or attempt >= SPOTIFY_MAX_RETRIES:
+                    break
+                if slot.throttled and slot.retry_after > SPOTIFY_MAX_RETRY_AFTER:
+                    break
+
+            # 失敗したリクエストだけをバックオフ後に再送する
+            delay = backoff_delay(attempt, minimum=slot.retry_after or 0.0)
+            deadline = retry_deadline.get()
+            if deadline is not None and time.monotonic() + delay >= deadline:
+                if response is None:
+                    raise error
+                break
+            spotify_retries_total.inc(operation=operation, reason="throttled" if slot.throttled else "error")
+            await asyncio.sleep(delay)
+            attempt += 1
+
+        if response.status_code >= 400:
+            try:
+                error = response.json().get("error", {})
+                msg = error.get("message", response.text) if isinstance(error, dict) else str(error)
+            except ValueError:
+                msg = response.text
+            raise SpotifyException(
+                response.status_code,
+                -1,
+                f"{method} {path}: {msg}",
+                reason=response.reason_phrase,
+                headers=dict(response.headers),
+            )
+
+        if not response.content:
+            return None
+        return response.json()
+
+    async def search(self, q: str, limit: int = 10, offset: int = 0, type: str = "track", market: Optional[str] = None) -> Dict[str, Any]:
+        """トラックなどを検索します。"""
+        params = {"q": q, "limit": limit, "offset": offset, "type": type}
+        if market:
+            params["market"] = market
+        return await self._request("GET", "/search", params=params, operation="search")
+
+    async def tracks(self, track_ids: List[str], market: Optional[str] = None) -> Dict[str, Any]:
+        """複数のトラック情報を取得します（1リクエストあたり最大50件）。"""
+        params = {"ids": ",".join(track_ids)}
+        if market:
+            params["market"] = market
+        return await self._request("GET", "/tracks", params=params, operation="tracks_get")
+
+    async def current_user(self) -> Dict[str, Any]:
+        """現在の認証済みユーザーのプロフィールを取得します。"""
+        return await self._request("GET", "/me", operation="current_user")
+
+    async def user_playlist_create(self, user: str, name: str, public: bool = True, description: str = "") -> Dict[str, Any]:
+        """指定ユーザーのプレイリストを作成します。"""
+        data = {"name": name, "public": public, "description": description}
+        return await self._request("POST", f"/users/{user}/playlists", json=data, operation="playlist_create")
+
+    async def playlist_add_items(self, playlist_id: str, items: List[str], position: Optional[int] = None) -> Dict[str, Any]:
+        """プレイリストにトラックを追加します（1リクエストあたり最大100件）。"""
+        data: Dict[str, Any] = {"uris": items}
+        if position is not None:
+            data["position"] = position
+        return await self._request("POST", f"/playlists/{playlist_id}/tracks", json=data, operation="playlist_add_items")
+
+    async def playlist(self, playlist_id: str, fields: Optional[str] = None) -> Dict[str, Any]:
+        """プレイリスト情報を取得します。"""
+        params = {"fields": fields} if fields else None
+        return await self._request("GET", f"/playlists/{playlist_id}", params=params, operation="playlist_get")
+
+    async def playlist_items(self, playlist_id: str, fields: Optional[str] = None, limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+        """プレイリストのトラックを取得します（1リクエストあたり最大100件）。"""
+        params: Dict[str, Any] = {"limit": limit, "offset": offset}
+        if fields:
+            params["fields"] = fields
+        return await self._request("GET", f"/playlists/{playlist_id}/tracks", params=params, operation="playlist_items")
+
+    async def playlist_remove_items(self, playlist_id: str, items: List[str], snapshot_id: Optional[str] = None) -> Dict[str, Any]:
+        """プレイリストから指定したURIのトラックをすべて削除します（1リクエストあたり最大100件）。"""
+        data: Dict[str, Any] = {"tracks": [{"uri": uri} for uri in items]}
+        if snapshot_id:
+            data["snapshot_id"] = snapshot_id
+        return await self._request("DELETE", f"/playlists/{playlist_id}/tracks", json=data, operation="playlist_remove_items")
+
+    async def playlist_reorder_items(
+        self,
+        playlist_id: str,
+        range_start: int,
+        insert_before: int,
+        range_length: int = 1,
+        snapshot_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """プレイリスト内の連続したトラックを指定位置の前に移動します。"""
+        data: Dict[str, Any] = {"range_start": range_start, "insert_before": insert_before, "range_length": range_length}
+        if snapshot_id:
+            data["snapshot_id"] = snapshot_id
+        return await self._request("PUT", f"/playlists/{playlist_id}/tracks", json=data, operation="playlist_reorder_items")
+
+    async def playlist_replace_items(self, playlist_id: str, items: List[str]) -> Dict[str, Any]:
+        """プレイリストのトラックを置き換えます（1リクエストあたり最大100件）。"""
+        return await self._request("PUT", f"/playlists/{playlist_id}/tracks", json={"uris": items}, operation="playlist_replace_items")
@@ -1,114 +1,530 @@
-import spotipy
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, AsyncIterator, Callable
+import time
 import asyncio
-from app.schemas import Track, TrackQuery, Playlist, UserProfile
+import hashlib
+from app.schemas import Track, TrackQuery, TrackMatch, Playlist, UserProfile, TrackSearchResult, TrackReject, PlaylistSyncResponse
+from app.services.spotify_client import AsyncSpotifyClient, SpotifyException, retry_deadline
+from app.services.search_cache import search_cache, make_search_key
+from app.services.playlist_populator import PlaylistPopulator
+from app.services.playlist_sync import PlaylistSyncer
+from app.services.catalog_index import catalog_index
+from app.services.resolution_store import resolution_store
+from app.services.track_ranking import score_candidates, RANKING_CANDIDATES
+from app.utils.single_flight import SingleFlight
+from app.core.metrics import bulk_search_fanout
+from app.utils.ttl_cache import LRUTTLCache
+from app.utils.track_uri import validate_track_uris
+
+# 進捗の通知先（完了件数, 全体の件数）。バックグラウンドジョブの進捗表示に使う
+ProgressCallback = Callable[[int, int], None]
+
+# ストリーミング検索で同時に保持する検索タスクの上限
+STREAM_SEARCH_WINDOW = 50
+
+# ワーカー内で同時に発生した同一の検索・ユーザー取得を1回の上流呼び出しにまとめる
+search_flight = SingleFlight()
+user_flight = SingleFlight()
+
+# アクセストークンごとのユーザープロフィールのキャッシュ（アクセストークンの有効期限は1時間）
+USER_PROFILE_CACHE_TTL = 60 * 60
+user_profile_cache = LRUTTLCache(max_entries=10000, default_ttl=USER_PROFILE_CACHE_TTL)
+
+
+# トラックIDごとのトラック情報のキャッシュ（存在しないIDは短いTTLでキャッシュする）
+# Spotify APIのトラック取得は1リクエストあたり50件まで
+TRACKS_BATCH_SIZE = 50
+TRACK_CACHE_TTL = 24 * 60 * 60
+TRACK_NEGATIVE_CACHE_TTL = 10 * 60
+track_cache = LRUTTLCache(max_entries=50000, default_ttl=TRACK_CACHE_TTL)
+
+
+def _track_cache_key(track_id: str, market: Optional[str]) -> str:
+    return f"{market or ''}\x1f{track_id}"
+
+
+def _token_key(access_token: str) -> str:
+    """トークンそのものをキーとして保持しないよう、ハッシュ値をキャッシュキーにします。"""
+    return hashlib.sha256(access_token.encode()).hexdigest()
+
+
+def invalidate_user_profile(access_token: str) -> None:
+    """トークンのリフレッシュ時などに、古いトークンのプロフィールキャッシュを破棄します。"""
+    user_profile_cache.delete(_token_key(access_token))
+
+
+async def warm_up_resolutions() -> int:
+    """
+    永続ストアからよく使われた検索結果を読み込み、検索キャッシュに登録します。
+    アプリケーションの起動時に呼び出します。読み込んだ件数を返します。
+    ローカルカタログには候補をそのまま登録せず、検索でランキングした最良の候補だけが登録されます。
+    """
+    rows = await resolution_store.load_hot()
+    for key, items in rows:
+        search_cache.warm(key, items)
+    return len(rows)
 
 class SpotifyService:
     def __init__(self, access_token: str):
-        self.sp = spotipy.Spotify(auth=access_token)
+        # 接続はプロセス全体で共有し、アクセストークンだけをリクエストごとに持つ
+        self.sp = AsyncSpotifyClient(access_token)
+
+    @staticmethod
+    def _to_track(item: Dict[str, Any]) -> Track:
+        """Spotify APIのトラック情報をTrackモデルに変換します。"""
+        return Track(
+            id=item["id"],
+            name=item["name"],
+            artist=item["artists"][0]["name"] if item.get("artists") else None,
+            uri=item["uri"],
+            duration_ms=item.get("duration_ms")
+        )
+
+    @staticmethod
+    def _build_query(track_name: str, artist_name: Optional[str] = None) -> str:
+        """Spotify検索用のクエリ文字列を組み立てます。"""
+        query = f"track:{track_name}"
+        if artist_name:
+            query += f" artist:{artist_name}"
+        return query
+
+    async def _search_items(self, track_name: str, artist_name: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        """
+        検索キャッシュを確認し、なければSpotify APIで検索してトラック情報のリストを返します。
+        """
+        key = make_search_key(track_name, artist_name, limit)
+        hit, items = await search_cache.get(key)
+        if hit:
+            return items
+        return await self._fetch_items(key, track_name, artist_name, limit)
+
+    async def _fetch_items(self, key: str, track_name: str, artist_name: Optional[str], limit: int) -> List[Dict[str, Any]]:
+        """
+        Spotify APIで検索し、結果を検索キャッシュと永続ストアに登録します。
+        同じ検索が実行中であればその結果を共有しますが、ほかのユーザーのトークンで実行された検索の
+        認証エラー（401/403）は共有せず、自分のトークンで検索し直します。
+        """
+        executed = False
+
+        async def _fetch() -> List[Dict[str, Any]]:
+            nonlocal executed
+            executed = True
+            query = self._build_query(track_name, artist_name)
+            results = await self.sp.search(q=query, type="track", limit=limit)
+            items = [self._to_track(item).model_dump() for item in results["tracks"]["items"]]
+            search_cache.set(key, items)
+            resolution_store.record(key, items)
+            return items
+
+        # 同じ検索がすでに実行中であれば、その結果を共有する
+        try:
+            return await search_flight.do(key, _fetch)
+        except SpotifyException as e:
+            if executed or e.http_status not in (401, 403):
+                raise
+        return await _fetch()
+
+    async def _fetch_tracks(self, track_ids: List[str], market: Optional[str]) -> Dict[str, Optional[Dict[str, Any]]]:
+        """
+        トラック情報をまとめて取得してキャッシュに登録し、{トラックID: エントリ} を返します。
+        存在しないIDのエントリはNoneです。
+        不正なIDでバッチ全体が400になった場合は、バッチを半分に分けて取得し直し、不正なIDだけを絞り込みます。
+        """
+        try:
+            results = await self.sp.tracks(track_ids, market=market)
+        except SpotifyException as e:
+            if e.http_status != 400:
+                raise
+            if len(track_ids) == 1:
+                track_cache.set(_track_cache_key(track_ids[0], market), None, ttl=TRACK_NEGATIVE_CACHE_TTL)
+                return {track_ids[0]: None}
+            middle = len(track_ids) // 2
+            halves = await asyncio.gather(self._fetch_tracks(track_ids[:middle], market), self._fetch_tracks(track_ids[middle:], market))
+            return {**halves[0], **halves[1]}
+        entries: Dict[str, Optional[Dict[str, Any]]] = {}
+        # レスポンスはリクエストしたIDと同じ順序で返る（市場を指定した場合、別IDのトラックに置き換わることがある）
+        for track_id, item in zip(track_ids, results.get("tracks") or []):
+            key = _track_cache_key(track_id, market)
+            if item is None:
+                entries[track_id] = None
+                track_cache.set(key, None, ttl=TRACK_NEGATIVE_CACHE_TTL)
+            else:
+                entries[track_id] = {"track": self._to_track(item).model_dump(), "playable": item.get("is_playable", True)}
+                track_cache.set(key, entries[track_id])
+        return entries
+
+    async def resolve_tracks(self, values: List[str], market: Optional[str] = None) -> Tuple[List[Track], List[TrackReject]]:
+        """
+        トラックURI・URL・IDのリストを検証し、トラック情報に解決します。
+        形式はローカルで検証し、キャッシュにないものだけを50件ずつ並行してSpotify APIで取得します。
+        marketを指定した場合は、その国で再生できないトラックも除外します。
+        (有効なトラックのリスト, 除外された値のリスト) を返します。
+        """
+        uris, invalid = validate_track_uris(values)
+        rejected = [TrackReject(value=value, reason="invalid") for value in invalid]
+        track_ids = [uri.rsplit(":", 1)[1] for uri in uris]
+
+        entries: Dict[str, Optional[Dict[str, Any]]] = {}
+        missing = []
+        for track_id in track_ids:
+            found, entry = track_cache.lookup(_track_cache_key(track_id, market))
+            if found:
+                entries[track_id] = entry
+            else:
+                missing.append(track_id)
+
+        batches = [missing[i:i + TRACKS_BATCH_SIZE] for i in range(0, len(missing), TRACKS_BATCH_SIZE)]
+        results = await asyncio.gather(*[self._fetch_tracks(batch, market) for batch in batches], return_exceptions=True)
+        failed_ids = set()
+        for batch, result in zip(batches, results):
+            if isinstance(result, BaseException):
+                # 認証エラーはリクエスト全体のエラーとして扱う
+                if not isinstance(result, SpotifyException) or result.http_status in (401, 403):
+                    raise result
+                failed_ids.update(batch)
+            else:
+                entries.update(result)
+
+        tracks = []
+        seen = set()
+        for uri, track_id in zip(uris, track_ids):
+            entry = entries.get(track_id)
+            if track_id in failed_ids:
+                rejected.append(TrackReject(value=uri, reason="failed"))
+            elif entry is None:
+                rejected.append(TrackReject(value=uri, reason="not_found"))
+            elif market and not entry["playable"]:
+                rejected.append(TrackReject(value=uri, reason="unavailable"))
+            elif entry["track"]["uri"] not in seen:
+                # 置き換え（リンク）によって同じトラックになった場合は最初の1件だけ残す
+                seen.add(entry["track"]["uri"])
+                tracks.append(Track.model_validate(entry["track"]))
+        return tracks, rejected
+
+    async def _current_user(self) -> Dict[str, Any]:
+        """
+        現在のユーザー情報を取得します。
+        結果はアクセストークンごとにキャッシュし、同じトークンでの同時呼び出しは1回にまとめます。
+        """
+        key = _token_key(self.sp.access_token)
+        found, user = user_profile_cache.lookup(key)
+        if found:
+            return user
+
+        user_data = await user_flight.do(key, self.sp.current_user)
+        user = {"id": user_data["id"], "display_name": user_data.get("display_name")}
+        user_profile_cache.set(key, user)
+        return user
 
-    def get_current_user_profile(self) -> UserProfile:
+    async def get_current_user_profile(self) -> UserProfile:
         """現在のユーザープロファイルを取得し、UserProfileモデルとして返します。"""
-        user_data = self.sp.current_user()
+        user_data = await self._current_user()
         return UserProfile.model_validate(user_data)
 
-    def get_current_user_id(self) -> str:
+    async def get_current_user_id(self) -> str:
         """
         現在の認証済みユーザーのIDを取得します。
         """
-        return self.sp.current_user()["id"]
+        return (await self._current_user())["id"]
 
-    def create_playlist_and_add_tracks(self, user_id: str, name: str, public: bool, description: str, track_uris: List[str]) -> Playlist:
+    async def create_playlist_and_add_tracks(self, user_id: str, name: str, public: bool, description: str, track_uris: List[str]) -> Playlist:
         """
         新しいプレイリストを作成し、指定されたトラックを追加します。
+        track_uris は検証・重複除去済みであることを前提とします（validate_track_uris を参照）。
         """
         # 新しいプレイリストを作成
-        playlist = self.sp.user_playlist_create(
+        playlist = await self.sp.user_playlist_create(
             user=user_id,
             name=name,
             public=public,
             description=description
         )
 
-        playlist_id = playlist["id"]
-
-        # トラックURIが提供されていれば、新しいプレイリストに追加
-        if track_uris:
-            # Spotify APIは一度に100曲までしか追加できないため、100件ずつに分割してリクエスト
-            for i in range(0, len(track_uris), 100):
-                chunk = track_uris[i:i+100]
-                self.sp.playlist_add_items(playlist_id, chunk)
-        
-        # 最新のプレイリスト情報を取得して返す
-        fresh_playlist_data = self.sp.playlist(playlist_id)
+        # トラックURIが提供されていれば、100件ずつのチャンクで順に追加
+        populator = PlaylistPopulator(self.sp, playlist["id"], snapshot_id=playlist.get("snapshot_id"))
+        track_count = await populator.populate(track_uris)
+
+        # 作成時のレスポンスと追加した曲数から結果を組み立てる（再取得は行わない）
         return Playlist(
-            id=fresh_playlist_data.get("id"),
-            name=fresh_playlist_data.get("name"),
-            url=fresh_playlist_data.get("external_urls", {}).get("spotify"),
-            track_count=fresh_playlist_data.get("tracks", {}).get("total", 0)
+            id=playlist.get("id"),
+            name=playlist.get("name"),
+            url=playlist.get("external_urls", {}).get("spotify"),
+            track_count=track_count
         )
-        
-    def search_track(self, track_name: str, artist_name: Optional[str] = None) -> List[Track]:
+
+    async def sync_playlist_tracks(self, playlist_id: str, track_uris: List[str]) -> PlaylistSyncResponse:
+        """
+        既存のプレイリストの曲を track_uris の順に揃えます。
+        作り直す代わりに現在の曲との差分（削除・並べ替え・追加）だけを適用します。
+        track_uris は検証・重複除去済みであることを前提とします（validate_track_uris を参照）。
+        """
+        result = await PlaylistSyncer(self.sp, playlist_id).sync(track_uris)
+        playlist = Playlist(
+            id=result.playlist.get("id", playlist_id),
+            name=result.playlist.get("name", ""),
+            url=result.playlist.get("external_urls", {}).get("spotify"),
+            track_count=result.track_count
+        )
+        return PlaylistSyncResponse(
+            playlist=playlist,
+            strategy=result.strategy,
+            added=result.added,
+            removed=result.removed,
+            moved=result.moved,
+            requests=result.requests
+        )
+
+    async def create_playlist_from_queries(
+        self,
+        name: str,
+        public: bool,
+        description: str,
+        queries: List[TrackQuery],
+        progress: Optional[ProgressCallback] = None,
+        playlist_id: Optional[str] = None,
+        on_created: Optional[Callable[[Dict[str, Any]], None]] = None,
+        deadline: Optional[float] = None,
+    ) -> Tuple[Playlist, List[TrackQuery], List[TrackQuery]]:
+        """
+        セットリストの検索とプレイリスト作成を1つのパイプラインで実行します。
+        プレイリストの作成は検索と並行して行い、セットリスト順に確定した検索結果から
+        100件たまるごとに追加を開始します。progress を指定すると、検索が1件終わるごとに呼び出します。
+        on_created を指定すると、プレイリストを作成した時点で作成時のレスポンスを渡して呼び出します。
+        playlist_id を指定すると新しく作成せず、中断した作成の続きとしてそのプレイリストを検索結果に揃えます。
+        deadline（秒）を指定すると、その時間内に検索が終わらなかったクエリは failed として扱います。
+        (プレイリスト, 見つからなかったクエリ, 検索に失敗したクエリ) を返します。
+        """
+        if playlist_id is not None:
+            return await self._complete_playlist(playlist_id, queries, progress, deadline)
+
+        async def _create() -> Dict[str, Any]:
+            user_id = await self.get_current_user_id()
+            playlist = await self.sp.user_playlist_create(user=user_id, name=name, public=public, description=description)
+            if on_created is not None:
+                on_created(playlist)
+            return playlist
+
+        create_task = asyncio.create_task(_create())
+        populator: Optional[PlaylistPopulator] = None
+        pending_uris: List[str] = []
+        seen_uris = set()
+        results: Dict[int, TrackSearchResult] = {}
+        next_index = 0
+        not_found_tracks: List[TrackQuery] = []
+        failed_tracks: List[TrackQuery] = []
+
+        try:
+            async for result in self.iter_search_results(queries, deadline=deadline):
+                results[result.index] = result
+                if progress is not None:
+                    progress(len(results) + next_index, len(queries))
+
+                # セットリスト順に確定した結果だけを取り出す
+                while next_index in results:
+                    ordered = results.pop(next_index)
+                    next_index += 1
+                    if ordered.status == "found" and ordered.track.uri not in seen_uris:
+                        seen_uris.add(ordered.track.uri)
+                        pending_uris.append(ordered.track.uri)
+                    elif ordered.status == "not_found":
+                        not_found_tracks.append(ordered.query)
+                    elif ordered.status == "failed":
+                        failed_tracks.append(ordered.query)
+
+                # プレイリストが作成済みであれば、確定した分を追加パイプラインに流す
+                if populator is None and create_task.done():
+                    playlist = create_task.result()
+                    populator = PlaylistPopulator(self.sp, playlist["id"], snapshot_id=playlist.get("snapshot_id"))
+                if populator is not None and pending_uris:
+                    populator.feed(pending_uris)
+                    pending_uris = []
+
+            playlist = await create_task
+            if populator is None:
+                populator = PlaylistPopulator(self.sp, playlist["id"], snapshot_id=playlist.get("snapshot_id"))
+            populator.feed(pending_uris)
+            track_count = await populator.finish()
+        except BaseException:
+            create_task.cancel()
+            if populator is not None:
+                populator.cancel()
+            raise
+
+        return (
+            Playlist(
+                id=playlist.get("id"),
+                name=playlist.get("name"),
+                url=playlist.get("external_urls", {}).get("spotify"),
+                track_count=track_count
+            ),
+            not_found_tracks,
+            failed_tracks,
+        )
+
+    async def _complete_playlist(
+        self,
+        playlist_id: str,
+        queries: List[TrackQuery],
+        progress: Optional[ProgressCallback],
+        deadline: Optional[float] = None,
+    ) -> Tuple[Playlist, List[TrackQuery], List[TrackQuery]]:
+        """作成済みのプレイリストを、セットリストの検索結果の曲順に差分で揃えます。"""
+        matches, not_found_tracks, failed_tracks = await self.search_multiple_tracks(queries, progress=progress, deadline=deadline)
+        track_uris = list(dict.fromkeys(match.track.uri for match in matches))
+        result = await self.sync_playlist_tracks(playlist_id, track_uris)
+        return result.playlist, not_found_tracks, failed_tracks
+
+    async def search_track(self, track_name: str, artist_name: Optional[str] = None) -> List[Track]:
         """
         曲名とアーティスト名（任意）でトラックを検索します。
         """
-        query = f"track:{track_name}"
-        if artist_name:
-            query += f" artist:{artist_name}"
+        items = await self._search_items(track_name, artist_name, limit=RANKING_CANDIDATES)
+        ranked = score_candidates(track_name, artist_name, items)
+        if ranked:
+            catalog_index.add(ranked[0][0])
+        return [Track(**item) for item, _ in ranked]
+
+    async def _search_query(self, q: TrackQuery) -> Optional[TrackMatch]:
+        """
+        1件のクエリを検索し、候補を採点して最も一致するトラックと代替候補を返します。
+        検索キャッシュ → ローカルカタログ（あいまい一致） → Spotify API の順に解決します。
+        ローカルカタログには、採点で選ばれたトラックだけを登録します。
+        """
+        if not q.track_name:
+            return None
+
+        key = make_search_key(q.track_name, q.artist_name, RANKING_CANDIDATES)
+        hit, items = await search_cache.get(key)
+        if hit and items:
+            resolution_store.touch(key)
+        else:
+            # 表記ゆれなどで完全一致しない場合も、十分に類似した既知のトラックがあればそれを使う
+            match = catalog_index.lookup(q.track_name, q.artist_name, rank=score_candidates)
+            if match is not None:
+                return TrackMatch(query=q, track=match.track, score=round(match.score, 4))
+            if hit:
+                return None
+            items = await self._fetch_items(key, q.track_name, q.artist_name, limit=RANKING_CANDIDATES)
+
+        ranked = score_candidates(q.track_name, q.artist_name, items)
+        if not ranked:
+            return None
+        (best, score), rest = ranked[0], ranked[1:]
+        catalog_index.add(best)
+        return TrackMatch(query=q, track=Track(**best), score=score, alternates=[Track(**item) for item, _ in rest])
+
+    async def _search_until(self, q: TrackQuery, until: Optional[float]) -> Optional[TrackMatch]:
+        """
+        1件のクエリを until（time.monotonic()基準）までに検索します。
+        期限を過ぎるリトライは行わず、期限までに終わらない場合は打ち切って504のSpotifyExceptionを送出します。
+        検索タスクの中から呼び出します（リトライの期限はタスクごとに設定されるため）。
+        """
+        if until is None:
+            return await self._search_query(q)
+        retry_deadline.set(until)
+        try:
+            return await asyncio.wait_for(self._search_query(q), timeout=until - time.monotonic())
+        except asyncio.TimeoutError:
+            raise SpotifyException(504, -1, f"検索の制限時間を超えました: {q.track_name}", reason="Deadline Exceeded") from None
 
-        results = self.sp.search(q=query, type="track", limit=5)
-        tracks = [
-            Track(
-                id=item["id"],
-                name=item["name"],
-                artist=item["artists"][0]["name"] if item.get("artists") else None,
-                uri=item["uri"]
-            )
-            for item in results["tracks"]["items"]
-        ]
-        return tracks
-    
-    async def search_multiple_tracks(self, queries: List[TrackQuery]) -> Tuple[List[Track], List[TrackQuery]]:
+    async def search_multiple_tracks(
+        self,
+        queries: List[TrackQuery],
+        progress: Optional[ProgressCallback] = None,
+        deadline: Optional[float] = None,
+    ) -> Tuple[List[TrackMatch], List[TrackQuery], List[TrackQuery]]:
         """
         複数のクエリ（曲名とアーティスト名の辞書）で並行してトラックを検索します。
+        (見つかった結果, 見つからなかったクエリ, 検索に失敗したクエリ) を返します。
+        リトライしても検索できなかったクエリは、全体を失敗させずに failed として返します。
+        progress を指定すると、重複を除いたクエリの検索が1件終わるごとに呼び出します。
+        deadline（秒）を指定すると、リトライを含めてその時間内に終わらなかったクエリを failed として返します。
         """
-        
-        def _search_sync(q: TrackQuery) -> Tuple[TrackQuery, Optional[Track]]:
-            """同期検索の呼び出しをラップするヘルパー関数。"""
-            track_name = q.track_name
-            artist_name = q.artist_name
-
-            if not track_name:
-                return q, None
-    
-            query = f"track:{track_name}"
-            if artist_name:
-                query += f" artist:{artist_name}"
-
-            results = self.sp.search(q=query, type="track", limit=1)
-            if results["tracks"]["items"]:
-                item = results["tracks"]["items"][0]
-                track = Track(
-                    id=item["id"],
-                    name=item["name"],
-                    artist=item["artists"][0]["name"] if item.get("artists") else None,
-                    uri=item["uri"]
-                )
-                return q, track
-            else:
-                return q, None
+        # 重複するクエリ（アンコールやリプライズなど）をまとめてから検索する
+        unique_queries: Dict[str, TrackQuery] = {}
+        query_keys = []
+        for q in queries:
+            key = make_search_key(q.track_name, q.artist_name)
+            unique_queries.setdefault(key, q)
+            query_keys.append(key)
+        bulk_search_fanout.observe(len(queries), kind="total")
+        bulk_search_fanout.observe(len(unique_queries), kind="unique")
+
+        # 共有コネクションプール上ですべての検索を並行して実行する
+        # （送信ペースはワーカー共有のレートリミッターで制御される）
+        until = None if deadline is None else time.monotonic() + deadline
+        completed = 0
+
+        async def _search(q: TrackQuery) -> Optional[TrackMatch]:
+            nonlocal completed
+            try:
+                return await self._search_until(q, until)
+            finally:
+                if progress is not None:
+                    completed += 1
+                    progress(completed, len(unique_queries))
 
-        # 非同期タスクのリストを作成します。
-        tasks = [asyncio.to_thread(_search_sync, q) for q in queries]
-        # すべてのタスクを並行して実行する
-        search_results = await asyncio.gather(*tasks)
+        unique_results = await asyncio.gather(*[_search(q) for q in unique_queries.values()], return_exceptions=True)
+        results_by_key = dict(zip(unique_queries.keys(), unique_results))
 
-        found_tracks = []
+        matches = []
         not_found_tracks = []
-        for original_query, track_data in search_results:
-            if track_data:
-                found_tracks.append(track_data)
+        failed_tracks = []
+        # 元のクエリの順序で結果を展開する
+        for original_query, key in zip(queries, query_keys):
+            result = results_by_key[key]
+            if isinstance(result, BaseException):
+                # 認証エラーはリクエスト全体のエラーとして扱う
+                if not isinstance(result, SpotifyException) or result.http_status in (401, 403):
+                    raise result
+                failed_tracks.append(original_query)
+            elif result:
+                matches.append(result.model_copy(update={"query": original_query}))
             else:
                 not_found_tracks.append(original_query)
 
-        return found_tracks, not_found_tracks
\ No newline at end of file
+        return matches, not_found_tracks, failed_tracks
+
+    async def iter_search_results(
+        self,
+        queries: List[TrackQuery],
+        window: int = STREAM_SEARCH_WINDOW,
+        deadline: Optional[float] = None,
+    ) -> AsyncIterator[TrackSearchResult]:
+        """
+        複数のクエリを並行して検索し、完了した順に結果を返す非同期ジェネレーター。
+        各結果には元のクエリの位置（index）が付きます。
+        同時に保持するタスクはwindow件までに抑え、結果はすぐに呼び出し元へ渡します。
+        認証エラー（401/403）は search_multiple_tracks と同様にそのまま送出し、残りの検索を中止します。
+        deadline（秒）を指定すると、その時間内に終わらなかったクエリは failed として返します。
+        """
+        until = None if deadline is None else time.monotonic() + deadline
+
+        async def _search_indexed(index: int, q: TrackQuery) -> TrackSearchResult:
+            try:
+                match = await self._search_until(q, until)
+            except SpotifyException as e:
+                if e.http_status in (401, 403):
+                    raise
+                return TrackSearchResult(index=index, query=q, status="failed")
+            if match:
+                return TrackSearchResult(index=index, query=q, status="found", track=match.track, score=match.score, alternates=match.alternates)
+            return TrackSearchResult(index=index, query=q, status="not_found")
+
+        pending = set()
+        query_iter = iter(enumerate(queries))
+        try:
+            while True:
+                # ウィンドウに空きがあれば次のクエリの検索を開始する
+                for index, q in query_iter:
+                    pending.add(asyncio.create_task(_search_indexed(index, q)))
+                    if len(pending) >= window:
+                        break
+                if not pending:
+                    break
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+        finally:
+            # クライアントが切断した場合などは残りの検索をキャンセルする
+            for task in pending:
+                task.cancel()
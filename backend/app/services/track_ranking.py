@@ -0,0 +1,64 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from app.services.catalog_index import normalize_title, trigrams, dice
+
+# 検索1回あたりに取得する候補数
+RANKING_CANDIDATES = 5
+
+# 元の曲名にない場合に減点するバージョン表記
+_VARIANT_RE = re.compile(
+    r"\b(live|remix|mix|karaoke|instrumental|inst|acoustic|cover|demo|off vocal)\b"
+    r"|ライブ|カラオケ|インスト|リミックス|オフボーカル"
+)
+
+# 特徴量ごとの重み（タイトル, アーティスト, バージョン表記の減点, 曲の長さの減点, Spotifyでの順位）
+_WEIGHTS = (0.55, 0.3, -0.25, -0.1, 0.05)
+
+
+def _variant_tags(text: str) -> set:
+    return {m.group(0) for m in _VARIANT_RE.finditer(text.casefold())}
+
+
+def score_candidates(
+    track_name: str,
+    artist_name: Optional[str],
+    candidates: List[Dict[str, Any]],
+) -> List[Tuple[Dict[str, Any], float]]:
+    """
+    検索結果の候補をクエリとの一致度で採点し、スコアの高い順に返します。
+
+    特徴量:
+      - 曲名の類似度（正規化した文字トライグラムのDice係数）
+      - アーティスト名の類似度
+      - クエリにない "Live" "Remix" "Karaoke" などのバージョン表記（減点）
+      - 極端に短い/長い曲（イントロ・SE・メドレーなど、減点）
+      - Spotifyの検索順位（人気度の代わりとして小さく加点）
+    """
+    if not candidates:
+        return []
+
+    query_title = normalize_title(track_name)
+    query_title_grams = trigrams(query_title)
+    query_artist = normalize_title(artist_name)
+    query_artist_grams = trigrams(query_artist) if query_artist else set()
+    query_tags = _variant_tags(track_name)
+
+    # 候補ごとの特徴量ベクトルを作成し、重み付き和でスコアを計算する
+    features = []
+    for rank, item in enumerate(candidates):
+        title = normalize_title(item.get("name"))
+        title_score = 1.0 if title == query_title else dice(query_title_grams, trigrams(title))
+        if query_artist_grams:
+            artist = normalize_title(item.get("artist"))
+            artist_score = 1.0 if artist == query_artist else dice(query_artist_grams, trigrams(artist))
+        else:
+            artist_score = 1.0
+        variant_penalty = 1.0 if _variant_tags(item.get("name") or "") - query_tags else 0.0
+        duration_ms = item.get("duration_ms")
+        duration_penalty = 1.0 if duration_ms is not None and not (60_000 <= duration_ms <= 900_000) else 0.0
+        rank_prior = 1.0 - rank / len(candidates)
+        features.append((title_score, artist_score, variant_penalty, duration_penalty, rank_prior))
+
+    scores = [sum(w * f for w, f in zip(_WEIGHTS, vector)) for vector in features]
+    ranked = sorted(zip(candidates, scores), key=lambda pair: pair[1], reverse=True)
+    return [(item, round(max(0.0, min(1.0, score / (_WEIGHTS[0] + _WEIGHTS[1] + _WEIGHTS[4]))), 4)) for item, score in ranked]
@@ -0,0 +1,242 @@
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+from app.schemas import TrackQuery
+
+# 曲名として扱う長さの上限（これより長い行は説明文などとみなす）
+MAX_TITLE_LENGTH = 200
+
+# 行頭の箇条書き記号
+_BULLET_RE = re.compile(r"^[-*•・●○◎▶►→>]+\s*")
+# 行頭の曲順の番号: "1." "2)" "(3)" "[4]" "05:" "M1" "M-01." "EN1" "EN." "#2." "No.3" "1 - " "01 "
+# 番号と曲名の間に区切りがない "5150" や "99 Luftballons" のような曲名は番号とみなさない
+# "M"・"EN" の後の区切りを省略できるのは数字が続く場合だけ（"EN Sparks" は曲名のまま残す）
+_NUMBERING_RE = re.compile(
+    r"^(?:"
+    r"(?:m|en)\s*-?\s*\d{1,3}\s*[.):、\]-]?\s+"
+    r"|en\s*[.:](?:\s+|$)"
+    r"|(?:m|en|e|#|no\.?|track)\s*-?\s*\d{1,3}\s*(?:[)、\]]|[.:](?!\d))\s*"
+    r"|[(\[]\d{1,3}[)\]]\s*"
+    r"|\d{1,3}\s*(?:[)、]|[.:](?!\d))\s*"
+    r"|\d{1,3}\s+[-–—]\s+"
+    r"|0\d\s+"
+    r")",
+    re.IGNORECASE,
+)
+# 丸数字の番号（NFKCで数字に変換される前に取り除く）
+_CIRCLED_NUMBER_RE = re.compile(r"^(\s*)[\u2460-\u2473\u3251-\u325f\u32b1-\u32bf\u2776-\u2793]\s*", re.MULTILINE)
+# 見出しの前後の装飾
+_DECORATION_CHARS = "-=~〜ー_*#<>[]()【】《》〈〉「」『』:.・ "
+# 見出しであることを示す前後の装飾（曲名を囲む「」『』は含めない）
+_HEADER_MARK_CHARS = "-=~〜_*#<>[]()【】《》〈〉:"
+# 単独の行でも見出しとみなすセクションのキーワード（アンコール、本編など）とMC
+_HEADER_RE = re.compile(
+    r"^(?:"
+    r"(?:(?:double|triple|ダブル|トリプル)\s*|w\s+)?(?:encore|アンコール)\s*\d*"
+    r"|set\s*\d+|main\s*set|set\s*list|setlist|セットリスト|セトリ|本編|第?\d+部|\d+日目"
+    r"|mc\s*\d*|opening\s*se|登場\s*se|開演|終演|休憩|intermission"
+    r")$",
+    re.IGNORECASE,
+)
+# 曲名にもなる見出し（"En" "Se" "Day 1" "Part 2" など）。装飾か行末のコロンがある場合だけ見出しとみなす
+_MARKED_HEADER_RE = re.compile(
+    r"^(?:"
+    r"(?:(?:double|triple|ダブル|トリプル)\s*|w\s+)?en\s*\d*"
+    r"|(?:day|night|disc|part|act|leg)\s*\d+"
+    r"|se"
+    r")$",
+    re.IGNORECASE,
+)
+# 「SE: 曲名」のような、テープ（音源の再生）を表す行頭の表記
+_TAPE_PREFIX_RE = re.compile(r"^(?:opening\s*|登場\s*)?se\s*[:.\-]\s*", re.IGNORECASE)
+# 行末の「※新曲」「★初披露」のような注記
+_MARK_NOTE_RE = re.compile(r"\s*[※★☆].*$")
+_TAPE_NOTE_RE = re.compile(r"\btape\b|^se$|テープ|音源", re.IGNORECASE)
+_COVER_NOTE_RE = re.compile(r"^(?:(.+?)\s+cover|cover\s+of\s+(.+)|(.+?)\s*カバー|cover|カバー)$", re.IGNORECASE)
+# 取り除いてよい注記（演奏形態やゲストなど、検索の邪魔になるもの）
+_DROP_NOTE_RE = re.compile(
+    r"^(?:with|w/|feat\.?|ft\.?|featuring)\s"
+    r"|acoustic|unplugged|snippet|short|extended|partial|live\s*debut|debut|first\s*time|new\s*song|unreleased"
+    r"|medley|reprise|intro|outro|\bver(?:sion|\.)?\b|\bversion\b|full\s*band|band\s*ver"
+    r"|新曲|初披露|未発表|弾き語り|アコースティック|ショート|メドレー|ver\.|バージョン|ゲスト|一部|サビのみ",
+    re.IGNORECASE,
+)
+# 「曲名 - Live」のように区切りの後ろが注記の場合は、アーティストと曲名の区切りとみなさない
+_SUFFIX_NOTE_RE = re.compile(
+    r"^(?:live|acoustic|remaster(?:ed)?|\d{4}\s*remaster(?:ed)?|radio\s*edit|edit|.*\bver(?:sion|\.)?|.*\bmix)$",
+    re.IGNORECASE,
+)
+_ARTIST_SEPARATOR_RE = re.compile(r"\s+[-–—]\s+")
+_SLASH_SEPARATOR_RE = re.compile(r"\s+/\s+")
+# 曲名を囲む引用符（開き -> 閉じ）
+_QUOTES = {"\"": "\"", "'": "'", "“": "”", "「": "」", "『": "』"}
+_NOTE_ENDINGS = frozenset(")]】")
+
+
+@dataclass
+class ParsedSetlist:
+    """セットリストの解析結果。"""
+
+    queries: List[TrackQuery] = field(default_factory=list)
+    # 曲として扱わなかった行（見出し・MC・テープなど）
+    skipped: List[str] = field(default_factory=list)
+    # 重複として除いた曲の数
+    duplicates: int = 0
+
+
+def _fold(text: Optional[str]) -> str:
+    return " ".join(text.casefold().split()) if text else ""
+
+
+def _strip_quotes(text: str) -> str:
+    if len(text) > 2 and _QUOTES.get(text[0]) == text[-1]:
+        return text[1:-1].strip()
+    return text
+
+
+def _is_header(line: str) -> bool:
+    bare = line.strip(_DECORATION_CHARS)
+    if not bare:
+        return True
+    if _HEADER_RE.match(bare):
+        return True
+    line = line.strip()
+    marked = line[0] in _HEADER_MARK_CHARS or line[-1] in _HEADER_MARK_CHARS
+    if marked and _MARKED_HEADER_RE.match(bare):
+        return True
+    # 「Acoustic set:」のような短い行末コロンの行も見出しとみなす
+    return line.endswith(":") and len(bare.split()) <= 4
+
+
+def _strip_notes(title: str) -> Tuple[str, bool, Optional[str]]:
+    """
+    行末の注記を取り除きます。(曲名, テープかどうか, カバー元のアーティスト) を返します。
+    曲名の一部かもしれない括弧書き（"(I Can't Get No) Satisfaction" や "Song (Remix)" など）は残します。
+    """
+    tape = False
+    cover_artist = None
+    mark = _MARK_NOTE_RE.search(title)
+    if mark is not None:
+        title = title[:mark.start()]
+    while title[-1:] in _NOTE_ENDINGS:
+        start = max(title.rfind("("), title.rfind("["), title.rfind("【"))
+        if start < 0:
+            break
+        note = title[start + 1:-1].strip()
+        if _TAPE_NOTE_RE.search(note):
+            tape = True
+        elif (cover := _COVER_NOTE_RE.match(note)) is not None:
+            cover_artist = next((group for group in cover.groups() if group), None) or cover_artist
+        elif not _DROP_NOTE_RE.search(note):
+            break
+        title = title[:start].rstrip()
+    return title.strip(), tape, cover_artist
+
+
+def _split_artist(text: str, artist_name: Optional[str], folded_artist: str) -> List[Tuple[str, Optional[str]]]:
+    """
+    「アーティスト - 曲名」「曲名 / アーティスト」などの表記を (曲名, アーティスト名) に分けます。
+    アーティスト名が指定されている場合は、それと一致する側をアーティストとみなします。
+    どちらも一致しない「A - B」は行全体を曲名とし、「A / B」はメドレーとみなしてそれぞれを曲名として扱います。
+    アーティスト名が指定されていない「A - B」は、どちらがアーティストか判断できないため行全体を曲名とします。
+    """
+    dash = _ARTIST_SEPARATOR_RE.search(text)
+    if dash is not None:
+        left, right = text[:dash.start()].strip(), text[dash.end():].strip()
+        if _SUFFIX_NOTE_RE.match(right):
+            return [(left, artist_name)]
+        if folded_artist and _fold(right) == folded_artist:
+            return [(left, artist_name)]
+        if folded_artist and _fold(left) == folded_artist:
+            return [(right, artist_name)]
+        return [(text, artist_name)]
+
+    if " /" not in text:
+        return [(text, artist_name)]
+    parts = [part.strip() for part in _SLASH_SEPARATOR_RE.split(text)]
+    if len(parts) == 1:
+        return [(text, artist_name)]
+    if folded_artist:
+        if len(parts) == 2 and _fold(parts[1]) == folded_artist:
+            return [(parts[0], artist_name)]
+        if len(parts) == 2 and _fold(parts[0]) == folded_artist:
+            return [(parts[1], artist_name)]
+        return [(part, artist_name) for part in parts]
+    if len(parts) == 2:
+        return [(parts[0], parts[1])]
+    return [(part, None) for part in parts]
+
+
+def parse_setlist_line(line: str, artist_name: Optional[str] = None, include_tapes: bool = False) -> Optional[List[TrackQuery]]:
+    """
+    セットリストの1行を解析して TrackQuery のリストを返します（メドレーの場合は複数）。
+    曲でない行（空行・見出し・MC・テープなど）の場合はNoneを返します。
+    """
+    return _parse_line(line, artist_name, _fold(artist_name), include_tapes)
+
+
+def _parse_line(line: str, artist_name: Optional[str], folded_artist: str, include_tapes: bool) -> Optional[List[TrackQuery]]:
+    line = line.strip()
+    if not line:
+        return None
+    line = _BULLET_RE.sub("", line)
+    numbered = _NUMBERING_RE.match(line)
+    if numbered is not None:
+        line = line[numbered.end():]
+    # 番号付きの見出し・MC（"16. MC" "14. Encore:"）も除く
+    if _is_header(line):
+        return None
+
+    tape = False
+    tape_prefix = _TAPE_PREFIX_RE.match(line)
+    if tape_prefix is not None:
+        tape = True
+        line = line[tape_prefix.end():]
+    title, tape_note, cover_artist = _strip_notes(line)
+    if (tape or tape_note) and not include_tapes:
+        return None
+
+    queries = []
+    for track_name, artist in _split_artist(_strip_quotes(title), artist_name, folded_artist):
+        track_name = " ".join(_strip_quotes(track_name).split())
+        if not track_name or len(track_name) > MAX_TITLE_LENGTH or not any(ch.isalnum() for ch in track_name):
+            continue
+        queries.append(TrackQuery(track_name=track_name, artist_name=cover_artist or artist or None))
+    return queries or None
+
+
+def parse_setlist(text: str, artist_name: Optional[str] = None, include_tapes: bool = False, dedup: bool = True) -> ParsedSetlist:
+    """
+    セットリストサイトなどから貼り付けたテキストを解析し、一括検索用の TrackQuery のリストに変換します。
+
+    - 曲順の番号（"1." "M1" "(3)" "01" など）と箇条書き記号を取り除きます。
+    - 見出し（"Encore:" "Set 2" "アンコール" "-- Day 1 --" など）・MC・区切り線の行は除きます。
+      曲名にもなる "En" "Se" "Day 1" "Part 2" は、装飾か行末のコロンがある場合だけ見出しとみなします。
+    - テープ（"(tape)" "SE:"）の行は除き、"(X cover)" はカバー元のアーティストで検索するようにします。
+    - "Artist - Title" "Title / Artist" の表記をアーティスト名と曲名に分けます
+      （"Artist - Title" は、指定されたアーティスト名と一致する側がある場合だけ分けます）。
+    - dedup=True の場合、同じ曲（大文字小文字・空白の違いを除く）は最初の1件だけ残します。
+
+    テキストは最初にNFKCで正規化します（全角英数字・記号や丸数字もそのまま扱えます）。
+    """
+    result = ParsedSetlist()
+    seen = set()
+    text = unicodedata.normalize("NFKC", _CIRCLED_NUMBER_RE.sub(r"\1", text))
+    if artist_name:
+        artist_name = unicodedata.normalize("NFKC", artist_name).strip() or None
+    folded_artist = _fold(artist_name)
+    for line in text.splitlines():
+        queries = _parse_line(line, artist_name, folded_artist, include_tapes)
+        if queries is None:
+            if line.strip():
+                result.skipped.append(line.strip())
+            continue
+        for query in queries:
+            key = (_fold(query.track_name), _fold(query.artist_name))
+            if dedup and key in seen:
+                result.duplicates += 1
+                continue
+            seen.add(key)
+            result.queries.append(query)
+    return result
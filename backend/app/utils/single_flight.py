@@ -0,0 +1,43 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    同じキーに対する同時実行中の呼び出しを1つにまとめる（single-flight）。
+    最初の呼び出しだけが実際の処理を実行し、後から来た呼び出しはその結果（または例外）を共有します。
+    処理が完了するとキーは解放されるため、結果のキャッシュは行いません。
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, "asyncio.Task[Any]"] = {}
+        self.executed = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """キーごとにfnを最大1つだけ実行し、その結果を返します。"""
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._calls[key] = task
+            task.add_done_callback(lambda t, key=key: self._release(key, t))
+            self.executed += 1
+        else:
+            self.shared += 1
+        # 待機側がキャンセルされても、共有している処理自体はキャンセルしない
+        return await asyncio.shield(task)
+
+    def _release(self, key: Hashable, task: "asyncio.Task[Any]") -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # 待機側がすべてキャンセルされた場合でも例外を回収しておく
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._calls)
+
+    def stats(self) -> Dict[str, int]:
+        return {"in_flight": len(self._calls), "executed": self.executed, "shared": self.shared}
@@ -1,34 +1,109 @@
 import os
 import time
+import hashlib
+import logging
 from datetime import datetime
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
+from typing import Any, Dict, Optional
+from urllib.parse import urlencode
+import httpx
 from fastapi import Request, Response, HTTPException
+from app.core.metrics import token_refresh_total
+from app.services.spotify_client import get_http_client
+from app.utils.single_flight import SingleFlight
+from app.utils.ttl_cache import LRUTTLCache
+
+logger = logging.getLogger(__name__)
+
+SPOTIFY_ACCOUNTS_BASE_URL = os.environ.get("SPOTIFY_ACCOUNTS_BASE_URL", "https://accounts.spotify.com")
+# 有効期限のこの秒数前からリフレッシュを行う
+TOKEN_REFRESH_WINDOW = int(os.environ.get("TOKEN_REFRESH_WINDOW", "300"))
+# リフレッシュ直後のトークンを、古いCookieで届いた同時リクエストと共有する時間
+REFRESHED_TOKEN_TTL = int(os.environ.get("REFRESHED_TOKEN_TTL", "60"))
+
+class SpotifyOauthError(Exception):
+    """トークンエンドポイントでのエラー（spotipyのSpotifyOauthErrorに相当）。"""
+
+    def __init__(self, message: str, error: Optional[Any] = None, error_description: Optional[str] = None):
+        super().__init__(message)
+        self.error = error
+        self.error_description = error_description
+
 
 class TokenManager:
-    def __init__(self, client_id: str, client_secret: str, redirect_uri: str, scope: str):
-        self.sp_oauth = SpotifyOAuth(
-            client_id=client_id,
-            client_secret=client_secret,
-            redirect_uri=redirect_uri,
-            scope=scope
-        )
+    def __init__(self, client_id: str, client_secret: str, redirect_uri: str, scope: str, environment: str = "development"):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.redirect_uri = redirect_uri
+        self.scope = scope
+
+        # 同じリフレッシュトークンによる同時リフレッシュを1回にまとめる
+        self._refresh_flight = SingleFlight()
+        self._refreshed_tokens = LRUTTLCache(max_entries=10000, default_ttl=REFRESHED_TOKEN_TTL)
         
         # 環境判定
-        self.environment = os.environ.get("ENVIRONMENT", "development")
+        self.environment = environment
         self.is_production = self.environment == "production"
 
     def get_auth_url(self):
         """認証用のURLを生成して返します。"""
-        return self.sp_oauth.get_authorize_url()
+        params = {
+            "client_id": self.client_id,
+            "response_type": "code",
+            "redirect_uri": self.redirect_uri,
+            "scope": self.scope,
+        }
+        return f"{SPOTIFY_ACCOUNTS_BASE_URL}/authorize?{urlencode(params)}"
+
+    async def _token_request(self, data: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Spotifyのトークンエンドポイントにリクエストを送ります。
+        接続はSpotify API呼び出しと同じ共有コネクションプールを使います。
+        """
+        response = await get_http_client().post(
+            f"{SPOTIFY_ACCOUNTS_BASE_URL}/api/token",
+            data=data,
+            auth=(self.client_id, self.client_secret),
+        )
+        if response.status_code != 200:
+            raise SpotifyOauthError(
+                f"Token request failed ({response.status_code}): {response.text}",
+                error=response.status_code,
+            )
+        token_info = response.json()
+        token_info["expires_at"] = int(time.time()) + token_info["expires_in"]
+        return token_info
 
-    def exchange_code_for_token(self, code: str):
+    async def exchange_code_for_token(self, code: str) -> Dict[str, Any]:
         """認可コードをアクセストークンと交換します。"""
-        return self.sp_oauth.get_access_token(code)
+        return await self._token_request({
+            "grant_type": "authorization_code",
+            "code": code,
+            "redirect_uri": self.redirect_uri,
+        })
 
-    def refresh_token_if_needed(self, refresh_token: str):
-        """リフレッシュトークンを使い、新しいアクセストークンを取得します。"""
-        return self.sp_oauth.refresh_access_token(refresh_token)
+    async def _request_refresh(self, refresh_token: str) -> Dict[str, Any]:
+        """Spotifyのトークンエンドポイントに非同期でリフレッシュを要求します。"""
+        token_info = await self._token_request({"grant_type": "refresh_token", "refresh_token": refresh_token})
+        # ローテーションされなかった場合は元のリフレッシュトークンを引き継ぐ
+        token_info.setdefault("refresh_token", refresh_token)
+        return token_info
+
+    async def refresh_token_if_needed(self, refresh_token: str) -> Dict[str, Any]:
+        """
+        リフレッシュトークンを使い、新しいアクセストークンを取得します。
+        同じリフレッシュトークンでの同時リフレッシュは1回にまとめ、結果を短時間キャッシュします。
+        """
+        key = hashlib.sha256(refresh_token.encode()).hexdigest()
+        cached = self._refreshed_tokens.get(key)
+        if cached is not None:
+            return cached
+
+        async def _refresh() -> Dict[str, Any]:
+            token_info = await self._request_refresh(refresh_token)
+            self._refreshed_tokens.set(key, token_info)
+            return token_info
+
+        return await self._refresh_flight.do(key, _refresh)
 
     def set_tokens_in_cookie(self, response: Response, token_info: dict):
         """取得したトークン情報をHTTPOnlyのCookieに設定します。"""
@@ -56,48 +131,54 @@ class TokenManager:
                 "path": "/",
             }
 
-        # デバッグ用：Cookie設定を出力
-        print(f"Environment: {self.environment}")
-        print(f"Setting cookies with params: {common_params}")
-        print(f"Access token length: {len(access_token) if access_token else 0}")
-        print(f"Expires in: {expires_in} seconds")
-        print(f"Expires at: {expires_at}")
-
         try:
             response.set_cookie(key="access_token", value=access_token, max_age=expires_in, **common_params)
             if refresh_token:
                 response.set_cookie(key="refresh_token", value=refresh_token, **common_params)
             response.set_cookie(key="expires_at", value=str(expires_at), **common_params)
-            print("✅ Cookies set successfully")
-        except Exception as e:
-            print(f"❌ Failed to set cookies: {e}")
+        except Exception:
+            logger.exception("Failed to set token cookies")
             raise
 
-    def get_valid_access_token(self, request: Request, response: Response):
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Token cookies set",
+                extra={
+                    "environment": self.environment,
+                    "secure": common_params["secure"],
+                    "access_token_length": len(access_token) if access_token else 0,
+                    "expires_in": expires_in,
+                    "expires_at": expires_at,
+                },
+            )
+
+    async def get_valid_access_token(self, request: Request, response: Response):
         """
         Cookieからアクセストークンを取得します。
-        有効期限が切れている場合はリフレッシュし、新しいトークンをCookieに再設定します。
+        有効期限が近い、または切れている場合はリフレッシュし、新しいトークンをCookieに再設定します。
         有効なトークンが取得できない場合はHTTPExceptionを送出します。
         """
         access_token = request.cookies.get("access_token")
         expires_at_str = request.cookies.get("expires_at")
         refresh_token = request.cookies.get("refresh_token")
 
-        # デバッグ用：リクエスト情報を出力
-        print(f"🔍 Token validation request")
-        print(f"  - User Agent: {request.headers.get('user-agent', 'Unknown')}")
-        print(f"  - Host: {request.headers.get('host', 'Unknown')}")
-        print(f"  - Origin: {request.headers.get('origin', 'Unknown')}")
-        print(f"  - Referer: {request.headers.get('referer', 'Unknown')}")
-        print(f"  - Cookie header present: {bool(request.headers.get('cookie'))}")
-        print(f"  - Available cookies: {list(request.cookies.keys())}")
-        print(f"  - Access token present: {bool(access_token)}")
-        print(f"  - Refresh token present: {bool(refresh_token)}")
-        print(f"  - Expires at: {expires_at_str}")
-
-        # 1. アクセストークンがなければ、即座に認証失敗
-        if not access_token:
-            print("❌ No access token found in cookies")
+        # デバッグ用：リクエスト情報を出力（DEBUGが無効な場合は何もしない）
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(
+                "Token validation request",
+                extra={
+                    "user_agent": request.headers.get("user-agent"),
+                    "host": request.headers.get("host"),
+                    "origin": request.headers.get("origin"),
+                    "cookies": list(request.cookies.keys()),
+                    "expires_at": expires_at_str,
+                },
+            )
+
+        # 1. アクセストークンもリフレッシュトークンもなければ、即座に認証失敗
+        #    （access_tokenのCookieは有効期限で消えるため、リフレッシュトークンがあれば更新を試みる）
+        if not access_token and not refresh_token:
+            logger.info("No access token found in cookies")
             raise HTTPException(
                 status_code=401, 
                 detail="アクセストークンが見つかりません。ログインしてください。"
@@ -105,42 +186,44 @@ class TokenManager:
 
         # 2. トークンの有効期限をチェック (expires_atがない場合は安全のため期限切れとみなす)
         is_expired = True
-        if expires_at_str:
+        needs_refresh = True
+        if access_token and expires_at_str:
             try:
                 current_time = datetime.now().timestamp()
                 expires_at = float(expires_at_str)
                 is_expired = current_time > expires_at - 60
-                print(f"⏰ Token expiry check: current={current_time}, expires={expires_at}, expired={is_expired}")
-            except ValueError as e:
+                needs_refresh = current_time > expires_at - TOKEN_REFRESH_WINDOW
+            except ValueError:
                 # expires_at_strが不正な値の場合は期限切れとして扱う
-                print(f"❌ Invalid expires_at format: {expires_at_str}, error: {e}")
-                is_expired = True
-        else:
-            print("❌ No expires_at found, treating as expired")
+                logger.warning("Invalid expires_at cookie, treating as expired", extra={"expires_at": expires_at_str})
         
-        # 3. 有効期限内であれば、現在のトークンを返す
-        if not is_expired:
-            print("✅ Using valid access token")
+        # 3. 有効期限まで十分な余裕があれば、現在のトークンを返す
+        if not needs_refresh:
             return access_token
 
-        # 4. トークンが期限切れの場合、リフレッシュを試みる
-        print("🔄 Access token expired, attempting refresh")
+        # 4. トークンが期限切れ、または期限が近い場合、リフレッシュを試みる
         if not refresh_token:
-            print("❌ No refresh token found")
+            if not is_expired:
+                return access_token
+            logger.info("Access token expired and no refresh token found")
             raise HTTPException(
                 status_code=401, 
                 detail="セッションの有効期限が切れました。再度ログインしてください。"
             )
         
         try:
-            print(f"🔄 Refreshing token...")
-            new_token_info = self.refresh_token_if_needed(refresh_token)
+            new_token_info = await self.refresh_token_if_needed(refresh_token)
             self.set_tokens_in_cookie(response, new_token_info)
-            print("✅ Token refreshed successfully")
+            token_refresh_total.inc(result="success")
+            logger.info("Access token refreshed", extra={"proactive": not is_expired})
             return new_token_info["access_token"]
-        except Exception as e:
-            print(f"❌ Token refresh failed: {e}")
+        except (SpotifyOauthError, httpx.HTTPError, KeyError, ValueError) as e:
+            token_refresh_total.inc(result="failure")
+            logger.warning("Token refresh failed", extra={"error": str(e), "proactive": not is_expired})
+            # 期限前の先行リフレッシュに失敗しただけであれば、現在のトークンをそのまま使う
+            if not is_expired:
+                return access_token
             raise HTTPException(
                 status_code=401, 
                 detail=f"トークンのリフレッシュに失敗しました: {e}"
-            )
\ No newline at end of file
+            )
@@ -0,0 +1,63 @@
+import re
+from typing import List, Optional, Tuple
+
+# Spotifyのトラック IDは22文字のbase62
+_TRACK_ID_RE = re.compile(r"^[0-9A-Za-z]{22}$")
+_TRACK_URL_RE = re.compile(r"^https?://open\.spotify\.com/(?:intl-[a-z-]+/)?track/([0-9A-Za-z]{22})(?:[/?#].*)?$")
+# プレイリストにはポッドキャストのエピソードも追加できる（IDの形式はトラックと同じ）
+_EPISODE_URL_RE = re.compile(r"^https?://open\.spotify\.com/(?:intl-[a-z-]+/)?episode/([0-9A-Za-z]{22})(?:[/?#].*)?$")
+
+
+def normalize_track_uri(value: str) -> Optional[str]:
+    """
+    トラックURI・URL・IDを `spotify:track:<id>` 形式に正規化します。
+    トラックとして解釈できない場合はNoneを返します。
+    """
+    value = value.strip()
+    if value.startswith("spotify:track:"):
+        track_id = value[len("spotify:track:"):]
+    else:
+        match = _TRACK_URL_RE.match(value)
+        track_id = match.group(1) if match else value
+    if not _TRACK_ID_RE.match(track_id):
+        return None
+    return f"spotify:track:{track_id}"
+
+
+def normalize_episode_uri(value: str) -> Optional[str]:
+    """
+    エピソードURI・URLを `spotify:episode:<id>` 形式に正規化します。
+    IDだけの値はトラックとして扱うため、ここでは解釈しません（Noneを返します）。
+    """
+    value = value.strip()
+    if value.startswith("spotify:episode:"):
+        episode_id = value[len("spotify:episode:"):]
+    else:
+        match = _EPISODE_URL_RE.match(value)
+        if not match:
+            return None
+        episode_id = match.group(1)
+    if not _TRACK_ID_RE.match(episode_id):
+        return None
+    return f"spotify:episode:{episode_id}"
+
+
+def validate_track_uris(uris: List[str], dedup: bool = True, allow_episodes: bool = False) -> Tuple[List[str], List[str]]:
+    """
+    トラックURIのリストをローカルで検証します。
+    (正規化済みの有効なURIのリスト, 不正な値のリスト) を返します。dedup=Trueの場合、重複は最初の1件だけ残します。
+    allow_episodes=Trueの場合は、プレイリストに追加できるエピソードのURI・URLも有効とします。
+    """
+    valid: List[str] = []
+    invalid: List[str] = []
+    seen = set()
+    for value in uris:
+        uri = normalize_track_uri(value)
+        if uri is None and allow_episodes:
+            uri = normalize_episode_uri(value)
+        if uri is None:
+            invalid.append(value)
+        elif not dedup or uri not in seen:
+            seen.add(uri)
+            valid.append(uri)
+    return valid, invalid
@@ -0,0 +1,115 @@
+"""
+ローカルカタログ（CatalogIndex）のベンチマーク。
+
+記録済みのクエリコーパスに対するlookups/secとヒット率（正解率）を計測します。
+候補は検索時と同じ track_ranking.score_candidates で採点します。
+コーパスは次の形式のJSONファイルで指定します。指定しない場合は合成したコーパスを使います。
+
+    {
+      "tracks": [{"id": "...", "name": "...", "artist": "...", "uri": "..."}],
+      "queries": [{"track_name": "...", "artist_name": "...", "expected_uri": "..."}]
+    }
+
+    cd backend && python -m benchmarks.bench_catalog_index --tracks 50000 --queries 20000
+"""
+import argparse
+import json
+import random
+import string
+import time
+from typing import Any, Dict, List, Tuple
+
+from app.services.catalog_index import CatalogIndex
+from app.services.track_ranking import score_candidates
+
+_WORDS = [
+    "love", "night", "summer", "dream", "heart", "blue", "fire", "sky", "star", "rain",
+    "hello", "goodbye", "forever", "tonight", "world", "light", "dance", "city", "road", "home",
+    "さくら", "夜空", "青春", "ひかり", "ありがとう", "マリーゴールド", "ハルジオン", "群青", "夜に駆ける", "怪物",
+]
+
+
+def _synthetic_corpus(num_tracks: int, num_queries: int, seed: int = 0) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """
+    表記ゆれ（大文字小文字・全角・feat.・タイプミス）を含む合成コーパスを作成します。
+    一部の曲には、正解にしてはいけないバージョン違い（Live・Karaoke）のトラックも加えます。
+    """
+    rng = random.Random(seed)
+    def _word() -> str:
+        if rng.random() < 0.5:
+            return rng.choice(_WORDS)
+        return "".join(rng.choice("aeiou" if j % 2 else "bcdfghklmnprstvwz") for j in range(rng.randint(3, 8)))
+
+    artists = [" ".join(_word() for _ in range(rng.randint(1, 2))).title() for _ in range(num_tracks // 10 + 1)]
+    tracks = []
+    for i in range(num_tracks):
+        name = " ".join(_word() for _ in range(rng.randint(1, 4))).title()
+        artist = rng.choice(artists)
+        tracks.append({"id": f"{i:022d}", "name": name, "artist": artist, "uri": f"spotify:track:{i:022d}"})
+        if rng.random() < 0.1:
+            variant_id = f"v{i:021d}"
+            variant_name = f"{name} ({rng.choice(['Karaoke Version', 'Live'])})"
+            tracks.append({"id": variant_id, "name": variant_name, "artist": artist, "uri": f"spotify:track:{variant_id}"})
+
+    def _variant(name: str) -> str:
+        kind = rng.randrange(5)
+        if kind == 0:
+            return name.upper()
+        if kind == 1:
+            return f"{name} (feat. Someone)"
+        if kind == 2 and len(name) > 4:
+            pos = rng.randrange(len(name))
+            return name[:pos] + rng.choice(string.ascii_lowercase) + name[pos + 1:]
+        if kind == 3:
+            return name.translate({ord(c): ord(c) + 0xFEE0 for c in string.ascii_letters})
+        return name
+
+    queries = []
+    for _ in range(num_queries):
+        if rng.random() < 0.8:
+            track = rng.choice(tracks)
+            while track["id"].startswith("v"):
+                track = rng.choice(tracks)
+            queries.append({"track_name": _variant(track["name"]), "artist_name": track["artist"], "expected_uri": track["uri"]})
+        else:
+            queries.append({"track_name": "Unknown Song " + str(rng.randrange(10**6)), "artist_name": "Nobody", "expected_uri": None})
+    return tracks, queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="記録済みコーパスのJSONファイル")
+    parser.add_argument("--tracks", type=int, default=50000)
+    parser.add_argument("--queries", type=int, default=20000)
+    args = parser.parse_args()
+
+    if args.corpus:
+        with open(args.corpus, encoding="utf-8") as f:
+            corpus = json.load(f)
+        tracks, queries = corpus["tracks"], corpus["queries"]
+    else:
+        tracks, queries = _synthetic_corpus(args.tracks, args.queries)
+
+    index = CatalogIndex(max_tracks=len(tracks) + 1)
+    started = time.perf_counter()
+    index.add_many(tracks)
+    build_time = time.perf_counter() - started
+
+    hits = correct = 0
+    started = time.perf_counter()
+    for q in queries:
+        match = index.lookup(q["track_name"], q.get("artist_name"), rank=score_candidates)
+        if match is not None:
+            hits += 1
+            correct += match.track.uri == q.get("expected_uri")
+    elapsed = time.perf_counter() - started
+
+    print(f"tracks:       {len(tracks)} (build {build_time:.2f}s, {index.stats()['trigrams']} trigrams)")
+    print(f"queries:      {len(queries)}")
+    print(f"lookups/sec:  {len(queries) / elapsed:,.0f}")
+    print(f"hit rate:     {hits / len(queries):.3f}")
+    print(f"precision:    {correct / hits if hits else 0:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+リクエストごとのSpotifyクライアント生成のオーバーヘッドを比較するマイクロベンチマーク。
+
+  before: リクエストごとに spotipy.Spotify（と requests.Session）を作成する従来の方式
+  after:  共有コネクションプールの上に AsyncSpotifyClient を作成し、トークンだけを差し替える方式
+
+偽のSpotify API（benchmarks.fake_spotify）を実際のTCPポートで起動し、
+/v1/me を呼び出す1リクエストあたりの時間を計測します。
+ローカルの平文HTTPで計測するため、本番で効くTLSハンドシェイクの削減分は含まれません。
+spotipyは本番の依存パッケージではないため、requirements-dev.txt で入れてから実行します。
+
+    cd backend && pip install -r requirements-dev.txt
+    cd backend && python -m benchmarks.bench_client_overhead --requests 500
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import threading
+import time
+from typing import List
+
+import httpx
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_fake_server(port: int):
+    import uvicorn
+    from benchmarks.fake_spotify import FakeSpotifyConfig, create_app
+
+    config = FakeSpotifyConfig(latency_ms=0.0, jitter_ms=0.0)
+    server = uvicorn.Server(uvicorn.Config(create_app(config), host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    return server, thread
+
+
+def _report(label: str, samples: List[float]) -> None:
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(
+        f"{label:<28} mean {statistics.mean(samples) * 1000:7.3f}ms  "
+        f"p50 {statistics.median(samples) * 1000:7.3f}ms  p99 {p99 * 1000:7.3f}ms"
+    )
+
+
+def bench_spotipy_per_request(base_url: str, num_requests: int) -> List[float]:
+    import spotipy
+
+    samples = []
+    for i in range(num_requests):
+        started = time.perf_counter()
+        sp = spotipy.Spotify(auth=f"token-{i}")
+        sp.prefix = f"{base_url}/v1/"
+        sp.current_user()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+async def bench_shared_pool(base_url: str, num_requests: int) -> List[float]:
+    # クライアント自体のオーバーヘッドを測るため、レートリミッターの待ち時間は除外する
+    os.environ.setdefault("SPOTIFY_RATE_LIMIT", "1000000")
+    os.environ.setdefault("SPOTIFY_RATE_BURST", "1000000")
+    from app.services import spotify_client
+    from app.services.spotify_client import AsyncSpotifyClient
+
+    spotify_client._http_client = httpx.AsyncClient(
+        base_url=f"{base_url}/v1",
+        limits=httpx.Limits(max_connections=spotify_client.SPOTIFY_MAX_CONNECTIONS),
+    )
+    samples = []
+    try:
+        for i in range(num_requests):
+            started = time.perf_counter()
+            await AsyncSpotifyClient(f"token-{i}").current_user()
+            samples.append(time.perf_counter() - started)
+    finally:
+        await spotify_client.close_http_client()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    port = _free_port()
+    server, thread = _start_fake_server(port)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        # ウォームアップ（インポートや初回接続のコストを除く）
+        bench_spotipy_per_request(base_url, 10)
+        asyncio.run(bench_shared_pool(base_url, 10))
+
+        _report("spotipy.Spotify per request", bench_spotipy_per_request(base_url, args.requests))
+        _report("AsyncSpotifyClient (pooled)", asyncio.run(bench_shared_pool(base_url, args.requests)))
+    finally:
+        server.should_exit = True
+        thread.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""
+アプリケーションの起動時間（app.mainのimport時間）を `python -X importtime` で計測し、予算と比較します。
+
+新しいプロセスで app.main を読み込む処理を複数回計測して中央値を予算と比較し、
+自己時間の大きいモジュールを表示します。起動時に読み込むべきでない重いモジュール
+（spotipy・requests・redisなど）が読み込まれていないかも確認します。
+予算の超過や禁止モジュールの読み込みがあれば終了コード1で終了するため、CIでの回帰検出に使えます。
+
+本番の起動と同じく ENVIRONMENT=production で読み込むため、静的ファイルのインデックス作成（StaticSite）も
+計測に含まれます。静的ファイルは --static-dir、app/static、frontend/dist の順に探し、
+どれもない場合はViteのビルドに似た合成のディレクトリ（ビルド時の .br/.gz 付き）を作って使います。
+
+    cd backend && python -m benchmarks.bench_import_time --runs 5 --budget-ms 600
+"""
+import argparse
+import gzip
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+STATIC_CANDIDATES = (BACKEND_DIR / "app" / "static", BACKEND_DIR.parent / "frontend" / "dist")
+
+DEFAULT_BUDGET_MS = 600.0
+# 起動時に読み込まれてはいけないモジュール
+DEFAULT_FORBIDDEN = ("spotipy", "requests", "redis")
+
+
+def make_static_dir(root: Path, seed: int = 0) -> Path:
+    """Viteのビルド成果物に似た合成の静的ファイル（index.html と数百KBのJS/CSS、.br/.gz付き）を作成します。"""
+    rng = random.Random(seed)
+    words = ["function", "return", "const", "let", "this", "props", "createElement", "null", "=>", "{", "}", "(", ")"]
+    files = {"index.html": "<!doctype html><html><head></head><body><div id=\"root\"></div></body></html>" * 8}
+    for name, words_count in (("assets/index-Bf3k9x.js", 90000), ("assets/vendor-Q2m7pd.js", 60000), ("assets/index-Cx81aa.css", 8000)):
+        files[name] = " ".join(rng.choice(words) + str(rng.randrange(100)) for _ in range(words_count))
+    for name, text in files.items():
+        path = root / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        content = text.encode()
+        path.write_bytes(content)
+        # frontend/scripts/precompress.mjs と同じく、ビルド時の圧縮版を用意する
+        (root / (name + ".gz")).write_bytes(gzip.compress(content, compresslevel=9, mtime=0))
+        if brotli is not None:
+            (root / (name + ".br")).write_bytes(brotli.compress(content, quality=11))
+    return root
+
+
+def find_static_dir(configured: Optional[str]) -> Optional[Path]:
+    if configured:
+        return Path(configured)
+    return next((path for path in STATIC_CANDIDATES if (path / "index.html").exists()), None)
+
+
+def measure(module: str, environment: str = "production", static_dir: Optional[Path] = None) -> Tuple[float, Dict[str, Tuple[float, float]]]:
+    """
+    新しいプロセスでモジュールを読み込み、(合計時間ms, {モジュール名: (自己時間ms, 累積時間ms)}) を返します。
+    """
+    env = dict(os.environ)
+    env.setdefault("LOG_LEVEL", "WARNING")
+    env["ENVIRONMENT"] = environment
+    if static_dir is not None:
+        env["STATIC_DIR"] = str(static_dir)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True,
+    )
+    modules: Dict[str, Tuple[float, float]] = {}
+    for line in result.stderr.splitlines():
+        # 形式: "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        modules[name.strip()] = (int(self_us) / 1000, int(cumulative_us) / 1000)
+    return modules[module][1], modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--top", type=int, default=15, help="表示する重いモジュールの数")
+    parser.add_argument("--forbid", nargs="*", default=list(DEFAULT_FORBIDDEN), help="起動時に読み込まれてはいけないモジュール")
+    parser.add_argument("--environment", default="production", help="ENVIRONMENTの値（productionでは静的ファイルのインデックス作成も計測する）")
+    parser.add_argument("--static-dir", help="インデックスを作成する静的ファイルのディレクトリ")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        static_dir = find_static_dir(args.static_dir)
+        if args.environment == "production" and static_dir is None:
+            static_dir = make_static_dir(Path(tmp) / "static")
+            print(f"static files: synthetic build in {static_dir}")
+        elif args.environment == "production":
+            print(f"static files: {static_dir}")
+
+        totals: List[float] = []
+        modules: Dict[str, Tuple[float, float]] = {}
+        for _ in range(args.runs):
+            try:
+                total, modules = measure(args.module, args.environment, static_dir)
+            except subprocess.CalledProcessError as e:
+                print(f"FAIL: import {args.module} raised an error:\n{e.stderr[-2000:]}")
+                sys.exit(1)
+            totals.append(total)
+
+    median = statistics.median(totals)
+    print(f"import {args.module} ({args.environment}): median {median:.1f}ms  min {min(totals):.1f}ms  max {max(totals):.1f}ms  ({args.runs} runs)")
+    print("\nslowest modules by self time (last run):")
+    for name, (self_ms, cumulative_ms) in sorted(modules.items(), key=lambda item: item[1][0], reverse=True)[:args.top]:
+        print(f"  {self_ms:8.1f}ms  (cumulative {cumulative_ms:8.1f}ms)  {name}")
+
+    failed = False
+    forbidden = sorted(name for name in modules if name.split(".")[0] in args.forbid)
+    if forbidden:
+        print(f"\nFAIL: modules that should not be imported at startup: {', '.join(forbidden[:10])}")
+        failed = True
+    if median > args.budget_ms:
+        print(f"\nFAIL: import time {median:.1f}ms exceeds the budget of {args.budget_ms:.0f}ms")
+        failed = True
+    if not failed:
+        print(f"\nOK: within the budget of {args.budget_ms:.0f}ms")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+セットリストのテキスト解析（app.utils.setlist_parser）のスループットを計測します。
+
+番号の書式・見出し・MC・テープ・カバー・"Artist - Title" 表記などを混ぜたサンプルの
+セットリストを乱数のシードから大量に生成し、全体を解析する時間を複数回計測して中央値を表示します。
+--min-lines-per-sec を指定すると、スループットが下回った場合に終了コード1で終了します。
+
+    cd backend && python -m benchmarks.bench_setlist_parser --setlists 5000 --runs 5
+"""
+import argparse
+import random
+import statistics
+import sys
+import time
+from typing import List
+
+from app.utils.setlist_parser import parse_setlist
+
+ARTISTS = ["THE ORAL CIGARETTES", "Mrs. GREEN APPLE", "King Gnu", "Vaundy", "Radiohead", "Arctic Monkeys", "ヨルシカ"]
+WORDS = ["Night", "Dancer", "Blue", "夜", "花", "Hello", "Monster", "Effect", "Dream", "光", "Rain", "Ghost", "Ride", "心"]
+HEADERS = ["Encore:", "Encore 2:", "アンコール", "Set 2", "--- MC ---", "MC", "Double Encore", "Main Set:", "【本編】", "-- Day 2 --", "EN:"]
+NOTES = ["", "", "", "", " (新曲)", " (acoustic)", " (with Guest)", " ※初披露", " (snippet)", " (short ver.)"]
+NUMBERINGS = ["{n}. ", "{n}) ", "({n}) ", "M{n} ", "M-{n:02d}. ", "{n:02d} ", "#{n}. ", "", "・"]
+
+
+def _title(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(1, 3)))
+
+
+def make_setlist(rng: random.Random) -> str:
+    """1公演分のサンプルのセットリストを生成します。"""
+    artist = rng.choice(ARTISTS)
+    numbering = rng.choice(NUMBERINGS)
+    lines: List[str] = [rng.choice(["Setlist:", "", f"{artist} @ Budokan"])]
+    titles = [_title(rng) for _ in range(rng.randint(12, 30))]
+    for n, title in enumerate(titles, start=1):
+        roll = rng.random()
+        if roll < 0.04:
+            lines.append(rng.choice(HEADERS))
+        elif roll < 0.07:
+            lines.append(f"{title} (tape)")
+            continue
+        elif roll < 0.10:
+            lines.append(f"{title} ({rng.choice(ARTISTS)} cover)")
+            continue
+        elif roll < 0.14:
+            lines.append(f"{artist} - {title}")
+            continue
+        elif roll < 0.17:
+            # アンコールやリプライズでの重複
+            title = rng.choice(titles[:n])
+        lines.append(numbering.format(n=n) + title + rng.choice(NOTES))
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--setlists", type=int, default=5000)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-lines-per-sec", type=float, default=None, help="これを下回ったら失敗とする行数/秒")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    corpus = [make_setlist(rng) for _ in range(args.setlists)]
+    line_count = sum(text.count("\n") + 1 for text in corpus)
+
+    timings: List[float] = []
+    queries = skipped = duplicates = 0
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        results = [parse_setlist(text) for text in corpus]
+        timings.append(time.perf_counter() - started)
+    for result in results:
+        queries += len(result.queries)
+        skipped += len(result.skipped)
+        duplicates += result.duplicates
+
+    median = statistics.median(timings)
+    lines_per_sec = line_count / median
+    print(f"corpus: {args.setlists} setlists, {line_count} lines ({sum(len(text) for text in corpus) / 1024:.0f} KiB)")
+    print(f"parse: median {median * 1000:.1f}ms  min {min(timings) * 1000:.1f}ms  ({args.runs} runs)")
+    print(f"throughput: {lines_per_sec:,.0f} lines/s  {args.setlists / median:,.0f} setlists/s  {median / line_count * 1e6:.2f}us/line")
+    print(f"output: {queries} queries, {skipped} skipped lines, {duplicates} duplicates")
+
+    if args.min_lines_per_sec is not None and lines_per_sec < args.min_lines_per_sec:
+        print(f"\nFAIL: {lines_per_sec:,.0f} lines/s is below {args.min_lines_per_sec:,.0f} lines/s")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
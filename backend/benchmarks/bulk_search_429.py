@@ -0,0 +1,72 @@
+"""
+429を注入する偽のSpotify APIに対して一括検索を実行し、
+レートリミッターとリトライの挙動（部分的な結果の返却）を確認するシナリオ。
+
+    cd backend && python -m benchmarks.bulk_search_429 --queries 200 --error-rate-429 0.3
+"""
+import argparse
+import asyncio
+import os
+import time
+from typing import Optional
+
+import httpx
+
+from benchmarks.fake_spotify import FakeSpotifyConfig, create_app
+
+
+async def run(num_queries: int, config: FakeSpotifyConfig, deadline: Optional[float]) -> None:
+    os.environ.setdefault("SPOTIFY_API_BASE_URL", "http://fake-spotify/v1")
+    from app.schemas import TrackQuery
+    from app.services import spotify_client
+    if deadline is None:
+        deadline = spotify_client.SPOTIFY_BULK_DEADLINE
+    from app.services.rate_limiter import rate_limiter
+    from app.services.search_cache import search_cache
+    from app.services.spotify_service import SpotifyService
+
+    fake_app = create_app(config)
+    # 共有クライアントを偽のSpotify APIに向ける（ポートを開かずにASGIで直接呼び出す）
+    spotify_client._http_client = httpx.AsyncClient(
+        base_url="http://fake-spotify/v1", transport=httpx.ASGITransport(app=fake_app)
+    )
+    search_cache.clear()
+
+    queries = [TrackQuery(track_name=f"Song {i}", artist_name="Band") for i in range(num_queries)]
+    service = SpotifyService(access_token="fake-token")
+
+    started = time.perf_counter()
+    # /playlist/search/multiple と同じく、制限時間内に終わらなかったクエリは failed になる
+    matches, not_found, failed = await service.search_multiple_tracks(queries, deadline=deadline)
+    elapsed = time.perf_counter() - started
+
+    print(f"queries:        {num_queries}")
+    print(f"found:          {len(matches)}")
+    print(f"not found:      {len(not_found)}")
+    print(f"failed:         {len(failed)}")
+    print(f"upstream calls: {fake_app.state.stats['requests']} (429: {fake_app.state.stats['throttled']})")
+    print(f"limiter:        {rate_limiter.stats()}")
+    print(f"elapsed:        {elapsed:.2f}s")
+    await spotify_client.close_http_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--error-rate-429", type=float, default=0.2)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--deadline", type=float, default=None, help="検索の制限時間（秒、既定値は SPOTIFY_BULK_DEADLINE）")
+    args = parser.parse_args()
+    config = FakeSpotifyConfig(
+        latency_ms=args.latency_ms,
+        error_rate_429=args.error_rate_429,
+        rate_limit=args.rate_limit,
+        retry_after=args.retry_after,
+    )
+    asyncio.run(run(args.queries, config, args.deadline))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+ローカルで動作するSpotify Web APIの簡易スタンドイン。
+
+本物のSpotifyのクォータを消費せずに、レート制限（429 + Retry-After）や
+レイテンシを再現してバックエンドを動かすために使います。
+検索、ユーザー情報、プレイリストの作成・取得・曲の追加/削除/並べ替え/置き換え、トークンの発行（/api/token）に対応しています。
+
+    python -m benchmarks.fake_spotify --port 9000 --error-rate-429 0.2
+    SPOTIFY_API_BASE_URL=http://127.0.0.1:9000/v1 SPOTIFY_ACCOUNTS_BASE_URL=http://127.0.0.1:9000 \
+        uvicorn app.main:app
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qs
+
+from fastapi import Body, FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+@dataclass
+class FakeSpotifyConfig:
+    latency_ms: float = 20.0          # 1リクエストあたりの平均レイテンシ
+    jitter_ms: float = 10.0           # レイテンシのばらつき
+    error_rate_429: float = 0.0       # ランダムに429を返す割合
+    rate_limit: Optional[float] = None  # 1秒あたりの許容リクエスト数（超過すると429）
+    retry_after: int = 1              # 429で返すRetry-After（秒）
+    not_found_rate: float = 0.1       # 検索結果を空にする割合
+
+
+def create_app(config: Optional[FakeSpotifyConfig] = None) -> FastAPI:
+    """設定に従って振る舞う偽のSpotify APIアプリケーションを作成します。"""
+    config = config or FakeSpotifyConfig()
+    app = FastAPI(title="Fake Spotify API")
+    app.state.config = config
+    app.state.stats = {"requests": 0, "throttled": 0, "tokens": 0}
+    # プレイリストID -> {"name", "tracks", "snapshot"}
+    app.state.playlists = {}
+    playlist_ids = itertools.count(1)
+    window = {"start": time.monotonic(), "count": 0}
+
+    def _throttle() -> Optional[JSONResponse]:
+        now = time.monotonic()
+        if now - window["start"] >= 1.0:
+            window["start"], window["count"] = now, 0
+        window["count"] += 1
+        over_limit = config.rate_limit is not None and window["count"] > config.rate_limit
+        if over_limit or random.random() < config.error_rate_429:
+            app.state.stats["throttled"] += 1
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"status": 429, "message": "API rate limit exceeded"}},
+                headers={"Retry-After": str(config.retry_after)},
+            )
+        return None
+
+    @app.middleware("http")
+    async def simulate_upstream(request: Request, call_next):
+        if request.url.path == "/stats":
+            return await call_next(request)
+        app.state.stats["requests"] += 1
+        latency = max(0.0, random.gauss(config.latency_ms, config.jitter_ms)) / 1000
+        await asyncio.sleep(latency)
+        throttled = _throttle()
+        if throttled is not None:
+            return throttled
+        return await call_next(request)
+
+    @app.get("/v1/search")
+    async def search(q: str, limit: int = 10, type: str = "track"):
+        if random.random() < config.not_found_rate:
+            return {"tracks": {"items": [], "total": 0}}
+        title = q.split("track:", 1)[-1].split(" artist:", 1)[0].strip()
+        artist = q.split(" artist:", 1)[1].strip() if " artist:" in q else "Unknown Artist"
+        items = []
+        for i in range(limit):
+            track_id = f"{abs(hash((title, artist, i))) % 10**22:022d}"
+            items.append({
+                "id": track_id,
+                "name": title if i == 0 else f"{title} - Live",
+                "artists": [{"name": artist}],
+                "uri": f"spotify:track:{track_id}",
+                "duration_ms": 180000 + i * 1000,
+            })
+        return {"tracks": {"items": items, "total": len(items)}}
+
+    @app.get("/v1/tracks")
+    async def tracks(ids: str, market: Optional[str] = None):
+        tracks = []
+        for track_id in ids.split(",")[:50]:
+            # IDごとに決まった割合で「存在しないトラック」とする
+            if random.Random(track_id).random() < config.not_found_rate:
+                tracks.append(None)
+                continue
+            track = {
+                "id": track_id,
+                "name": f"Track {track_id[:6]}",
+                "artists": [{"name": "Fake Artist"}],
+                "uri": f"spotify:track:{track_id}",
+                "duration_ms": 200000,
+            }
+            if market:
+                track["is_playable"] = True
+            tracks.append(track)
+        return {"tracks": tracks}
+
+    @app.get("/v1/me")
+    async def me():
+        return {"id": "fake_user", "display_name": "Fake User"}
+
+    def _not_found(message: str) -> JSONResponse:
+        return JSONResponse(status_code=404, content={"error": {"status": 404, "message": message}})
+
+    def _playlist_body(playlist_id: str) -> Dict[str, Any]:
+        playlist = app.state.playlists[playlist_id]
+        return {
+            "id": playlist_id,
+            "name": playlist["name"],
+            "external_urls": {"spotify": f"https://open.spotify.com/playlist/{playlist_id}"},
+            "snapshot_id": f"snapshot-{playlist['snapshot']}",
+            "tracks": _items_page(playlist, 0, 100),
+        }
+
+    def _items_page(playlist: Dict[str, Any], offset: int, limit: int) -> Dict[str, Any]:
+        items = [{"track": {"uri": uri}} for uri in playlist["tracks"][offset:offset + limit]]
+        return {"items": items, "total": len(playlist["tracks"]), "offset": offset, "limit": limit}
+
+    def _changed(playlist: Dict[str, Any]) -> Dict[str, Any]:
+        playlist["snapshot"] += 1
+        return {"snapshot_id": f"snapshot-{playlist['snapshot']}"}
+
+    @app.post("/v1/users/{user_id}/playlists", status_code=201)
+    async def create_playlist(user_id: str, payload: Dict[str, Any] = Body(...)):
+        playlist_id = f"fakeplaylist{next(playlist_ids):010d}"
+        app.state.playlists[playlist_id] = {"name": payload.get("name", ""), "tracks": [], "snapshot": 0}
+        return _playlist_body(playlist_id)
+
+    @app.post("/v1/playlists/{playlist_id}/tracks", status_code=201)
+    async def add_tracks(playlist_id: str, payload: Dict[str, Any] = Body(...)):
+        playlist = app.state.playlists.get(playlist_id)
+        if playlist is None:
+            return _not_found("Invalid playlist Id")
+        uris: List[str] = payload.get("uris", [])
+        if len(uris) > 100:
+            return JSONResponse(status_code=400, content={"error": {"status": 400, "message": "Too many tracks"}})
+        position = payload.get("position")
+        position = len(playlist["tracks"]) if position is None else position
+        playlist["tracks"][position:position] = uris
+        return _changed(playlist)
+
+    @app.get("/v1/playlists/{playlist_id}/tracks")
+    async def get_tracks(playlist_id: str, offset: int = 0, limit: int = 100, fields: Optional[str] = None):
+        playlist = app.state.playlists.get(playlist_id)
+        if playlist is None:
+            return _not_found("Invalid playlist Id")
+        return _items_page(playlist, offset, min(limit, 100))
+
+    @app.delete("/v1/playlists/{playlist_id}/tracks")
+    async def remove_tracks(playlist_id: str, payload: Dict[str, Any] = Body(...)):
+        playlist = app.state.playlists.get(playlist_id)
+        if playlist is None:
+            return _not_found("Invalid playlist Id")
+        uris = {item.get("uri") for item in payload.get("tracks", [])}
+        if len(uris) > 100:
+            return JSONResponse(status_code=400, content={"error": {"status": 400, "message": "Too many tracks"}})
+        playlist["tracks"] = [uri for uri in playlist["tracks"] if uri not in uris]
+        return _changed(playlist)
+
+    @app.put("/v1/playlists/{playlist_id}/tracks")
+    async def update_tracks(playlist_id: str, payload: Dict[str, Any] = Body(...)):
+        playlist = app.state.playlists.get(playlist_id)
+        if playlist is None:
+            return _not_found("Invalid playlist Id")
+        if "uris" in payload:
+            playlist["tracks"] = list(payload["uris"][:100])
+            return _changed(playlist)
+        start, before = payload["range_start"], payload["insert_before"]
+        length = payload.get("range_length", 1)
+        tracks = playlist["tracks"]
+        moving = tracks[start:start + length]
+        rest = tracks[:start] + tracks[start + length:]
+        position = before if before <= start else before - length
+        playlist["tracks"] = rest[:position] + moving + rest[position:]
+        return _changed(playlist)
+
+    @app.get("/v1/playlists/{playlist_id}")
+    async def get_playlist(playlist_id: str, fields: Optional[str] = None):
+        if playlist_id not in app.state.playlists:
+            return _not_found("Invalid playlist Id")
+        return _playlist_body(playlist_id)
+
+    @app.post("/api/token")
+    async def token(request: Request):
+        # python-multipartに依存しないよう、フォームは自前でパースする
+        form = parse_qs((await request.body()).decode())
+        grant_type = form.get("grant_type", [""])[0]
+        app.state.stats["tokens"] += 1
+        token_info = {
+            "access_token": f"fake-access-{random.getrandbits(64):016x}",
+            "token_type": "Bearer",
+            "expires_in": 3600,
+            "scope": "playlist-modify-public playlist-modify-private",
+        }
+        if grant_type == "authorization_code":
+            token_info["refresh_token"] = f"fake-refresh-{random.getrandbits(64):016x}"
+        return token_info
+
+    @app.get("/stats")
+    async def stats():
+        return app.state.stats
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Spotify Web API server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--error-rate-429", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None)
+    parser.add_argument("--retry-after", type=int, default=1)
+    args = parser.parse_args()
+
+    import uvicorn
+    config = FakeSpotifyConfig(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate_429=args.error_rate_429,
+        rate_limit=args.rate_limit,
+        retry_after=args.retry_after,
+    )
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
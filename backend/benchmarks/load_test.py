@@ -0,0 +1,337 @@
+"""
+偽のSpotify API（benchmarks.fake_spotify）を相手にバックエンドへ負荷をかける負荷試験ハーネス。
+
+偽のSpotify APIとバックエンド（uvicorn）を別プロセスで起動し、シナリオごとのエンドポイントに
+指定した並列度でリクエストを送り続けて、レイテンシ（p50/p90/p99）とスループットを計測します。
+結果は benchmarks/results/<シナリオ>.jsonl に1行ずつ追記し、同じ条件の前回の結果と比較します。
+
+シナリオ:
+  search_multiple  POST /playlist/search/multiple（--queries 件のクエリ）
+  create_playlist  POST /playlist/（--tracks 曲）
+  me               GET  /auth/me
+  token_refresh    GET  /auth/me（リフレッシュトークンのCookieのみ。毎回トークンを更新する）
+
+    cd backend && python -m benchmarks.load_test --scenario search_multiple --concurrency 20 --duration 20
+    cd backend && python -m benchmarks.load_test --scenario me --workers 4 --fake-latency-ms 50
+    # 起動済みのバックエンドに対して実行する場合（偽のSpotify APIに向けて起動しておくこと）
+    cd backend && python -m benchmarks.load_test --target http://127.0.0.1:8000 --scenario me
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import statistics
+import string
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+RESULTS_DIR = Path(__file__).resolve().parent / "results"
+
+# 前回の結果と比較して、この割合以上悪化したら回帰とみなす
+DEFAULT_REGRESSION_THRESHOLD = 0.2
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _wait_until_ready(url: str, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Server did not start: {url}")
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def start_servers(args: argparse.Namespace) -> Tuple[str, List[subprocess.Popen]]:
+    """偽のSpotify APIとバックエンドを別プロセスで起動し、バックエンドのURLを返します。"""
+    fake_port, app_port = _free_port(), _free_port()
+    fake_cmd = [
+        sys.executable, "-m", "benchmarks.fake_spotify",
+        "--port", str(fake_port),
+        "--latency-ms", str(args.fake_latency_ms),
+        "--jitter-ms", str(args.fake_jitter_ms),
+        "--error-rate-429", str(args.fake_error_rate_429),
+    ]
+    if args.fake_rate_limit is not None:
+        fake_cmd += ["--rate-limit", str(args.fake_rate_limit)]
+
+    env = dict(os.environ)
+    env.update({
+        "SPOTIFY_API_BASE_URL": f"http://127.0.0.1:{fake_port}/v1",
+        "SPOTIFY_ACCOUNTS_BASE_URL": f"http://127.0.0.1:{fake_port}",
+        "SPOTIPY_CLIENT_ID": env.get("SPOTIPY_CLIENT_ID", "fake-client-id"),
+        "SPOTIPY_CLIENT_SECRET": env.get("SPOTIPY_CLIENT_SECRET", "fake-client-secret"),
+        "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+    })
+    app_cmd = [
+        sys.executable, "-m", "uvicorn", "app.main:app",
+        "--host", "127.0.0.1", "--port", str(app_port),
+        "--workers", str(args.workers), "--log-level", "warning", "--no-access-log",
+    ]
+
+    processes = [subprocess.Popen(fake_cmd, cwd=BACKEND_DIR)]
+    try:
+        _wait_until_ready(f"http://127.0.0.1:{fake_port}/stats")
+        processes.append(subprocess.Popen(app_cmd, cwd=BACKEND_DIR, env=env))
+        _wait_until_ready(f"http://127.0.0.1:{app_port}/health")
+    except Exception:
+        stop_servers(processes)
+        raise
+    return f"http://127.0.0.1:{app_port}", processes
+
+
+def stop_servers(processes: List[subprocess.Popen]) -> None:
+    for process in reversed(processes):
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+# --- シナリオ ---
+
+_BASE62 = string.ascii_letters + string.digits
+
+
+def _cookie_header(**cookies: str) -> Dict[str, str]:
+    # クライアントのCookieJarはレスポンスのSet-Cookieで上書きされるため、リクエストごとにヘッダーで渡す
+    return {"Cookie": "; ".join(f"{name}={value}" for name, value in cookies.items())}
+
+
+def _valid_session_cookies() -> Dict[str, str]:
+    return _cookie_header(access_token="load-test-token", expires_at=str(int(time.time()) + 86400))
+
+
+def _search_multiple(args: argparse.Namespace) -> Callable[[httpx.AsyncClient], Any]:
+    def request(client: httpx.AsyncClient):
+        # クエリはプールから選ぶため、プールを小さくするとキャッシュヒットが増える
+        queries = [
+            {"track_name": f"Song {random.randrange(args.query_pool)}", "artist_name": f"Band {random.randrange(20)}"}
+            for _ in range(args.queries)
+        ]
+        return client.post("/playlist/search/multiple", json=queries, headers=_valid_session_cookies())
+    return request
+
+
+def _create_playlist(args: argparse.Namespace) -> Callable[[httpx.AsyncClient], Any]:
+    def request(client: httpx.AsyncClient):
+        uris = [f"spotify:track:{''.join(random.choices(_BASE62, k=22))}" for _ in range(args.tracks)]
+        payload = {"name": "Load test", "description": "", "public": False, "track_uris": uris}
+        return client.post("/playlist/", json=payload, headers=_valid_session_cookies())
+    return request
+
+
+def _me(args: argparse.Namespace) -> Callable[[httpx.AsyncClient], Any]:
+    def request(client: httpx.AsyncClient):
+        return client.get("/auth/me", headers=_valid_session_cookies())
+    return request
+
+
+def _token_refresh(args: argparse.Namespace) -> Callable[[httpx.AsyncClient], Any]:
+    def request(client: httpx.AsyncClient):
+        return client.get("/auth/me", headers=_cookie_header(refresh_token=f"load-test-refresh-{random.getrandbits(64):x}"))
+    return request
+
+
+SCENARIOS: Dict[str, Callable[[argparse.Namespace], Callable[[httpx.AsyncClient], Any]]] = {
+    "search_multiple": _search_multiple,
+    "create_playlist": _create_playlist,
+    "me": _me,
+    "token_refresh": _token_refresh,
+}
+
+
+# --- 負荷の生成と集計 ---
+
+def percentile(sorted_samples: List[float], q: float) -> float:
+    """ソート済みのサンプルのパーセンタイル（最近傍順位法）を返します。"""
+    if not sorted_samples:
+        return 0.0
+    index = max(0, min(len(sorted_samples) - 1, int(round(q / 100 * len(sorted_samples) + 0.5)) - 1))
+    return sorted_samples[index]
+
+
+async def run_load(base_url: str, args: argparse.Namespace) -> Dict[str, Any]:
+    """並列度 args.concurrency のクローズドループで負荷をかけ、結果を集計します。"""
+    make_request = SCENARIOS[args.scenario](args)
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    remaining = args.requests
+
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        # ウォームアップ
+        for _ in range(args.warmup):
+            await make_request(client)
+
+        async def worker():
+            nonlocal remaining
+            while time.perf_counter() < deadline:
+                if remaining is not None:
+                    if remaining <= 0:
+                        return
+                    remaining -= 1
+                started = time.perf_counter()
+                try:
+                    response = await make_request(client)
+                    key = str(response.status_code)
+                except httpx.HTTPError as e:
+                    key = type(e).__name__
+                latencies.append(time.perf_counter() - started)
+                statuses[key] = statuses.get(key, 0) + 1
+
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(count for key, count in statuses.items() if not key.startswith("2"))
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "statuses": statuses,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "mean_ms": round(statistics.mean(latencies) * 1000, 2) if latencies else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+def _run_params(args: argparse.Namespace) -> Dict[str, Any]:
+    """結果を比較するときに一致している必要があるパラメータ。"""
+    params = {
+        "concurrency": args.concurrency,
+        "workers": args.workers if args.target is None else None,
+        "fake_latency_ms": args.fake_latency_ms,
+        "fake_error_rate_429": args.fake_error_rate_429,
+        "fake_rate_limit": args.fake_rate_limit,
+    }
+    if args.scenario == "search_multiple":
+        params.update(queries=args.queries, query_pool=args.query_pool)
+    elif args.scenario == "create_playlist":
+        params["tracks"] = args.tracks
+    return params
+
+
+def load_previous(path: Path, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """同じパラメータで実行した直近の結果を返します。"""
+    if not path.exists():
+        return None
+    previous = None
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            if record.get("params") == params:
+                previous = record
+    return previous
+
+
+def compare(current: Dict[str, Any], previous: Dict[str, Any], threshold: float) -> List[str]:
+    """前回の結果との差分を表示し、閾値を超えて悪化した指標の名前を返します。"""
+    regressions = []
+    print(f"\ncompared with {previous['timestamp']} ({previous.get('git') or 'unknown revision'}):")
+    # (指標, 大きいほど良いか)
+    for metric, higher_is_better in (("throughput_rps", True), ("p50_ms", False), ("p99_ms", False)):
+        before, after = previous["result"][metric], current[metric]
+        if not before:
+            continue
+        change = (after - before) / before
+        worse = -change if higher_is_better else change
+        flag = "  REGRESSION" if worse > threshold else ""
+        print(f"  {metric:<15} {before:>10.2f} -> {after:>10.2f} ({change:+.1%}){flag}")
+        if flag:
+            regressions.append(metric)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), default="search_multiple")
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=15.0, help="計測時間（秒）")
+    parser.add_argument("--requests", type=int, default=None, help="送信するリクエスト数の上限")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--target", default=None, help="起動済みのバックエンドのURL（省略時は自動で起動）")
+    parser.add_argument("--workers", type=int, default=1, help="自動で起動するバックエンドのワーカー数")
+    parser.add_argument("--queries", type=int, default=30, help="search_multiple: 1リクエストあたりのクエリ数")
+    parser.add_argument("--query-pool", type=int, default=1000, help="search_multiple: クエリを選ぶ曲数")
+    parser.add_argument("--tracks", type=int, default=50, help="create_playlist: 1プレイリストあたりの曲数")
+    parser.add_argument("--fake-latency-ms", type=float, default=30.0)
+    parser.add_argument("--fake-jitter-ms", type=float, default=10.0)
+    parser.add_argument("--fake-error-rate-429", type=float, default=0.0)
+    parser.add_argument("--fake-rate-limit", type=float, default=None)
+    parser.add_argument("--regression-threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD)
+    parser.add_argument("--fail-on-regression", action="store_true", help="回帰を検出したら終了コード1で終了する")
+    parser.add_argument("--no-save", action="store_true", help="結果を保存しない")
+    args = parser.parse_args()
+
+    processes: List[subprocess.Popen] = []
+    base_url = args.target
+    if base_url is None:
+        base_url, processes = start_servers(args)
+    try:
+        result = asyncio.run(run_load(base_url, args))
+    finally:
+        stop_servers(processes)
+
+    print(f"scenario:    {args.scenario} (concurrency {args.concurrency})")
+    print(f"requests:    {result['requests']} in {result['elapsed_s']}s ({result['throughput_rps']} req/s)")
+    print(f"errors:      {result['errors']} {result['statuses']}")
+    print(f"latency:     mean {result['mean_ms']}ms  p50 {result['p50_ms']}ms  "
+          f"p90 {result['p90_ms']}ms  p99 {result['p99_ms']}ms  max {result['max_ms']}ms")
+
+    params = _run_params(args)
+    path = RESULTS_DIR / f"{args.scenario}.jsonl"
+    previous = load_previous(path, params)
+    regressions = compare(result, previous, args.regression_threshold) if previous else []
+
+    if not args.no_save:
+        RESULTS_DIR.mkdir(exist_ok=True)
+        record = {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "git": _git_revision(),
+            "scenario": args.scenario,
+            "params": params,
+            "result": result,
+        }
+        with path.open("a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        print(f"\nsaved to {path}")
+
+    if regressions and args.fail_on_regression:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+本番環境のGunicorn設定。
+
+    cd backend && gunicorn app.main:app -c gunicorn.conf.py
+
+ワーカー数・スレッドプールはCPU数とメモリ量から決め（WEB_CONCURRENCYで上書き可能）、
+アプリはマスタープロセスで事前に読み込んでからforkします（preload）。
+"""
+import os
+from app.core.config import load_environment
+
+# .envの設定をワーカー数の決定とアプリの読み込みより先に反映する
+load_environment()
+
+from app.core import serving  # noqa: E402
+
+workers = serving.recommended_workers()
+
+# アプリの読み込み前に、ワーカー間で共有する状態の設定を決めておく
+#   - レートリミッターはアプリ全体の予算をワーカー数で等分する
+#   - 複数ワーカーの場合、ジョブの状態はSQLiteの共有ストアを使う（どのワーカーでも進捗を取得できるようにする）。
+#     ストアの読み書きはスレッドプールと書き込みタスクで行い、イベントループを止めない
+#   - 検索キャッシュはワーカーごとのメモリで正しく動くため、共有バックエンド（SEARCH_CACHE_BACKEND=sqlite）は
+#     明示的に指定した場合だけ使う
+os.environ["WEB_CONCURRENCY"] = str(workers)
+if workers > 1:
+    os.environ.setdefault("JOB_STORE_BACKEND", "sqlite")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+worker_class = "app.core.workers.TunedUvicornWorker"
+preload_app = True
+
+# メモリの断片化やリークに備えて、一定数のリクエストを処理したワーカーを順に入れ替える
+# （jitterで全ワーカーが同時に再起動しないようにする）
+# 実行中のバックグラウンドジョブがあるワーカーは、ジョブが終わるまで再起動を延期する
+# （最大 WORKER_RESTART_DEFER_MAX 秒。app.core.workers.JobAwareServer を参照）
+max_requests = int(os.environ.get("GUNICORN_MAX_REQUESTS", "2000"))
+max_requests_jitter = int(os.environ.get("GUNICORN_MAX_REQUESTS_JITTER", str(max_requests // 10)))
+
+# 大量の検索を含むリクエストは数十秒かかることがあるため、タイムアウトは長めにとる
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", "5"))
+
+# Herokuのルーター経由のX-Forwarded-*ヘッダーを信頼する
+forwarded_allow_ips = os.environ.get("FORWARDED_ALLOW_IPS", "*")
+accesslog = None
+
+
+def on_starting(server):
+    """forkの前にマスタープロセスで自己診断を行い、設定不備があれば起動を中止します。"""
+    server.log.info("Serving configuration: %s", serving.self_check())
@@ -0,0 +1,60 @@
+import os
+
+# アプリのモジュールは読み込み時に環境変数を参照するため、importより先に設定する
+os.environ.setdefault("SPOTIPY_CLIENT_ID", "test-client-id")
+os.environ.setdefault("SPOTIPY_CLIENT_SECRET", "test-client-secret")
+os.environ.setdefault("ENVIRONMENT", "development")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+os.environ["SPOTIFY_API_BASE_URL"] = "http://fake/v1"
+os.environ["RESOLUTION_STORE_PATH"] = ""
+os.environ["SEARCH_CACHE_BACKEND"] = "memory"
+os.environ["JOB_STORE_BACKEND"] = "memory"
+
+import httpx  # noqa: E402
+import pytest  # noqa: E402
+
+from app.services import spotify_client, spotify_service  # noqa: E402
+from app.services.catalog_index import CatalogIndex  # noqa: E402
+from app.services.rate_limiter import AdaptiveRateLimiter  # noqa: E402
+from app.services.search_cache import search_cache  # noqa: E402
+from app.services.spotify_client import AsyncSpotifyClient  # noqa: E402
+from benchmarks.fake_spotify import FakeSpotifyConfig, create_app  # noqa: E402
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(autouse=True)
+def fresh_shared_state(monkeypatch):
+    """テストごとにレートリミッター・検索キャッシュ・ローカルカタログを初期化します（429のブロックなどを持ち越さない）。"""
+    monkeypatch.setattr(spotify_client, "rate_limiter", AdaptiveRateLimiter(rate=10_000, burst=10_000))
+    monkeypatch.setattr(spotify_service, "catalog_index", CatalogIndex())
+    search_cache.clear()
+    yield
+    search_cache.clear()
+
+
+@pytest.fixture
+def fake_config():
+    """偽のSpotify APIの設定。テストごとに上書きできるよう、レイテンシと未検出を無効にしておきます。"""
+    return FakeSpotifyConfig(latency_ms=0, jitter_ms=0, not_found_rate=0)
+
+
+@pytest.fixture
+def fake_spotify(fake_config):
+    return create_app(fake_config)
+
+
+@pytest.fixture
+def http_client(fake_spotify, monkeypatch):
+    """偽のSpotify APIにASGITransportで接続する共有クライアント（アプリの共有プールの代わり）。"""
+    client = httpx.AsyncClient(transport=httpx.ASGITransport(app=fake_spotify), base_url="http://fake/v1")
+    monkeypatch.setattr(spotify_client, "_http_client", client)
+    return client
+
+
+@pytest.fixture
+def spotify(http_client):
+    return AsyncSpotifyClient("test-token", http_client=http_client)
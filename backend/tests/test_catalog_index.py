@@ -0,0 +1,51 @@
+from app.services.catalog_index import CatalogIndex, normalize_title
+from app.services.track_ranking import score_candidates
+
+
+def _track(track_id, name, artist="Coldplay", duration_ms=266_000):
+    return {"id": track_id, "name": name, "artist": artist, "uri": f"spotify:track:{track_id}", "duration_ms": duration_ms}
+
+
+def test_normalize_title_ignores_case_width_and_punctuation():
+    assert normalize_title("ＹＥＬＬＯＷ!") == normalize_title("yellow")
+
+
+def test_catalog_lookup_prefers_original_over_variants():
+    catalog = CatalogIndex()
+    catalog.add_many([_track("live", "Yellow - Live"), _track("karaoke", "Yellow (Karaoke)"), _track("studio", "Yellow")])
+
+    match = catalog.lookup("Yellow", "Coldplay", rank=score_candidates)
+
+    assert match is not None
+    assert match.track.id == "studio"
+    assert catalog.hits == 1
+
+
+def test_catalog_lookup_rejects_variant_only_candidates():
+    catalog = CatalogIndex()
+    catalog.add_many([_track("live", "Yellow - Live"), _track("karaoke", "Yellow (Karaoke)")])
+
+    assert catalog.lookup("Yellow", "Coldplay", rank=score_candidates) is None
+    assert catalog.misses == 1
+
+
+def test_catalog_lookup_requires_artist():
+    catalog = CatalogIndex()
+    catalog.add(_track("studio", "Yellow"))
+
+    assert catalog.lookup("Yellow", None, rank=score_candidates) is None
+    assert catalog.lookup("Yellow", "Coldplay", rank=score_candidates) is not None
+
+
+def test_catalog_lookup_rejects_other_artist():
+    catalog = CatalogIndex()
+    catalog.add(_track("studio", "Yellow"))
+
+    assert catalog.lookup("Yellow", "Mrs. GREEN APPLE", rank=score_candidates) is None
+
+
+def test_catalog_ignores_duplicates_and_respects_capacity():
+    catalog = CatalogIndex(max_tracks=2)
+    catalog.add_many([_track("a", "Yellow"), _track("a", "Yellow"), _track("b", "Fix You"), _track("c", "Clocks")])
+
+    assert len(catalog) == 2
@@ -0,0 +1,190 @@
+import json
+import time
+
+import pytest
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+
+from app.dependencies import get_spotify_service
+from app.main import app
+from app.services import playlist_populator
+from app.services.jobs import Job, MemoryJobStore, SQLiteJobStore
+from app.services.spotify_client import SpotifyException
+from app.services.spotify_service import SpotifyService
+
+SETLIST = {"name": "Budokan", "queries": [{"track_name": f"Song {i}", "artist_name": "Band"} for i in range(30)]}
+
+
+@pytest.fixture
+def client(http_client, fake_spotify):
+    token = {"value": "test-token"}
+
+    @fake_spotify.middleware("http")
+    async def user_per_token(request, call_next):
+        # トークンごとに別のユーザーとして振る舞う
+        if request.url.path == "/v1/me":
+            return JSONResponse({"id": request.headers["authorization"].removeprefix("Bearer "), "display_name": "User"})
+        return await call_next(request)
+
+    app.dependency_overrides[get_spotify_service] = lambda: SpotifyService(token["value"])
+    with TestClient(app) as test_client:
+        test_client.token = token
+        yield test_client
+    app.dependency_overrides.clear()
+
+
+def _wait(client, job_id):
+    """ジョブのストリームを最後まで読み、完了時の状態を返します。"""
+    with client.stream("GET", f"/jobs/{job_id}/stream") as response:
+        lines = [json.loads(line) for line in response.iter_lines() if line]
+    return lines[-1]
+
+
+def test_setlist_job_creates_playlist(client, fake_spotify):
+    response = client.post("/jobs/setlist", json=SETLIST)
+
+    assert response.status_code == 202
+    job_id = response.json()["id"]
+    assert response.headers["location"] == f"/jobs/{job_id}"
+    final = _wait(client, job_id)
+    assert final["status"] == "succeeded"
+    assert (final["done"], final["total"]) == (30, 30)
+    playlist = final["result"]["playlist"]
+    assert fake_spotify.state.playlists[playlist["id"]]["tracks"]
+    assert client.get(f"/jobs/{job_id}").json() == final
+
+
+def test_same_idempotency_key_returns_existing_job(client, fake_spotify):
+    headers = {"Idempotency-Key": "setlist-1"}
+    first = client.post("/jobs/setlist", json=SETLIST, headers=headers).json()
+    second = client.post("/jobs/setlist", json=SETLIST, headers=headers).json()
+
+    assert second["id"] == first["id"]
+    assert _wait(client, first["id"])["status"] == "succeeded"
+    assert client.post("/jobs/setlist", json=SETLIST, headers=headers).json()["id"] == first["id"]
+    assert len(fake_spotify.state.playlists) == 1
+
+
+def test_reused_idempotency_key_with_different_payload_conflicts(client):
+    headers = {"Idempotency-Key": "setlist-2"}
+    client.post("/jobs/setlist", json=SETLIST, headers=headers)
+
+    response = client.post("/jobs/setlist", json={**SETLIST, "name": "Another"}, headers=headers)
+
+    assert response.status_code == 409
+    assert client.post("/jobs/search", json=SETLIST["queries"], headers=headers).status_code == 409
+
+
+def test_idempotency_keys_are_scoped_per_user(client):
+    headers = {"Idempotency-Key": "shared-key"}
+    first = client.post("/jobs/setlist", json=SETLIST, headers=headers).json()
+
+    client.token["value"] = "another-user"
+    second = client.post("/jobs/setlist", json=SETLIST, headers=headers).json()
+
+    assert second["id"] != first["id"]
+    # ほかのユーザーのジョブは存在しないものとして扱う
+    assert client.get(f"/jobs/{first['id']}").status_code == 404
+
+
+def test_unknown_job_is_not_found(client):
+    assert client.get("/jobs/does-not-exist").status_code == 404
+
+
+def test_failed_setlist_job_resumes_in_created_playlist(client, fake_spotify, monkeypatch):
+    finish = playlist_populator.PlaylistPopulator.finish
+    calls = {"count": 0}
+
+    async def fail_once(self):
+        calls["count"] += 1
+        if calls["count"] == 1:
+            raise SpotifyException(500, -1, "add tracks failed")
+        return await finish(self)
+
+    monkeypatch.setattr(playlist_populator.PlaylistPopulator, "finish", fail_once)
+    headers = {"Idempotency-Key": "setlist-retry"}
+
+    failed = _wait(client, client.post("/jobs/setlist", json=SETLIST, headers=headers).json()["id"])
+    assert failed["status"] == "failed"
+    assert len(fake_spotify.state.playlists) == 1
+
+    retried = _wait(client, client.post("/jobs/setlist", json=SETLIST, headers=headers).json()["id"])
+    assert retried["status"] == "succeeded"
+    # 再実行では新しいプレイリストを作らず、作成済みのプレイリストに曲を揃える
+    assert len(fake_spotify.state.playlists) == 1
+    (playlist_id, playlist), = fake_spotify.state.playlists.items()
+    assert retried["result"]["playlist"]["id"] == playlist_id
+    assert retried["result"]["playlist"]["track_count"] == len(playlist["tracks"]) > 0
+
+
+def test_search_job_returns_matches(client):
+    final = _wait(client, client.post("/jobs/search", json=SETLIST["queries"][:5]).json()["id"])
+
+    assert final["status"] == "succeeded"
+    assert [track["name"] for track in final["result"]["found_tracks"]] == [f"Song {i}" for i in range(5)]
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryJobStore()
+    return SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+
+
+def _job(job_id, fingerprint="f", key="key"):
+    return Job(id=job_id, kind="setlist", owner="user", fingerprint=fingerprint, idempotency_key=key)
+
+
+def test_store_returns_existing_job_for_same_key(store):
+    first = store.create(_job("a"))
+
+    assert store.create(_job("b")).id == first.id
+    assert store.get("b") is None
+
+
+def test_store_releases_key_of_failed_job_and_inherits_checkpoint(store):
+    failed = store.create(_job("a"))
+    failed.status, failed.checkpoint = "failed", {"playlist_id": "p1"}
+    store.save(failed)
+
+    retried = store.create(_job("b"))
+
+    assert retried.id == "b"
+    assert retried.checkpoint == {"playlist_id": "p1"}
+
+
+def test_store_does_not_inherit_checkpoint_for_different_payload(store):
+    failed = store.create(_job("a"))
+    failed.status, failed.checkpoint = "failed", {"playlist_id": "p1"}
+    store.save(failed)
+
+    assert store.create(_job("b", fingerprint="other")).checkpoint is None
+
+
+def test_sqlite_store_roundtrips_and_saves_in_batches(tmp_path):
+    store = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+    jobs = [store.create(_job(f"job-{i}", key=None)) for i in range(3)]
+    for job in jobs:
+        job.status, job.done, job.result, job.updated_at = "succeeded", 3, {"ok": True}, time.time()
+
+    store.save_many(jobs)
+
+    reopened = SQLiteJobStore(str(tmp_path / "jobs.sqlite3"))
+    assert [reopened.get(job.id).result for job in jobs] == [{"ok": True}] * 3
+
+
+def test_memory_store_evicts_oldest_finished_jobs_over_cap():
+    store = MemoryJobStore(max_entries=3)
+    running = store.create(_job("running", key=None))
+    for index, job_id in enumerate(["old", "new"]):
+        job = store.create(_job(job_id, key=job_id))
+        job.status, job.updated_at = "succeeded", time.time() - 60 + index
+        store.save(job)
+
+    store.create(_job("next", key="next"))
+
+    assert store.get("old") is None
+    assert [store.get(job_id) is not None for job_id in ("running", "new", "next")] == [True, True, True]
+    # 削除したジョブの冪等キーは再び使え、実行中のジョブは上限を超えても削除しない
+    assert store.create(_job("again", key="old")).id == "again"
+    assert store.get("running") is running
@@ -0,0 +1,38 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.metrics import Counter, Histogram, Registry, _Metric
+from app.main import app
+
+
+def test_metric_base_requires_render():
+    class Incomplete(_Metric):
+        type_name = "gauge"
+
+    with pytest.raises(TypeError):
+        Incomplete("incomplete", "missing render")
+
+
+def test_registry_renders_prometheus_text():
+    registry = Registry()
+    requests = registry.register(Counter("requests_total", "Requests", ("route",)))
+    latency = registry.register(Histogram("latency_seconds", "Latency", buckets=(0.1, 1.0)))
+
+    requests.inc(route="/a")
+    latency.observe(0.5)
+
+    lines = registry.render().splitlines()
+    assert 'requests_total{route="/a"} 1' in lines
+    assert "# TYPE latency_seconds histogram" in lines
+    assert ['latency_seconds_bucket{le="0.1"} 0', 'latency_seconds_bucket{le="1"} 1', 'latency_seconds_bucket{le="+Inf"} 1'] == [
+        line for line in lines if line.startswith("latency_seconds_bucket")
+    ]
+
+
+def test_json_response_rendering_is_timed():
+    with TestClient(app) as client:
+        client.get("/health")
+        body = client.get("/metrics").text
+
+    count = next(line for line in body.splitlines() if line.startswith("http_response_render_duration_seconds_count"))
+    assert int(count.split()[-1]) >= 1
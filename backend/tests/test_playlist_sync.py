@@ -0,0 +1,179 @@
+from typing import List, Optional, Sequence
+
+import pytest
+from fastapi.responses import JSONResponse
+
+from app.services import playlist_sync
+from app.services.playlist_sync import PLAYLIST_SYNC_REPLACE_MARGIN, PlaylistSyncer, net_changes, plan_sync, replace_request_count
+
+POOL = [f"spotify:track:{i:022d}" for i in range(400)]
+
+
+def _apply(current: Sequence[str], plan) -> List[str]:
+    """Spotify APIと同じ意味で SyncPlan を適用した結果を返します。"""
+    tracks = [uri for uri in current if uri not in set(plan.removals)]
+    for range_start, insert_before, range_length in plan.moves:
+        moving = tracks[range_start:range_start + range_length]
+        rest = tracks[:range_start] + tracks[range_start + range_length:]
+        position = insert_before if insert_before <= range_start else insert_before - range_length
+        tracks = rest[:position] + moving + rest[position:]
+    for position, uris in plan.inserts:
+        tracks[position:position] = uris
+    return tracks
+
+
+def _assert_reaches(current: List[str], target: List[str]):
+    plan = plan_sync(current, target)
+
+    assert _apply(current, plan) == target
+    assert all(len(uris) <= 100 for _, uris in plan.inserts)
+    return plan
+
+
+def test_plan_sync_fills_empty_playlist():
+    plan = _assert_reaches([], POOL[:250])
+
+    assert plan.added == 250
+    assert plan.removals == []
+
+
+def test_plan_sync_empties_playlist():
+    plan = _assert_reaches(POOL[:150], [])
+
+    assert plan.removals == POOL[:150]
+
+
+def test_plan_sync_reverses_order():
+    _assert_reaches(POOL[:50], list(reversed(POOL[:50])))
+
+
+def test_plan_sync_with_duplicates_and_edits():
+    current = POOL[:20] + [POOL[3], POOL[7], POOL[3]]
+    target = [POOL[7]] + POOL[:5] + [POOL[300]] + POOL[10:20]
+
+    _assert_reaches(current, target)
+
+
+def test_plan_sync_replaces_unrelated_tracks():
+    _assert_reaches(POOL[:101], POOL[200:300])
+
+
+def test_plan_sync_small_edit_stays_incremental():
+    current = POOL[:150]
+    target = list(current)
+    target[10], target[20] = target[20], target[10]
+    del target[50]
+    target.insert(70, POOL[300])
+
+    plan = plan_sync(current, target)
+
+    assert plan.request_count <= replace_request_count(target) + PLAYLIST_SYNC_REPLACE_MARGIN
+    assert plan.moved == 2
+    assert plan.added == 1
+    assert plan.removals == [POOL[50]]
+
+
+def test_plan_sync_unchanged_needs_no_requests():
+    assert plan_sync(POOL[:50], POOL[:50]).request_count == 0
+
+
+def test_plan_sync_removes_and_readds_duplicates():
+    current = [POOL[0], POOL[1], POOL[0]]
+
+    plan = plan_sync(current, [POOL[0], POOL[1]])
+
+    assert plan.removals == [POOL[0]]
+    assert _apply(current, plan) == [POOL[0], POOL[1]]
+
+
+def test_plan_sync_gives_up_over_request_budget():
+    current = POOL[:200]
+    target = list(reversed(current))
+
+    assert plan_sync(current, target, max_requests=3) is None
+
+
+def test_net_changes_counts_duplicates_and_missing_uris():
+    current: List[Optional[str]] = [POOL[0], POOL[0], None, POOL[1]]
+
+    assert net_changes(current, [POOL[1], POOL[2], POOL[0]]) == (1, 2)
+
+
+def _playlist(fake_spotify, tracks: List[str]) -> str:
+    playlist_id = f"p{len(fake_spotify.state.playlists)}"
+    fake_spotify.state.playlists[playlist_id] = {"name": "Setlist", "tracks": list(tracks), "snapshot": 0}
+    return playlist_id
+
+
+async def _sync_and_check(spotify, fake_spotify, current: List[Optional[str]], target: List[str]):
+    playlist_id = _playlist(fake_spotify, current)
+
+    result = await PlaylistSyncer(spotify, playlist_id).sync(target)
+
+    assert fake_spotify.state.playlists[playlist_id]["tracks"] == target
+    assert result.track_count == len(target)
+    assert (result.added, result.removed) == net_changes(current, target)
+    return result
+
+
+@pytest.mark.anyio
+async def test_syncer_fills_empty_playlist(spotify, fake_spotify):
+    result = await _sync_and_check(spotify, fake_spotify, [], POOL[:250])
+
+    assert (result.added, result.removed) == (250, 0)
+
+
+@pytest.mark.anyio
+async def test_syncer_reverses_order(spotify, fake_spotify):
+    await _sync_and_check(spotify, fake_spotify, POOL[:150], list(reversed(POOL[:150])))
+
+
+@pytest.mark.anyio
+async def test_syncer_removes_duplicates(spotify, fake_spotify):
+    result = await _sync_and_check(spotify, fake_spotify, [POOL[0], POOL[1], POOL[0], POOL[2]], POOL[:3])
+
+    assert result.strategy == "incremental"
+    assert (result.added, result.removed) == (0, 1)
+
+
+@pytest.mark.anyio
+async def test_syncer_replaces_playlist_with_local_file(spotify, fake_spotify):
+    # URIのない曲（ローカルファイル）は位置を指定して削除できないため、全体を置き換える
+    result = await _sync_and_check(spotify, fake_spotify, [POOL[0], None, POOL[1]], POOL[:2])
+
+    assert result.strategy == "replace"
+    assert (result.added, result.removed) == (0, 1)
+
+
+@pytest.mark.anyio
+async def test_syncer_reports_unchanged_without_writes(spotify, fake_spotify):
+    playlist_id = _playlist(fake_spotify, POOL[:120])
+
+    result = await PlaylistSyncer(spotify, playlist_id).sync(POOL[:120])
+
+    assert result.strategy == "unchanged"
+    assert fake_spotify.state.playlists[playlist_id]["snapshot"] == 0
+    # プレイリスト本体（最初の100件）と残りの1ページだけを読み込む
+    assert result.requests == 2
+
+
+@pytest.mark.anyio
+async def test_syncer_resends_unapplied_change_after_5xx(spotify, fake_spotify, monkeypatch):
+    delays = []
+    monkeypatch.setattr(playlist_sync, "backoff_delay", lambda attempt: delays.append(attempt) or 0.0)
+    failures = {"remaining": 1}
+
+    @fake_spotify.middleware("http")
+    async def fail_first_delete(request, call_next):
+        if request.method == "DELETE" and failures["remaining"]:
+            failures["remaining"] -= 1
+            return JSONResponse(status_code=502, content={"error": {"status": 502, "message": "Bad gateway"}})
+        return await call_next(request)
+
+    playlist_id = _playlist(fake_spotify, POOL[:10])
+    result = await PlaylistSyncer(spotify, playlist_id).sync(POOL[1:10])
+
+    assert fake_spotify.state.playlists[playlist_id]["tracks"] == POOL[1:10]
+    assert result.removed == 1
+    # 未適用を確認してから、バックオフを挟んで再送する
+    assert delays == [0]
@@ -0,0 +1,34 @@
+import pytest
+
+from app.services.resolution_store import ResolutionStore
+
+
+def test_store_is_disabled_without_a_path():
+    store = ResolutionStore(None)
+
+    assert not store.enabled
+    assert not store.ephemeral
+
+
+@pytest.mark.parametrize("path, ephemeral", [
+    ("/tmp/spotify_resolutions.sqlite3", True),
+    ("/tmp/cache/resolutions.sqlite3", True),
+    ("/data/spotify_resolutions.sqlite3", False),
+    ("/tmpdata/spotify_resolutions.sqlite3", False),
+])
+def test_store_in_temporary_directory_is_ephemeral(path, ephemeral):
+    assert ResolutionStore(path).ephemeral is ephemeral
+
+
+@pytest.mark.anyio
+async def test_recorded_resolutions_are_warmed_up_after_restart(tmp_path):
+    path = str(tmp_path / "resolutions.sqlite3")
+    store = ResolutionStore(path, flush_interval=0.01)
+    await store.start()
+    store.record("creep\x1fradiohead", [{"id": "t1", "name": "Creep"}])
+    await store.stop()
+
+    restarted = ResolutionStore(path)
+    loaded = await restarted.load_hot()
+
+    assert loaded == [("creep\x1fradiohead", [{"id": "t1", "name": "Creep"}])]
@@ -0,0 +1,156 @@
+import pytest
+
+from app.utils.setlist_parser import parse_setlist, parse_setlist_line
+
+
+def _titles(text, artist_name="THE ORAL CIGARETTES", **kwargs):
+    return [query.track_name for query in parse_setlist(text, artist_name=artist_name, **kwargs).queries]
+
+
+@pytest.mark.parametrize("line", [
+    "1. モンスターエフェクト",
+    "2) モンスターエフェクト",
+    "(3) モンスターエフェクト",
+    "[4] モンスターエフェクト",
+    "05: モンスターエフェクト",
+    "M1 モンスターエフェクト",
+    "M-01. モンスターエフェクト",
+    "EN1 モンスターエフェクト",
+    "EN. モンスターエフェクト",
+    "EN: モンスターエフェクト",
+    "#2. モンスターエフェクト",
+    "No.3: モンスターエフェクト",
+    "12 - モンスターエフェクト",
+    "07 モンスターエフェクト",
+    "・モンスターエフェクト",
+    "- モンスターエフェクト",
+    "① モンスターエフェクト",
+    "１．モンスターエフェクト",
+])
+def test_numbering_and_bullets_are_removed(line):
+    assert _titles(line) == ["モンスターエフェクト"]
+
+
+@pytest.mark.parametrize("title", ["5150", "99 Luftballons", "1999", "22"])
+def test_numbers_that_are_titles_are_kept(title):
+    assert _titles(title) == [title]
+
+
+@pytest.mark.parametrize("line", [
+    "Encore:", "Encore 2", "Double Encore", "アンコール", "Set 2", "Main Set:", "【本編】", "--- MC ---", "MC",
+    "第2部", "Acoustic set:", "=====",
+    # 曲名にもなる見出しは、装飾か行末のコロンがある場合だけ
+    "Day 2:", "-- Day 2 --", "== Part 2 ==", "[EN]", "EN:", "EN.", "【SE】", "<Se>",
+    # 番号付きの見出し・MC
+    "16. MC", "14. -- Act 2 --", "15. Encore:",
+])
+def test_headers_and_mc_are_skipped(line):
+    parsed = parse_setlist(line)
+    assert parsed.queries == []
+    assert parsed.skipped == [line]
+
+
+@pytest.mark.parametrize("line, title", [
+    ("En", "En"),
+    ("Se", "Se"),
+    ("Day 1", "Day 1"),
+    ("Part 2", "Part 2"),
+    ("- Day 1", "Day 1"),
+    ("「Se」", "Se"),
+    ("21. Part 2", "Part 2"),
+    ("22. Se", "Se"),
+    ("EN Sparks", "EN Sparks"),
+])
+def test_titles_that_look_like_headers_are_kept(line, title):
+    assert _titles(line) == [title]
+
+
+def test_tapes_are_skipped_unless_requested():
+    text = "Intro (tape)\nSE: Opening\n1. Dreamer"
+
+    assert _titles(text) == ["Dreamer"]
+    assert _titles(text, include_tapes=True) == ["Intro", "Opening", "Dreamer"]
+
+
+@pytest.mark.parametrize("line, title", [
+    ("Song (新曲)", "Song"),
+    ("Song (acoustic)", "Song"),
+    ("Song (with Guest)", "Song"),
+    ("Song ※初披露", "Song"),
+    ("Song (short ver.) (snippet)", "Song"),
+    ("(I Can't Get No) Satisfaction", "(I Can't Get No) Satisfaction"),
+    ("Song (Remix)", "Song (Remix)"),
+    ("「カギ括弧の曲」", "カギ括弧の曲"),
+])
+def test_notes_are_removed_and_title_parentheses_kept(line, title):
+    assert _titles(line) == [title]
+
+
+def test_cover_searches_original_artist():
+    queries = parse_setlist("Creep (Radiohead cover)", artist_name="THE ORAL CIGARETTES").queries
+
+    assert [(q.track_name, q.artist_name) for q in queries] == [("Creep", "Radiohead")]
+
+
+def test_dash_without_artist_keeps_whole_title():
+    # どちらがアーティストか判断できないため、"Creep - Radiohead" を "Creep" の曲 "Radiohead" としない
+    queries = parse_setlist("Radiohead - Creep\nCreep - Radiohead\nSong (Remix) - Live").queries
+
+    assert [(q.track_name, q.artist_name) for q in queries] == [
+        ("Radiohead - Creep", None), ("Creep - Radiohead", None), ("Song (Remix)", None),
+    ]
+
+
+def test_artist_title_notation_matching_given_artist():
+    queries = parse_setlist("Radiohead - Creep\nKarma Police - Radiohead", artist_name="Radiohead").queries
+
+    assert [(q.track_name, q.artist_name) for q in queries] == [("Creep", "Radiohead"), ("Karma Police", "Radiohead")]
+
+
+def test_dash_not_matching_given_artist_keeps_whole_title():
+    queries = parse_setlist("7. Love Will Tear Us Apart - Joy Division", artist_name="Radiohead").queries
+
+    assert [(q.track_name, q.artist_name) for q in queries] == [("Love Will Tear Us Apart - Joy Division", "Radiohead")]
+
+
+def test_slash_is_a_medley_unless_it_names_the_artist():
+    assert _titles("Song A / Song B") == ["Song A", "Song B"]
+    assert _titles("Song A / THE ORAL CIGARETTES") == ["Song A"]
+
+
+def test_duplicates_are_removed_case_insensitively():
+    parsed = parse_setlist("1. Dreamer\n2. Other\n3. DREAMER")
+
+    assert [q.track_name for q in parsed.queries] == ["Dreamer", "Other"]
+    assert parsed.duplicates == 1
+    assert len(parse_setlist("1. Dreamer\n3. DREAMER", dedup=False).queries) == 2
+
+
+def test_full_width_text_is_normalised():
+    assert _titles("１．ＥＮＥＭＹ？") == ["ENEMY?"]
+
+
+def test_full_setlist():
+    text = """Setlist:
+-- Day 1 --
+1. モンスターエフェクト
+2) 5150
+M3 狂乱 Hey Kids!!
+--- MC ---
+4. ENEMY (新曲)
+Encore:
+EN1 BAG
+16. MC
+EN. Sparks
+17. PSYCHOPATH"""
+
+    parsed = parse_setlist(text, artist_name="THE ORAL CIGARETTES")
+
+    assert [q.track_name for q in parsed.queries] == ["モンスターエフェクト", "5150", "狂乱 Hey Kids!!", "ENEMY", "BAG", "Sparks", "PSYCHOPATH"]
+    assert {q.artist_name for q in parsed.queries} == {"THE ORAL CIGARETTES"}
+    assert parsed.skipped == ["Setlist:", "-- Day 1 --", "--- MC ---", "Encore:", "16. MC"]
+
+
+def test_parse_setlist_line_returns_none_for_blank_and_overlong_lines():
+    assert parse_setlist_line("   ") is None
+    assert parse_setlist_line("x" * 201) is None
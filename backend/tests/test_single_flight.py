@@ -0,0 +1,112 @@
+import asyncio
+
+import pytest
+
+from app.utils.single_flight import SingleFlight
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "result"
+
+    waiters = [asyncio.create_task(flight.do("key", fetch)) for _ in range(5)]
+    await asyncio.sleep(0)
+    assert flight.in_flight() == 1
+    release.set()
+
+    assert await asyncio.gather(*waiters) == ["result"] * 5
+    assert calls == 1
+    assert flight.stats() == {"in_flight": 0, "executed": 1, "shared": 4}
+
+
+async def test_different_keys_run_separately():
+    flight = SingleFlight()
+
+    async def echo(value):
+        await asyncio.sleep(0)
+        return value
+
+    assert await asyncio.gather(flight.do("a", lambda: echo(1)), flight.do("b", lambda: echo(2))) == [1, 2]
+    assert flight.executed == 2
+
+
+async def test_key_is_released_after_completion():
+    flight = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        return calls
+
+    assert await flight.do("key", fetch) == 1
+    assert await flight.do("key", fetch) == 2
+
+
+async def test_exception_is_shared_with_waiters():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fail():
+        await release.wait()
+        raise ValueError("upstream failed")
+
+    waiters = [asyncio.create_task(flight.do("key", fail)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+
+    results = await asyncio.gather(*waiters, return_exceptions=True)
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.executed == 1
+
+
+async def test_cancelled_waiter_does_not_cancel_shared_call():
+    flight = SingleFlight()
+    release = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        return "result"
+
+    first = asyncio.create_task(flight.do("key", fetch))
+    second = asyncio.create_task(flight.do("key", fetch))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    await asyncio.sleep(0)
+    release.set()
+
+    assert await second == "result"
+    assert first.cancelled()
+
+
+async def test_shared_call_finishes_after_all_waiters_are_cancelled():
+    flight = SingleFlight()
+    release = asyncio.Event()
+    finished = asyncio.Event()
+
+    async def fetch():
+        await release.wait()
+        finished.set()
+        raise RuntimeError("nobody is waiting")
+
+    waiter = asyncio.create_task(flight.do("key", fetch))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    await asyncio.sleep(0)
+    assert flight.in_flight() == 1
+
+    release.set()
+    await asyncio.wait_for(finished.wait(), timeout=1)
+    await asyncio.sleep(0)
+    # 処理が終われば、待機側がいなくてもキーは解放される
+    assert flight.in_flight() == 0
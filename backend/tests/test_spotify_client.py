@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+from app.services import spotify_client
+from app.services.spotify_client import SpotifyException
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_search_returns_upstream_json(spotify):
+    result = await spotify.search("track:Creep artist:Radiohead", limit=3)
+
+    items = result["tracks"]["items"]
+    assert len(items) == 3
+    assert items[0]["name"] == "Creep"
+
+
+async def test_throttled_request_waits_retry_after_and_retries(spotify, fake_spotify, fake_config):
+    fake_config.rate_limit = 1
+    fake_config.retry_after = 1
+
+    started = time.monotonic()
+    first = await spotify.current_user()
+    second = await spotify.current_user()
+    elapsed = time.monotonic() - started
+
+    assert first["id"] == second["id"] == "fake_user"
+    assert fake_spotify.state.stats["throttled"] == 1
+    assert spotify_client.rate_limiter.throttled_count == 1
+    # 429のRetry-After（1秒）より前に再送しない
+    assert elapsed >= 1.0
+
+
+async def test_throttle_blocks_other_requests_until_retry_after(spotify, fake_config, monkeypatch):
+    monkeypatch.setattr(spotify_client, "SPOTIFY_MAX_RETRIES", 0)
+    fake_config.error_rate_429 = 1.0
+    fake_config.retry_after = 2
+
+    with pytest.raises(SpotifyException):
+        await spotify.current_user()
+
+    assert spotify_client.rate_limiter.stats()["blocked_for"] > 0
+    assert spotify_client.rate_limiter.concurrency_limit < spotify_client.rate_limiter.max_concurrency
+
+
+async def test_long_retry_after_fails_without_waiting(spotify, fake_spotify, fake_config):
+    fake_config.error_rate_429 = 1.0
+    fake_config.retry_after = 3600
+
+    started = time.monotonic()
+    with pytest.raises(SpotifyException) as exc_info:
+        await spotify.current_user()
+
+    assert exc_info.value.http_status == 429
+    assert exc_info.value.headers["retry-after"] == "3600"
+    assert fake_spotify.state.stats["requests"] == 1
+    assert time.monotonic() - started < 1.0
+
+
+async def test_retry_past_deadline_fails_without_waiting(spotify, fake_spotify, fake_config):
+    fake_config.error_rate_429 = 1.0
+    fake_config.retry_after = 2
+
+    token = spotify_client.retry_deadline.set(time.monotonic() + 1.0)
+    started = time.monotonic()
+    try:
+        with pytest.raises(SpotifyException) as exc_info:
+            await spotify.current_user()
+    finally:
+        spotify_client.retry_deadline.reset(token)
+
+    assert exc_info.value.http_status == 429
+    assert fake_spotify.state.stats["requests"] == 1
+    assert time.monotonic() - started < 1.0
@@ -0,0 +1,103 @@
+import asyncio
+import time
+
+import pytest
+from fastapi.responses import JSONResponse
+
+from app.schemas import TrackQuery
+from app.services.spotify_client import SpotifyException
+from app.services.spotify_service import SpotifyService, search_flight
+
+pytestmark = pytest.mark.anyio
+
+
+def _search_requests(fake_spotify) -> int:
+    return fake_spotify.state.stats["requests"]
+
+
+async def test_search_picks_studio_version_over_live(http_client):
+    tracks = await SpotifyService("token").search_track("Creep", "Radiohead")
+
+    assert tracks[0].name == "Creep"
+    assert all(track.name.endswith("Live") for track in tracks[1:])
+
+
+async def test_bulk_search_deduplicates_queries(http_client, fake_spotify):
+    queries = [TrackQuery(track_name="Creep", artist_name="Radiohead")] * 3 + [TrackQuery(track_name="Airbag", artist_name="Radiohead")]
+
+    matches, not_found, failed = await SpotifyService("token").search_multiple_tracks(queries)
+
+    assert [match.track.name for match in matches] == ["Creep", "Creep", "Creep", "Airbag"]
+    assert not_found == failed == []
+    assert _search_requests(fake_spotify) == 2
+
+
+async def test_concurrent_users_share_one_upstream_search(http_client, fake_spotify, fake_config):
+    fake_config.latency_ms = 20
+
+    results = await asyncio.gather(*(SpotifyService(f"token-{i}").search_track("Creep", "Radiohead") for i in range(5)))
+
+    assert all(tracks[0].name == "Creep" for tracks in results)
+    assert _search_requests(fake_spotify) == 1
+
+
+async def test_second_search_is_served_from_cache(http_client, fake_spotify):
+    service = SpotifyService("token")
+    await service.search_track("Creep", "Radiohead")
+    await service.search_track("Creep", "Radiohead")
+
+    assert _search_requests(fake_spotify) == 1
+
+
+async def test_auth_error_is_not_shared_between_users(http_client, fake_spotify):
+    @fake_spotify.middleware("http")
+    async def reject_revoked_token(request, call_next):
+        if request.headers.get("authorization") == "Bearer revoked":
+            await asyncio.sleep(0.02)
+            return JSONResponse(status_code=401, content={"error": {"status": 401, "message": "The access token expired"}})
+        return await call_next(request)
+
+    shared = search_flight.shared
+    revoked = asyncio.create_task(SpotifyService("revoked").search_track("Creep", "Radiohead"))
+    await asyncio.sleep(0.005)
+    valid = asyncio.create_task(SpotifyService("valid").search_track("Creep", "Radiohead"))
+
+    with pytest.raises(SpotifyException) as exc_info:
+        await revoked
+    assert exc_info.value.http_status == 401
+    # 期限切れのトークンで実行された検索の401を、別のユーザーは受け取らない
+    assert (await valid)[0].name == "Creep"
+    assert search_flight.shared == shared + 1
+
+
+async def test_unknown_track_is_reported_as_not_found(http_client, fake_config):
+    fake_config.not_found_rate = 1.0
+
+    matches, not_found, failed = await SpotifyService("token").search_multiple_tracks([TrackQuery(track_name="No Such Song", artist_name="Nobody")])
+
+    assert matches == [] and failed == []
+    assert not_found == [TrackQuery(track_name="No Such Song", artist_name="Nobody")]
+
+
+async def test_bulk_search_returns_unfinished_queries_as_failed_at_deadline(http_client, fake_spotify, fake_config):
+    fake_config.error_rate_429 = 1.0
+    fake_config.retry_after = 1
+    queries = [TrackQuery(track_name=f"Song {i}", artist_name="Band") for i in range(20)]
+
+    started = time.monotonic()
+    matches, not_found, failed = await SpotifyService("token").search_multiple_tracks(queries, deadline=0.5)
+
+    assert matches == not_found == []
+    assert failed == queries
+    assert time.monotonic() - started < 1.0
+
+
+async def test_setlist_search_stops_at_deadline(http_client, fake_spotify, fake_config):
+    fake_config.error_rate_429 = 1.0
+    fake_config.retry_after = 1
+    queries = [TrackQuery(track_name=f"Song {i}", artist_name="Band") for i in range(5)]
+
+    results = [result async for result in SpotifyService("token").iter_search_results(queries, deadline=0.5)]
+
+    assert sorted(result.index for result in results) == list(range(5))
+    assert {result.status for result in results} == {"failed"}
@@ -0,0 +1,102 @@
+import gzip
+
+import pytest
+from starlette.datastructures import Headers
+
+from app.core.static_assets import IMMUTABLE_CACHE_CONTROL, INDEX_CACHE_CONTROL, StaticSite, parse_accept_encoding
+
+brotli = pytest.importorskip("brotli")
+
+SCRIPT = ("function render(props) { return createElement('div', null, props.title); }\n" * 200).encode()
+
+
+@pytest.fixture
+def site(tmp_path):
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "index.html").write_text("<!doctype html><div id=root></div>" * 20)
+    (tmp_path / "assets" / "index-abc123.js").write_bytes(SCRIPT)
+    # ビルド時に作成された圧縮版（frontend/scripts/precompress.mjs と同じ）
+    (tmp_path / "assets" / "index-abc123.js.br").write_bytes(brotli.compress(SCRIPT, quality=11))
+    (tmp_path / "assets" / "index-abc123.js.gz").write_bytes(gzip.compress(SCRIPT, compresslevel=9, mtime=0))
+    (tmp_path / "favicon.png").write_bytes(b"\x89PNG" + bytes(1000))
+    (tmp_path / ".hidden").write_text("secret")
+    return StaticSite(tmp_path)
+
+
+def _get(site, path, **headers):
+    return site.response(site.lookup(path), Headers(headers={key.replace("_", "-"): value for key, value in headers.items()}))
+
+
+def test_index_lists_files_without_precompressed_or_hidden_files(site):
+    assert sorted(site.assets) == ["assets/index-abc123.js", "favicon.png", "index.html"]
+    assert site.lookup("/../index.html") is None
+    assert site.stats()["runtime_compressed_files"] == 1
+
+
+@pytest.mark.parametrize("accept_encoding, encoding", [
+    ("gzip, deflate, br", "br"),
+    ("br;q=0, gzip", "gzip"),
+    ("gzip;q=0.5", "gzip"),
+    ("identity", None),
+    ("br;q=0, gzip;q=0", None),
+    ("", None),
+])
+def test_encoding_negotiation(site, accept_encoding, encoding):
+    response = _get(site, "assets/index-abc123.js", accept_encoding=accept_encoding)
+
+    assert response.headers.get("content-encoding") == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    if encoding == "br":
+        assert brotli.decompress(response.body) == SCRIPT
+    elif encoding == "gzip":
+        assert gzip.decompress(response.body) == SCRIPT
+    else:
+        assert response.body == SCRIPT
+
+
+def test_precompressed_files_are_served_as_built(site, tmp_path):
+    response = _get(site, "assets/index-abc123.js", accept_encoding="br")
+
+    assert response.body == (tmp_path / "assets" / "index-abc123.js.br").read_bytes()
+
+
+def test_each_encoding_has_its_own_etag(site):
+    etags = {_get(site, "assets/index-abc123.js", accept_encoding=value).headers["etag"] for value in ("br", "gzip", "identity")}
+
+    assert len(etags) == 3
+
+
+def test_matching_if_none_match_returns_304(site):
+    etag = _get(site, "assets/index-abc123.js", accept_encoding="br").headers["etag"]
+
+    for if_none_match in (etag, f'W/{etag}', f'"other", {etag}', "*"):
+        response = _get(site, "assets/index-abc123.js", accept_encoding="br", if_none_match=if_none_match)
+        assert response.status_code == 304
+        assert response.body == b""
+        assert response.headers["etag"] == etag
+
+
+def test_etag_of_other_encoding_does_not_match(site):
+    gzip_etag = _get(site, "assets/index-abc123.js", accept_encoding="gzip").headers["etag"]
+
+    response = _get(site, "assets/index-abc123.js", accept_encoding="br", if_none_match=gzip_etag)
+
+    assert response.status_code == 200
+
+
+def test_cache_control_by_path(site):
+    assert _get(site, "index.html").headers["cache-control"] == INDEX_CACHE_CONTROL
+    assert _get(site, "assets/index-abc123.js").headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+
+
+def test_incompressible_files_are_served_without_vary(site):
+    response = _get(site, "favicon.png", accept_encoding="gzip, br")
+
+    assert "content-encoding" not in response.headers
+    assert "vary" not in response.headers
+    assert response.media_type == "image/png"
+
+
+def test_parse_accept_encoding():
+    assert parse_accept_encoding("gzip;q=0.5, br, *;q=0") == {"gzip": 0.5, "br": 1.0, "*": 0.0}
+    assert parse_accept_encoding(None) == {}
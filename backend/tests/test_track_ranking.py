@@ -0,0 +1,47 @@
+from app.services.track_ranking import score_candidates
+
+
+def _track(track_id, name, artist="Coldplay", duration_ms=266_000):
+    return {"id": track_id, "name": name, "artist": artist, "uri": f"spotify:track:{track_id}", "duration_ms": duration_ms}
+
+
+def test_exact_title_and_artist_rank_first():
+    candidates = [_track("a", "Yellow Submarine", "The Beatles"), _track("b", "Yellow"), _track("c", "Fix You")]
+
+    ranked = score_candidates("Yellow", "Coldplay", candidates)
+
+    assert ranked[0][0]["id"] == "b"
+    assert ranked[0][1] > ranked[1][1]
+
+
+def test_variant_not_in_query_is_penalised():
+    candidates = [_track("live", "Yellow - Live in Buenos Aires"), _track("karaoke", "Yellow (Karaoke Version)"), _track("studio", "Yellow")]
+
+    ranked = score_candidates("Yellow", "Coldplay", candidates)
+
+    assert [item["id"] for item, _ in ranked][0] == "studio"
+
+
+def test_variant_in_query_is_not_penalised():
+    candidates = [_track("live", "Yellow - Live"), _track("studio", "Yellow")]
+
+    penalised = score_candidates("Yellow", "Coldplay", candidates)
+    requested = score_candidates("Yellow - Live", "Coldplay", candidates)
+
+    assert penalised[0][0]["id"] == "studio"
+    assert requested[0][0]["id"] == "live"
+
+
+def test_extreme_duration_is_penalised():
+    candidates = [_track("intro", "Yellow", duration_ms=20_000), _track("song", "Yellow")]
+
+    ranked = score_candidates("Yellow", "Coldplay", candidates)
+
+    assert ranked[0][0]["id"] == "song"
+
+
+def test_scores_are_normalised_between_zero_and_one():
+    ranked = score_candidates("Yellow", "Coldplay", [_track("a", "Yellow"), _track("b", "全然違う曲", "別のアーティスト")])
+
+    assert all(0.0 <= score <= 1.0 for _, score in ranked)
+    assert score_candidates("Yellow", "Coldplay", []) == []
@@ -0,0 +1,32 @@
+from app.utils.track_uri import normalize_track_uri, validate_track_uris
+
+TRACK_ID = "4iV5W9uYEdYUVa79Axb7Rh"
+EPISODE_ID = "512ojhOuo1ktJprKbVcKyQ"
+
+
+def test_track_uri_url_and_id_are_normalised():
+    for value in (f"spotify:track:{TRACK_ID}", f"https://open.spotify.com/intl-ja/track/{TRACK_ID}?si=x", f" {TRACK_ID} "):
+        assert normalize_track_uri(value) == f"spotify:track:{TRACK_ID}"
+
+
+def test_invalid_values_are_reported_and_duplicates_removed():
+    valid, invalid = validate_track_uris([TRACK_ID, f"spotify:track:{TRACK_ID}", "spotify:track:short", "Creep"])
+
+    assert valid == [f"spotify:track:{TRACK_ID}"]
+    assert invalid == ["spotify:track:short", "Creep"]
+
+
+def test_episodes_are_accepted_for_playlists():
+    values = [f"spotify:episode:{EPISODE_ID}", f"https://open.spotify.com/episode/{EPISODE_ID}", TRACK_ID]
+
+    valid, invalid = validate_track_uris(values, allow_episodes=True)
+
+    assert valid == [f"spotify:episode:{EPISODE_ID}", f"spotify:track:{TRACK_ID}"]
+    assert invalid == []
+
+
+def test_episodes_are_invalid_where_only_tracks_are_expected():
+    valid, invalid = validate_track_uris([f"spotify:episode:{EPISODE_ID}"])
+
+    assert valid == []
+    assert invalid == [f"spotify:episode:{EPISODE_ID}"]
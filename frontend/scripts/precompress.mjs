@@ -0,0 +1,50 @@
+// ビルド成果物（dist）のテキスト系ファイルに、gzip/brotliの圧縮版（.gz/.br）を出力する。
+// バックエンドの StaticSite は同じ名前の .gz/.br を元のファイルの圧縮版として配信するため、
+// 起動時に最高圧縮率で圧縮し直す必要がなくなる。
+//
+//   node scripts/precompress.mjs [dist]
+import { readdirSync, readFileSync, writeFileSync } from 'node:fs'
+import { join } from 'node:path'
+import { brotliCompressSync, constants, gzipSync } from 'node:zlib'
+
+const COMPRESSIBLE = /\.(html|js|mjs|css|json|svg|txt|xml|map|webmanifest)$/
+// これより小さいファイルや、圧縮しても小さくならないファイルは圧縮版を出力しない
+const MIN_BYTES = 256
+const MIN_RATIO = 0.9
+
+function* walk(dir) {
+  for (const entry of readdirSync(dir, { withFileTypes: true })) {
+    const path = join(dir, entry.name)
+    if (entry.isDirectory()) {
+      yield* walk(path)
+    } else if (COMPRESSIBLE.test(entry.name)) {
+      yield path
+    }
+  }
+}
+
+const root = process.argv[2] ?? 'dist'
+let files = 0
+let written = 0
+for (const path of walk(root)) {
+  const content = readFileSync(path)
+  if (content.length < MIN_BYTES) continue
+  files += 1
+  const variants = {
+    '.br': brotliCompressSync(content, {
+      params: {
+        [constants.BROTLI_PARAM_QUALITY]: constants.BROTLI_MAX_QUALITY,
+        [constants.BROTLI_PARAM_SIZE_HINT]: content.length,
+      },
+    }),
+    // gzipのヘッダーのmtimeは0になるため、同じ内容からは常に同じバイト列になる
+    '.gz': gzipSync(content, { level: constants.Z_BEST_COMPRESSION }),
+  }
+  for (const [suffix, compressed] of Object.entries(variants)) {
+    if (compressed.length < content.length * MIN_RATIO) {
+      writeFileSync(path + suffix, compressed)
+      written += 1
+    }
+  }
+}
+console.log(`precompress: ${written} compressed variants for ${files} files in ${root}`)
@@ -51,7 +51,7 @@ export function BulkTrackSearch({
           resize="vertical"
         />
         <Text fontSize="sm" color="gray.600" mt={1}>
-          改行区切りで曲名を入力してください。番号は自動で除去されます。
+          改行区切りで曲名を入力してください。番号・見出し・MCなどは自動で除去されます。
         </Text>
       </FormControl>
       <Button
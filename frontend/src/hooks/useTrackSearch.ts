@@ -1,7 +1,7 @@
 import { useState } from "react";
 import { useToast } from "@chakra-ui/react";
 import { playlistAPI } from "../utils/apiClient";
-import type { Track, TrackQuery, SearchMode } from "../types";
+import type { Track, TrackQuery, SearchMode, SetlistParseResponse } from "../types";
 
 export function useTrackSearch() {
   // タブの状態管理
@@ -22,19 +22,16 @@ export function useTrackSearch() {
   const [error, setError] = useState<string | null>(null);
   const toast = useToast();
 
-  // セットリストテキストを解析してTrackQuery[]に変換
-  const parseBulkInput = (artistName: string, setlistText: string): TrackQuery[] => {
-    return setlistText
-      .split('\n')
-      .filter(line => line.trim())
-      .map(line => {
-        // 番号を除去: "1." "2)" "(3)" などのパターン
-        const trackName = line.replace(/^\s*\d+[\.\)\(]\s*/, '').trim();
-        return {
-          track_name: trackName,
-          artist_name: artistName
-        };
-      });
+  // セットリストテキストをバックエンドで解析してTrackQuery[]に変換
+  // （番号・見出し・MC・テープ・注記の除去と "Artist - Title" 表記の分解はサーバー側で行う）
+  const parseBulkInput = async (artistName: string, setlistText: string): Promise<TrackQuery[]> => {
+    const res = await playlistAPI.parseSetlist(setlistText, artistName);
+    if (!res.ok) {
+      const errorData = await res.json();
+      throw new Error(errorData.detail || "セットリストの解析に失敗しました。");
+    }
+    const data: SetlistParseResponse = await res.json();
+    return data.queries;
   };
 
   // 単曲検索処理
@@ -99,8 +96,19 @@ export function useTrackSearch() {
     setBulkLoading(true);
 
     try {
-      const queries = parseBulkInput(artistName, bulkSetlist);
-      
+      const queries = await parseBulkInput(artistName, bulkSetlist);
+      if (queries.length === 0) {
+        toast({
+          title: "曲名が見つかりませんでした",
+          description: "セットリストに曲名が含まれているか確認してください",
+          status: "warning",
+          duration: 5000,
+          isClosable: true,
+          position: "top",
+        });
+        return;
+      }
+
       const res = await playlistAPI.searchMultipleTracks(queries);
 
       if (res.ok) {
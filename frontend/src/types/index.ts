@@ -21,4 +21,10 @@ export interface TrackQuery {
   artist_name?: string;
 }
 
+export interface SetlistParseResponse {
+  queries: TrackQuery[];
+  skipped: string[];
+  duplicates: number;
+}
+
 export type SearchMode = 'single' | 'bulk';
\ No newline at end of file
@@ -38,6 +38,12 @@ export const playlistAPI = {
   // 単曲検索
   searchTrack: (params: URLSearchParams) => apiCall(`/playlist/search?${params.toString()}`),
   
+  // セットリストのテキスト解析
+  parseSetlist: (text: string, artistName?: string) => apiCall('/playlist/setlist/parse', {
+    method: 'POST',
+    body: JSON.stringify({ text, artist_name: artistName || null }),
+  }),
+
   // 複数曲検索
   searchMultipleTracks: (queries: any[]) => apiCall('/playlist/search/multiple', {
     method: 'POST',